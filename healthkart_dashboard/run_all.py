@@ -4,6 +4,7 @@ run_all.py
 Starts in one click:
   - lightweight HTTP server on :8000 (serves landing page / static assets)
   - Streamlit app          on :8503 (dashboard.py inside  src/ )
+  - ingestion service      on :8504 (ingest_service.py; POST tracking events to /events)
 Dependencies:
   pip install streamlit requests cryptography
 """
@@ -19,7 +20,7 @@ import webbrowser
 from contextlib import closing
 
 import http.server
-import socketserver
+import urllib.parse
 
 from cryptography.hazmat.primitives import serialization
 from cryptography.hazmat.primitives.asymmetric import rsa
@@ -34,6 +35,7 @@ import datetime
 # ------------------------------------------------------------------
 STATIC_SERVER_PORT = 8000
 STREAMLIT_PORT = 8502
+INGEST_PORT = 8504
 
 # ------------------------------------------------------------------
 # Generate self-signed certificate (optional, kept for completeness)
@@ -86,11 +88,20 @@ class QuietHandler(http.server.SimpleHTTPRequestHandler):
         # suppress clutter inside the main console
         pass
 
+    def end_headers(self):
+        # Dashboard exports download under their own name instead of opening
+        # in the browser; the file itself is streamed with its Content-Length
+        if self.path.startswith("/exports/") and os.path.isfile(self.translate_path(self.path)):
+            filename = os.path.basename(urllib.parse.unquote(urllib.parse.urlsplit(self.path).path))
+            self.send_header("Content-Disposition", f'attachment; filename="{filename}"')
+        super().end_headers()
+
 
 def run_static_server(port: int = STATIC_SERVER_PORT) -> None:
     """Serve files from the directory where this script lives."""
     os.chdir(os.path.dirname(os.path.abspath(__file__)))
-    with socketserver.TCPServer(("", port), QuietHandler) as httpd:
+    # Threaded, so a large export download doesn't block the landing page
+    with http.server.ThreadingHTTPServer(("", port), QuietHandler) as httpd:
         print(f"Static server running at http://localhost:{port}")
         httpd.serve_forever()
 
@@ -115,6 +126,20 @@ def run_streamlit() -> subprocess.Popen:
     return proc
 
 
+# ------------------------------------------------------------------
+# Ingestion service helper
+# ------------------------------------------------------------------
+def run_ingest_service() -> subprocess.Popen:
+    """Accepts tracking events and appends them to tracking_data.csv in micro-batches."""
+    ingest_script_path = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "src", "ingest_service.py"
+    )
+
+    cmd = [sys.executable, ingest_script_path, "--port", str(INGEST_PORT)]
+    proc = subprocess.Popen(cmd)
+    return proc
+
+
 # ------------------------------------------------------------------
 # TCP port wait helpers
 # ------------------------------------------------------------------
@@ -153,6 +178,14 @@ if __name__ == "__main__":
 
     print(f"Streamlit is up on http://localhost:{STREAMLIT_PORT}\n")
 
+    # 2b. Ingestion service; the dashboard picks its batches up from the file tail
+    ingest_proc = run_ingest_service()
+    atexit.register(lambda p=ingest_proc: p.terminate())
+    if not wait_for_port("localhost", INGEST_PORT, timeout=60):
+        print("WARNING: ingestion service did not start; continuing without it.\n")
+    else:
+        print(f"Ingestion service is up on http://localhost:{INGEST_PORT}/events\n")
+
     # 3. Fire up the light-weight static server in a daemon thread
     static_t = threading.Thread(
         target=run_static_server,
@@ -0,0 +1,109 @@
+import argparse
+import itertools
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from data_processor import DataProcessor, FILTER_COLUMNS
+from export_utils import bundle_formats, write_bundle
+from reports import render_insights
+
+# Processor of a worker process: the parent's, inherited where processes
+# fork, otherwise loaded once when the worker starts
+_processor = None
+
+
+def segment_filters(processor, columns):
+    """One filter dict per combination of the values of `columns` (e.g. campaign x platform)"""
+    options = processor.get_filter_options()
+    values = [list(options[column]) for column in columns]
+    return [{column: [value] for column, value in zip(columns, combination)}
+            for combination in itertools.product(*values)]
+
+
+def segment_name(filters):
+    """Directory name of a segment, e.g. campaign=Summer_Sale__platform=Instagram"""
+    if not filters:
+        return 'all'
+    parts = [f"{column}={'+'.join(map(str, values))}" for column, values in filters.items()]
+    return re.sub(r'[^\w=+.-]+', '_', '__'.join(parts))
+
+
+def write_segment_report(processor, filters, out_dir, fmt='csv.gz'):
+    """Insights text and report bundle of one segment under out_dir/<segment>, or None if it has no data"""
+    view = processor.filter_data(filters)
+    if not len(view):
+        return None
+    snapshot = view.get_report_snapshot()
+    directory = os.path.join(out_dir, segment_name(filters))
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, 'insights_report.md'), 'w', encoding='utf-8') as f:
+        f.write(render_insights(snapshot))
+    write_bundle(snapshot.report_data(), os.path.join(directory, 'report.zip'), fmt,
+                 snapshot.data_version, filters)
+    return directory
+
+
+def _init_worker(data_dir):
+    global _processor
+    if _processor is None:
+        _processor = DataProcessor(data_dir)
+        if not _processor.load_data():
+            raise RuntimeError(f"could not load data from {data_dir}")
+
+
+def _run_segment(task):
+    filters, out_dir, fmt = task
+    return filters, write_segment_report(_processor, filters, out_dir, fmt)
+
+
+def run_batch(processor, segments, out_dir, fmt='csv.gz', workers=None):
+    """Write the reports of every segment with a pool of `workers` processes
+
+    The loaded processor is shared with the workers by fork (copy-on-write)
+    where the platform allows it; elsewhere each worker loads the data once.
+    Returns the directories written, in segment order, None for segments
+    without data.
+    """
+    global _processor
+    if fmt not in bundle_formats():
+        raise ValueError(f"Unsupported bundle format: {fmt} (available: {', '.join(bundle_formats())})")
+    os.makedirs(out_dir, exist_ok=True)
+    tasks = [(filters, out_dir, fmt) for filters in segments]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        return [write_segment_report(processor, filters, out_dir, fmt) for filters in segments]
+
+    context = None
+    if 'fork' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('fork')
+        _processor = processor
+    try:
+        with ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker,
+                                 initargs=(processor.data_dir,)) as executor:
+            return [directory for _, directory in executor.map(_run_segment, tasks)]
+    finally:
+        _processor = None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Write insights and report bundles for every segment")
+    parser.add_argument('--out', default='reports', help="output directory (default: reports)")
+    parser.add_argument('--by', nargs='*', default=['campaign', 'platform'], choices=FILTER_COLUMNS,
+                        help="filter columns whose value combinations are the segments (default: campaign platform)")
+    parser.add_argument('--data-dir', help="directory holding the CSV files (DataProcessor default if omitted)")
+    parser.add_argument('--format', default='csv.gz', help=f"bundle format, one of {', '.join(bundle_formats())}")
+    parser.add_argument('--workers', type=int, help="report processes (default: one per CPU)")
+    args = parser.parse_args()
+
+    started = time.monotonic()
+    # The batch aggregates whole segments itself, so the processor keeps no partition pool
+    processor = DataProcessor(args.data_dir, workers=1) if args.data_dir else DataProcessor(workers=1)
+    if not processor.load_data():
+        raise SystemExit("ERROR: could not load data for the batch reports")
+    segments = [{}] + segment_filters(processor, args.by) if args.by else [{}]
+    written = run_batch(processor, segments, args.out, args.format, args.workers)
+    print(f"Wrote {sum(d is not None for d in written)} of {len(segments)} segment reports to {args.out} "
+          f"in {time.monotonic() - started:.1f}s")
@@ -0,0 +1,87 @@
+import sys
+import time
+
+import pandas as pd
+
+from date_index import DateIndex
+from data_processor import ENCODED_KEYS, STANDARD_ROLLUPS, DataProcessor
+from kernels import encode_columns
+
+
+def best_time(func, repeats=5):
+    """Fastest of `repeats` runs, in milliseconds"""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000
+
+
+def benchmark_kernels(scale=1, workers=None):
+    # Load the data, optionally tiling the cube `scale` times to mimic more cells
+    processor = DataProcessor()
+    if not processor.load_data():
+        print("✗ Failed to load data")
+        return
+    if scale > 1:
+        # Kept date-sorted, so month partitions stay contiguous
+        processor.cube = pd.concat([processor.cube] * scale, ignore_index=True).sort_values(
+            'date', kind='stable', ignore_index=True)
+        processor.cube_date_index = DateIndex(processor.cube['date'])
+        processor.cube_codes = encode_columns(processor.cube, ENCODED_KEYS)
+        processor.cube_codes['influencer_id'] = (
+            processor.dictionary.encode('influencer', processor.cube['influencer_id']),
+            processor.dictionary.labels['influencer'],
+        )
+        processor.build_distinct_sketches()
+    cube = processor.cube
+    print(f"Cube cells: {len(cube):,}")
+    if workers:
+        processor.workers = workers
+        processor.build_partition_pool()
+        print(f"Partitioned over {len(processor.partition_pool.partitions)} months, {workers} workers")
+
+    # Both paths must agree before their timings mean anything
+    kernel = processor._kernel_rollups(None, STANDARD_ROLLUPS)
+    pandas_path = processor._compute_rollups(cube, STANDARD_ROLLUPS)
+    for dim in STANDARD_ROLLUPS:
+        pd.testing.assert_frame_equal(kernel[dim], pandas_path[dim], check_exact=False)
+    print("✓ Kernel and pandas rollups match")
+
+    def influencer_totals(use_kernels):
+        processor.use_kernels = use_kernels
+        return processor._influencer_totals(None)
+
+    timings = [
+        ('standard rollups',
+         lambda: processor._compute_rollups(cube, STANDARD_ROLLUPS),
+         lambda: processor._kernel_rollups(None, STANDARD_ROLLUPS)),
+        ('influencer totals',
+         lambda: influencer_totals(False),
+         lambda: influencer_totals(True)),
+    ]
+    print(f"\n{'':20}{'pandas ms':>12}{'kernel ms':>12}{'speedup':>10}")
+    for label, pandas_func, kernel_func in timings:
+        pandas_ms = best_time(pandas_func)
+        kernel_ms = best_time(kernel_func)
+        print(f"{label:20}{pandas_ms:12.2f}{kernel_ms:12.2f}{pandas_ms / kernel_ms:9.1f}x")
+    
+    if workers:
+        # In-process kernels against the same kernels spread over the pool
+        pool = processor.partition_pool
+        processor.partition_pool = None
+        serial_ms = best_time(lambda: processor._kernel_rollups(None, STANDARD_ROLLUPS))
+        processor.partition_pool = pool
+        processor.parallel_min_cells = 0
+        parallel = processor._kernel_rollups(None, STANDARD_ROLLUPS)
+        for dim in STANDARD_ROLLUPS:
+            pd.testing.assert_frame_equal(parallel[dim], kernel[dim], check_exact=False)
+        parallel_ms = best_time(lambda: processor._kernel_rollups(None, STANDARD_ROLLUPS))
+        print(f"\n{'':20}{'1 proc ms':>12}{f'{workers} procs ms':>12}{'speedup':>10}")
+        print(f"{'standard rollups':20}{serial_ms:12.2f}{parallel_ms:12.2f}{serial_ms / parallel_ms:9.1f}x")
+        pool.shutdown()
+
+if __name__ == '__main__':
+    benchmark_kernels(int(sys.argv[1]) if len(sys.argv) > 1 else 1,
+                      int(sys.argv[2]) if len(sys.argv) > 2 else None)
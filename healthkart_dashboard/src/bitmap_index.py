@@ -0,0 +1,93 @@
+import copy
+
+import numpy as np
+import pandas as pd
+
+
+class BitmapIndex:
+    """Value -> packed bitmap of row positions for one low-cardinality column"""
+
+    def __init__(self, column):
+        if not isinstance(column.dtype, pd.CategoricalDtype):
+            column = column.astype('category')
+        codes = column.cat.codes.to_numpy()
+
+        self.size = len(codes)
+        self.values = list(column.cat.categories)
+        self._positions = {value: code for code, value in enumerate(self.values)}
+        # One row of packed bits per distinct value; missing values (code -1)
+        # are in no bitmap, matching isin()
+        self.bitmaps = np.zeros((len(self.values), (self.size + 7) // 8), dtype=np.uint8)
+        for code in range(len(self.values)):
+            self.bitmaps[code] = np.packbits(codes == code)
+        self._present = {value for value, bitmap in zip(self.values, self.bitmaps) if bitmap.any()}
+
+    @property
+    def present_values(self):
+        """Distinct values that occur in the column, in category order"""
+        return [value for value in self.values if value in self._present]
+
+    def covers(self, values):
+        """True when `values` include every value present in the column"""
+        return self._present.issubset(values)
+
+    def lookup(self, values):
+        """Packed bitmap of the rows holding any of `values`"""
+        codes = [self._positions[value] for value in values if value in self._positions]
+        if not codes:
+            return np.zeros(self.bitmaps.shape[1], dtype=np.uint8)
+        return np.bitwise_or.reduce(self.bitmaps[codes], axis=0)
+
+    def splice(self, start, column):
+        """Index of `column`, which holds this index's rows before `start` and new ones after
+
+        The categories must be unchanged. Only the bytes from the one holding
+        row `start` onward are packed again.
+        """
+        first = start // 8
+        codes = column.cat.codes.to_numpy()[first * 8:]
+        index = copy.copy(self)
+        index.size = len(column)
+        index.bitmaps = np.zeros((len(self.values), (index.size + 7) // 8), dtype=np.uint8)
+        index.bitmaps[:, :first] = self.bitmaps[:, :first]
+        for code in range(len(self.values)):
+            index.bitmaps[code, first:] = np.packbits(codes == code)
+        index._present = {value for value, bitmap in zip(self.values, index.bitmaps) if bitmap.any()}
+        return index
+
+    @property
+    def nbytes(self):
+        return self.bitmaps.nbytes
+
+
+def build_bitmap_indexes(df, columns):
+    """Bitmap index for each of `columns` of df"""
+    return {column: BitmapIndex(df[column]) for column in columns}
+
+
+def select_bitmap(indexes, filters):
+    """AND together the bitmaps selected by `filters`; None when nothing is filtered
+
+    A filter that keeps every value present in its column (the sidebar
+    default) selects all rows and is skipped.
+    """
+    selection = None
+    for column, index in indexes.items():
+        values = filters.get(column)
+        if not values or index.covers(values):
+            continue
+        bitmap = index.lookup(values)
+        selection = bitmap if selection is None else np.bitwise_and(selection, bitmap, out=selection)
+    return selection
+
+
+def bitmap_positions(bitmap, size, start=0, stop=None):
+    """Row positions set in a packed bitmap, limited to rows start:stop"""
+    stop = size if stop is None else stop
+    if stop <= start:
+        return np.zeros(0, dtype=np.int64)
+    # Only the bytes covering start:stop are unpacked
+    first_byte = start // 8
+    bits = np.unpackbits(bitmap[first_byte:(stop + 7) // 8], count=stop - first_byte * 8)
+    positions = np.flatnonzero(bits[start - first_byte * 8:])
+    return positions + start
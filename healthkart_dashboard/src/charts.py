@@ -0,0 +1,139 @@
+import hashlib
+import json
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+from result_cache import LRUCache, fingerprint
+
+# Points drawn as SVG up to here, as WebGL up to the density threshold, and
+# binned on the server into a hexagonal grid beyond it
+SCATTER_WEBGL_THRESHOLD = 5_000
+SCATTER_DENSITY_THRESHOLD = 50_000
+HEXBIN_GRIDSIZE = 40
+# Serialized figures kept for reruns that draw the same chart again
+FIGURE_CACHE_SIZE = 128
+
+_figure_cache = LRUCache(FIGURE_CACHE_SIZE)
+
+
+def hexbin(x, y, gridsize=HEXBIN_GRIDSIZE):
+    """Hexagon of each point on a gridsize-wide hexagonal grid (the matplotlib hexbin layout)
+
+    Returns each point's bin code and the (x, y) centre of every code. The
+    grid has two interleaved lattices of rectangles; a point belongs to the
+    nearer of its two candidate centres.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    nx = gridsize
+    ny = max(1, int(round(gridsize / np.sqrt(3))))
+    xmin, xmax = x.min(), x.max()
+    ymin, ymax = y.min(), y.max()
+    sx = (xmax - xmin) / nx or 1.0
+    sy = (ymax - ymin) / ny or 1.0
+    gx, gy = (x - xmin) / sx, (y - ymin) / sy
+
+    ix1, iy1 = np.rint(gx), np.rint(gy)
+    ix2, iy2 = np.floor(gx), np.floor(gy)
+    d1 = (gx - ix1) ** 2 + 3 * (gy - iy1) ** 2
+    d2 = (gx - ix2 - 0.5) ** 2 + 3 * (gy - iy2 - 0.5) ** 2
+    first = d1 < d2
+
+    # Lattice 1 has (nx + 1) x (ny + 1) centres, lattice 2 nx x ny after it
+    codes = np.where(
+        first,
+        ix1 * (ny + 1) + iy1,
+        (nx + 1) * (ny + 1) + np.minimum(ix2, nx - 1) * ny + np.minimum(iy2, ny - 1),
+    ).astype(np.int64)
+    lattice1 = np.arange((nx + 1) * (ny + 1))
+    lattice2 = np.arange(nx * ny)
+    centres_x = np.concatenate([lattice1 // (ny + 1), lattice2 // ny + 0.5]) * sx + xmin
+    centres_y = np.concatenate([lattice1 % (ny + 1), lattice2 % ny + 0.5]) * sy + ymin
+    return codes, centres_x, centres_y
+
+
+def density_frame(df, x, y, color=None, gridsize=HEXBIN_GRIDSIZE):
+    """One row per occupied hexagon: centre, point count, mean x/y and the most common `color`"""
+    data = df[[x, y]].dropna()
+    if data.empty:
+        return pd.DataFrame(columns=['x', 'y', 'count', 'mean_x', 'mean_y', 'top'])
+    codes, centres_x, centres_y = hexbin(data[x], data[y], gridsize)
+    occupied, inverse, counts = np.unique(codes, return_inverse=True, return_counts=True)
+    frame = pd.DataFrame({
+        'x': centres_x[occupied],
+        'y': centres_y[occupied],
+        'count': counts,
+        'mean_x': np.bincount(inverse, weights=data[x].to_numpy(dtype=np.float64)) / counts,
+        'mean_y': np.bincount(inverse, weights=data[y].to_numpy(dtype=np.float64)) / counts,
+    })
+    if color is not None:
+        labels, groups = pd.factorize(df.loc[data.index, color])
+        present = labels >= 0
+        pairs = np.bincount(inverse[present] * len(groups) + labels[present],
+                            minlength=len(occupied) * len(groups)).reshape(len(occupied), len(groups))
+        frame['top'] = np.asarray(groups, dtype=object)[pairs.argmax(axis=1)] if len(groups) else None
+    return frame
+
+
+def adaptive_scatter(df, x, y, color=None, size=None, hover_name=None, title=None,
+                     webgl_threshold=SCATTER_WEBGL_THRESHOLD, density_threshold=SCATTER_DENSITY_THRESHOLD,
+                     gridsize=HEXBIN_GRIDSIZE):
+    """px.scatter that stays responsive as the number of points grows
+
+    Small frames are plotted as before. Above webgl_threshold points the
+    same chart uses WebGL traces; above density_threshold the points are
+    binned here into hexagons coloured by count (marker size no longer
+    applies), so the figure holds at most a few thousand markers however
+    many points there are.
+    """
+    if len(df) <= density_threshold:
+        render_mode = 'webgl' if len(df) > webgl_threshold else 'svg'
+        return px.scatter(df, x=x, y=y, color=color, size=size, hover_name=hover_name,
+                          title=title, render_mode=render_mode)
+
+    bins = density_frame(df, x, y, color, gridsize)
+    hover = (f"{x}: %{{customdata[0]:,.2f}} (mean)<br>{y}: %{{customdata[1]:,.2f}} (mean)"
+             "<br>points: %{marker.color:,}")
+    columns = ['mean_x', 'mean_y'] + (['top'] if color is not None else [])
+    customdata = bins[columns].to_numpy(dtype=object)
+    if color is not None:
+        hover += f"<br>most common {color}: %{{customdata[2]}}"
+    fig = go.Figure(go.Scatter(
+        x=bins['x'], y=bins['y'], mode='markers', customdata=customdata,
+        marker=dict(symbol='hexagon', size=max(4, 480 // gridsize), color=bins['count'],
+                    colorscale='Viridis', showscale=True, colorbar=dict(title='points')),
+        hovertemplate=hover + "<extra></extra>",
+    ))
+    fig.update_layout(title=f"{title} ({len(df):,} points, binned)" if title else None,
+                      xaxis_title=x, yaxis_title=y)
+    return fig
+
+
+def frame_digest(df):
+    """Content hash of a frame: column names, dtypes, index and values"""
+    digest = hashlib.sha1(repr([(str(column), str(dtype)) for column, dtype in df.dtypes.items()]).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    return digest.hexdigest()[:16]
+
+
+def cached_figure(build, df, layout=None, cache=None, **spec):
+    """build(df, **spec) with `layout` applied, built only once per frame content and chart spec
+
+    The figure is kept as its JSON in an LRU cache keyed by a hash of the
+    frame's content and the spec. A hit is loaded back without Plotly's
+    validation, so a rerun that draws an unchanged chart skips building,
+    validating and serializing it. Every call returns a new figure.
+    """
+    cache = _figure_cache if cache is None else cache
+    key = (frame_digest(df), fingerprint(build.__module__, build.__qualname__, layout, sorted(spec.items())))
+    figure_json = cache.get(key)
+    if figure_json is None:
+        fig = build(df, **spec)
+        if layout:
+            fig.update_layout(**layout)
+        figure_json = fig.to_json()
+        cache.put(key, figure_json)
+    return go.Figure(json.loads(figure_json), _validate=False)
@@ -0,0 +1,158 @@
+import hashlib
+import json
+import os
+import tempfile
+
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401  (pandas' Parquet engine)
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+CACHE_DIRNAME = '.cache'
+MANIFEST_NAME = 'manifest.json'
+HASH_BLOCK_SIZE = 1 << 20
+
+
+def file_digest(path):
+    """SHA-256 of a file, read in fixed-size blocks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ColumnarCache:
+    """Parquet copies of the source CSVs, kept in `<data_dir>/.cache`
+
+    An entry is reused while its CSV keeps the same size and mtime. When the
+    stat changes the CSV is hashed, so a touched-but-identical file keeps its
+    cache and only real content changes trigger a rebuild. Entries also record
+    the reader version, so a change in how a table is parsed rebuilds it.
+    """
+
+    def __init__(self, data_dir, cache_dir=None):
+        self.data_dir = data_dir
+        self.cache_dir = cache_dir or os.path.join(data_dir, CACHE_DIRNAME)
+        self.manifest_path = os.path.join(self.cache_dir, MANIFEST_NAME)
+        self.manifest = self._read_manifest()
+        self.last_status = {}
+
+    @property
+    def enabled(self):
+        return PARQUET_AVAILABLE
+
+    def _read_manifest(self):
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_manifest(self):
+        tmp_path = self._temp_path(self.manifest_path)
+        with open(tmp_path, 'w') as f:
+            json.dump(self.manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _update_manifest(self, name, entry):
+        """Set one entry in the manifest as it is on disk now, keeping what other processes stored"""
+        manifest = self._read_manifest()
+        manifest[name] = entry
+        self.manifest = manifest
+        self._write_manifest()
+
+    def _temp_path(self, path):
+        """New, uniquely named temporary file for `path`, so processes sharing the cache never collide"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, prefix=f'{os.path.basename(path)}.', suffix='.tmp')
+        os.close(fd)
+        return tmp_path
+
+    def parquet_path(self, name):
+        return os.path.join(self.cache_dir, f'{name}.parquet')
+
+    def is_fresh(self, name, csv_path, version=None):
+        """Check whether the cached copy of `name` still matches its CSV"""
+        # Another process sharing the cache may have rebuilt the entry since
+        self.manifest = self._read_manifest()
+        entry = self.manifest.get(name)
+        if entry is None or not os.path.isfile(self.parquet_path(name)):
+            return False
+        if entry.get('version') != version:
+            return False
+
+        stat = os.stat(csv_path)
+        if entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+            return True
+        if entry['size'] != stat.st_size:
+            return False
+
+        # Same size, new mtime: only a content change invalidates the entry
+        if file_digest(csv_path) != entry['sha256']:
+            return False
+        self._update_manifest(name, {**entry, 'mtime_ns': stat.st_mtime_ns})
+        return True
+
+    def load(self, name, reader, version=None):
+        """Load table `name`, from cache when fresh, else via reader(csv_path)"""
+        csv_path = os.path.join(self.data_dir, f'{name}.csv')
+        if not self.enabled:
+            self.last_status[name] = 'disabled'
+            return reader(csv_path)
+
+        if self.is_fresh(name, csv_path, version):
+            self.last_status[name] = 'hit'
+            return pd.read_parquet(self.parquet_path(name))
+
+        before = os.stat(csv_path)
+        df = reader(csv_path)
+        try:
+            if self.store(name, csv_path, df, version, before):
+                self.last_status[name] = 'rebuilt'
+            else:
+                self.last_status[name] = 'uncached'
+        except OSError as e:
+            print(f"Warning: could not write columnar cache for {name}: {e}")
+            self.last_status[name] = 'uncached'
+        return df
+
+    def store(self, name, csv_path, df, version=None, stat=None):
+        """Write `df` as the cached copy of `csv_path`
+        
+        `stat` is the CSV's stat from before `df` was read. When the file has
+        changed since, `df` may not match it, so nothing is stored and False
+        is returned.
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        stat = stat or os.stat(csv_path)
+        sha256 = file_digest(csv_path)
+        current = os.stat(csv_path)
+        if (current.st_size, current.st_mtime_ns) != (stat.st_size, stat.st_mtime_ns):
+            return False
+
+        parquet_path = self.parquet_path(name)
+        tmp_path = self._temp_path(parquet_path)
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, parquet_path)
+
+        self._update_manifest(name, {
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'sha256': sha256,
+            'version': version,
+        })
+        return True
+
+    def clear(self):
+        """Drop every cached table"""
+        for name in list(self.manifest):
+            try:
+                os.remove(self.parquet_path(name))
+            except FileNotFoundError:
+                pass
+        self.manifest = {}
+        if os.path.isdir(self.cache_dir):
+            self._write_manifest()
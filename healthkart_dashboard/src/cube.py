@@ -0,0 +1,55 @@
+import pandas as pd
+
+# One cell per day x campaign x product x influencer. Platform, category,
+# gender and payout basis are attributes of the influencer, so they never
+# split a cell; they are materialized on each cell so filters and rollups on
+# them need no dimension lookup.
+CUBE_KEYS = ['date', 'campaign', 'product', 'influencer_id']
+CUBE_ATTRIBUTES = ['platform', 'category', 'gender', 'basis']
+CUBE_MEASURES = ['revenue', 'orders', 'events', 'spend']
+
+
+def build_cube(facts, influencer_dim, dictionary=None):
+    """Pre-aggregate tracking facts (rows or streamed cells) into the daily cube
+
+    `spend` is each cell's share of its influencer's payout, so every measure
+    is additive across any set of cells. Distinct influencer counts over a
+    set of cells are exact: the influencer is part of the cell key. With a
+    DictionaryRegistry, influencer attributes are fetched by code position.
+    """
+    if 'events' not in facts.columns:
+        facts = facts.assign(events=1)
+    cube = facts.groupby(CUBE_KEYS, observed=True)[['revenue', 'orders', 'events']].sum().reset_index()
+
+    if dictionary is not None:
+        attributes = influencer_dim.take(dictionary.encode('influencer', cube['influencer_id']))
+    else:
+        attributes = influencer_dim.reindex(cube['influencer_id'].to_numpy())
+    for column in CUBE_ATTRIBUTES:
+        cube[column] = attributes[column].array
+    cube['spend'] = cube['events'] * attributes['payout_per_event'].to_numpy()
+
+    return cube[CUBE_KEYS + CUBE_ATTRIBUTES + CUBE_MEASURES]
+
+
+def fold_cube(cube, facts, influencer_dim, dictionary=None):
+    """The cube with new tracking facts (rows or cells) folded into its cells
+
+    Matching cells are summed. Attributes and spend are derived again for
+    every cell, since new events change each affected influencer's
+    payout-per-event share. Categorical keys must already share dtypes.
+    """
+    if 'events' not in facts.columns:
+        facts = facts.assign(events=1)
+    columns = CUBE_KEYS + ['revenue', 'orders', 'events']
+    cells = pd.concat([cube[columns], facts[columns]], ignore_index=True)
+    return build_cube(cells, influencer_dim, dictionary)
+
+
+def cube_stats(cube, events):
+    """Cell count and compression relative to the number of tracking events"""
+    return {
+        'cells': len(cube),
+        'events': int(events),
+        'compression': events / len(cube) if len(cube) else 0.0,
+    }
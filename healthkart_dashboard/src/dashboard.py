@@ -7,8 +7,10 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-from data_processor import DataProcessor
-from export_utils import create_summary_report, generate_insights_text, create_downloadable_csv, create_downloadable_insights
+from shared_processor import SharedProcessor
+from charts import adaptive_scatter, cached_figure
+from export_utils import (create_summary_report, generate_insights_text, create_downloadable_insights,
+                          create_downloadable_bundle, bundle_formats)
 import os
 from datetime import datetime, timedelta
 
@@ -87,13 +89,20 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-@st.cache_data
+@st.cache_resource
+def get_shared_processor():
+    """One processor handle for every session in this server process"""
+    return SharedProcessor()
+
 def load_data():
-    """Load and cache data"""
-    processor = DataProcessor()
-    if processor.load_data():
-        return processor
-    return None
+    """Shared processor, loaded once per process; sessions only hold filtered views"""
+    shared = get_shared_processor()
+    if shared.get() is None:
+        return None
+    # Rows appended to tracking_data.csv are folded in without a full reload;
+    # when nothing was appended this is a single stat() call
+    shared.ingest_tail()
+    return shared.get()
 
 def main():
     # Add HealthKart logo and title
@@ -125,35 +134,35 @@ def main():
     st.sidebar.markdown('<div class="sidebar-header">Filters</div>', unsafe_allow_html=True)
     
     # Get unique values for filters
-    merged_df = processor.merge_data()
+    filter_options = processor.get_filter_options()
     
     platforms = st.sidebar.multiselect(
         "Platform",
-        options=merged_df['platform'].unique(),
-        default=merged_df['platform'].unique()
+        options=filter_options['platform'],
+        default=filter_options['platform']
     )
     
     categories = st.sidebar.multiselect(
         "Category",
-        options=merged_df['category'].unique(),
-        default=merged_df['category'].unique()
+        options=filter_options['category'],
+        default=filter_options['category']
     )
     
     campaigns = st.sidebar.multiselect(
         "Campaign",
-        options=merged_df['campaign'].unique(),
-        default=merged_df['campaign'].unique()
+        options=filter_options['campaign'],
+        default=filter_options['campaign']
     )
     
     products = st.sidebar.multiselect(
         "Product",
-        options=merged_df['product'].unique(),
-        default=merged_df['product'].unique()
+        options=filter_options['product'],
+        default=filter_options['product']
     )
     
     # Date range filter
-    min_date = merged_df['date'].min().date()
-    max_date = merged_df['date'].max().date()
+    min_date = filter_options['date_range'][0].date()
+    max_date = filter_options['date_range'][1].date()
     
     date_range = st.sidebar.date_input(
         "Date Range",
@@ -171,53 +180,77 @@ def main():
         'date_range': date_range if len(date_range) == 2 else None
     }
     
-    # Filter data
-    filtered_df = processor.filter_data(filters)
-    processor.merged_df = filtered_df  # Update processor with filtered data
+    # Filter data; the view answers every metric for the selection without
+    # touching the shared processor
+    view = processor.filter_data(filters)
     
     # Export section
     st.sidebar.markdown('<div class="sidebar-header">Export Data</div>', unsafe_allow_html=True)
     
     if st.sidebar.button("Generate Insights Report"):
-        insights_text = generate_insights_text(processor)
+        insights_text = generate_insights_text(view)
         st.sidebar.markdown(create_downloadable_insights(insights_text), unsafe_allow_html=True)
     
+    bundle_format = st.sidebar.selectbox("Export Format", bundle_formats())
     if st.sidebar.button("Export Summary Data"):
-        summary_data = create_summary_report(processor)
+        summary_data = create_summary_report(view)
         
         # Create downloadable links for each dataset
         st.sidebar.markdown("**Download Options:**")
         
-        # Campaign performance
-        campaign_csv = create_downloadable_csv(summary_data['campaign_performance'], "campaign_performance.csv")
-        st.sidebar.markdown(campaign_csv, unsafe_allow_html=True)
-        
-        # Product performance
-        product_csv = create_downloadable_csv(summary_data['product_performance'], "product_performance.csv")
-        st.sidebar.markdown(product_csv, unsafe_allow_html=True)
-        
-        # Influencer metrics
-        influencer_csv = create_downloadable_csv(summary_data['all_influencers'], "influencer_metrics.csv")
-        st.sidebar.markdown(influencer_csv, unsafe_allow_html=True)
+        # Every report table in one compressed archive with a manifest
+        bundle = create_downloadable_bundle(summary_data, bundle_format, view.data_version)
+        st.sidebar.markdown(bundle, unsafe_allow_html=True)
+    
+    # Reloading swaps in a freshly loaded processor for every session; this
+    # run keeps answering from the one it started with
+    st.sidebar.markdown('<div class="sidebar-header">Data</div>', unsafe_allow_html=True)
+    if st.sidebar.button("Reload Data"):
+        if get_shared_processor().reload():
+            st.sidebar.success("Data reloaded")
+        else:
+            st.sidebar.error("Reload failed; still serving the previously loaded data.")
     
     # Display selected page
     if page == "Overview":
-        show_overview(processor)
+        show_overview(view)
     elif page == "Campaign Performance":
-        show_campaign_performance(processor)
+        show_campaign_performance(view)
     elif page == "ROI & ROAS Analysis":
-        show_roi_analysis(processor)
+        show_roi_analysis(view)
     elif page == "Influencer Insights":
-        show_influencer_insights(processor)
+        show_influencer_insights(view)
     elif page == "Payout Tracking":
-        show_payout_tracking(processor)
+        show_payout_tracking(view)
+
+def period_delta(summary, previous, key):
+    """Change versus the previous period, formatted for st.metric; None without one to compare"""
+    if previous is None or not previous[key]:
+        return None
+    return f"{(summary[key] - previous[key]) / previous[key]:+.1%}"
+
+def revenue_spend_bars(campaign_perf):
+    """Grouped revenue and spend bars per campaign"""
+    fig = go.Figure()
+    fig.add_trace(go.Bar(name='Revenue', x=campaign_perf['campaign'], y=campaign_perf['revenue']))
+    fig.add_trace(go.Bar(name='Spend', x=campaign_perf['campaign'], y=campaign_perf['total_payout']))
+    fig.update_layout(barmode='group')
+    return fig
+
+def roas_histogram(histogram):
+    """Bars of a pre-binned histogram, each as wide as its bin"""
+    fig = px.bar(histogram, x='roas', y='count', title="ROAS Distribution")
+    fig.update_traces(width=(histogram['bin_end'] - histogram['bin_start']).tolist())
+    return fig
 
 def show_overview(processor):
     """Display overview page with summary metrics"""
     st.header("📊 Overview")
     
-    # Get summary statistics
+    # Get summary statistics, and the same figures for the preceding period of
+    # equal length (both answered from the prefix-sum index where possible)
     summary = processor.get_summary_stats()
+    previous = processor.get_previous_period_stats()
     
     # Display key metrics
     col1, col2, col3, col4 = st.columns(4)
@@ -226,44 +259,47 @@ def show_overview(processor):
         st.metric(
             label="Total Revenue",
             value=f"₹{summary['total_revenue']:,.0f}",
-            delta=None
+            delta=period_delta(summary, previous, 'total_revenue')
         )
     
     with col2:
         st.metric(
             label="Total Orders",
             value=f"{summary['total_orders']:,.0f}",
-            delta=None
+            delta=period_delta(summary, previous, 'total_orders')
         )
     
     with col3:
         st.metric(
             label="Overall ROAS",
             value=f"{summary['overall_roas']:.2f}x",
-            delta=None
+            delta=period_delta(summary, previous, 'overall_roas')
         )
     
     with col4:
         st.metric(
             label="Total Influencers",
             value=f"{summary['total_influencers']:,.0f}",
-            delta=None
+            delta=period_delta(summary, previous, 'total_influencers')
         )
     
+    if previous is not None:
+        st.caption("Changes compare with the preceding period of the same length.")
+    
     # Revenue and ROAS trends
     col1, col2 = st.columns(2)
     
     with col1:
         st.subheader("Revenue Trend")
         time_series = processor.get_time_series_data()
-        fig = px.line(time_series, x='date', y='revenue', title="Daily Revenue")
-        fig.update_layout(height=400)
+        fig = cached_figure(px.line, time_series, x='date', y='revenue', title="Daily Revenue",
+                            layout=dict(height=400))
         st.plotly_chart(fig, use_container_width=True)
     
     with col2:
         st.subheader("ROAS Trend")
-        fig = px.line(time_series, x='date', y='roas', title="Daily ROAS")
-        fig.update_layout(height=400)
+        fig = cached_figure(px.line, time_series, x='date', y='roas', title="Daily ROAS",
+                            layout=dict(height=400))
         st.plotly_chart(fig, use_container_width=True)
     
     # Platform and campaign performance
@@ -272,15 +308,15 @@ def show_overview(processor):
     with col1:
         st.subheader("Revenue by Platform")
         platform_perf = processor.get_platform_performance()
-        fig = px.pie(platform_perf, values='revenue', names='platform', title="Revenue Distribution by Platform")
-        fig.update_layout(height=400)
+        fig = cached_figure(px.pie, platform_perf, values='revenue', names='platform',
+                            title="Revenue Distribution by Platform", layout=dict(height=400))
         st.plotly_chart(fig, use_container_width=True)
     
     with col2:
         st.subheader("Revenue by Campaign")
         campaign_perf = processor.get_campaign_performance()
-        fig = px.bar(campaign_perf, x='campaign', y='revenue', title="Revenue by Campaign")
-        fig.update_layout(height=400)
+        fig = cached_figure(px.bar, campaign_perf, x='campaign', y='revenue', title="Revenue by Campaign",
+                            layout=dict(height=400))
         st.plotly_chart(fig, use_container_width=True)
 
 def show_campaign_performance(processor):
@@ -297,16 +333,13 @@ def show_campaign_performance(processor):
     
     with col1:
         st.subheader("Revenue vs Spend by Campaign")
-        fig = go.Figure()
-        fig.add_trace(go.Bar(name='Revenue', x=campaign_perf['campaign'], y=campaign_perf['revenue']))
-        fig.add_trace(go.Bar(name='Spend', x=campaign_perf['campaign'], y=campaign_perf['total_payout']))
-        fig.update_layout(barmode='group', height=400)
+        fig = cached_figure(revenue_spend_bars, campaign_perf, layout=dict(height=400))
         st.plotly_chart(fig, use_container_width=True)
     
     with col2:
         st.subheader("ROAS by Campaign")
-        fig = px.bar(campaign_perf, x='campaign', y='roas', title="ROAS by Campaign")
-        fig.update_layout(height=400)
+        fig = cached_figure(px.bar, campaign_perf, x='campaign', y='roas', title="ROAS by Campaign",
+                            layout=dict(height=400))
         st.plotly_chart(fig, use_container_width=True)
     
     # Product performance
@@ -316,15 +349,14 @@ def show_campaign_performance(processor):
     col1, col2 = st.columns(2)
     
     with col1:
-        fig = px.bar(product_perf, x='product', y='revenue', title="Revenue by Product")
-        fig.update_xaxes(tickangle=45)
-        fig.update_layout(height=400)
+        fig = cached_figure(px.bar, product_perf, x='product', y='revenue', title="Revenue by Product",
+                            layout=dict(height=400, xaxis_tickangle=45))
         st.plotly_chart(fig, use_container_width=True)
     
     with col2:
-        fig = px.scatter(product_perf, x='orders', y='revenue', size='roas', 
-                        hover_name='product', title="Orders vs Revenue (Size = ROAS)")
-        fig.update_layout(height=400)
+        fig = cached_figure(px.scatter, product_perf, x='orders', y='revenue', size='roas',
+                            hover_name='product', title="Orders vs Revenue (Size = ROAS)",
+                            layout=dict(height=400))
         st.plotly_chart(fig, use_container_width=True)
 
 def show_roi_analysis(processor):
@@ -349,21 +381,29 @@ def show_roi_analysis(processor):
         profitable_influencers = (influencer_metrics['roas'] > 1).sum()
         st.metric("Profitable Influencers", f"{profitable_influencers}/{len(influencer_metrics)}")
     
+    # ROAS percentiles, read from the quantile sketch
+    percentiles = processor.get_percentiles('roas').iloc[0]
+    col1, col2, col3 = st.columns(3)
+    for col, label in zip([col1, col2, col3], ['p50', 'p90', 'p99']):
+        with col:
+            st.metric(f"ROAS {label}", f"{percentiles[label]:.2f}x")
+    
     # ROAS distribution
     col1, col2 = st.columns(2)
     
     with col1:
         st.subheader("ROAS Distribution")
-        fig = px.histogram(influencer_metrics, x='roas', nbins=20, title="ROAS Distribution")
-        fig.update_layout(height=400)
+        # Pre-binned, so the chart carries one bar per bin however many influencers there are
+        histogram = processor.get_histogram('roas')
+        histogram['roas'] = (histogram['bin_start'] + histogram['bin_end']) / 2
+        fig = cached_figure(roas_histogram, histogram, layout=dict(height=400, bargap=0))
         st.plotly_chart(fig, use_container_width=True)
     
     with col2:
         st.subheader("ROAS vs Revenue")
-        fig = px.scatter(influencer_metrics, x='revenue', y='roas', 
-                        size='follower_count', color='platform',
-                        hover_name='name', title="ROAS vs Revenue")
-        fig.update_layout(height=400)
+        fig = cached_figure(adaptive_scatter, influencer_metrics, x='revenue', y='roas',
+                            size='follower_count', color='platform',
+                            hover_name='name', title="ROAS vs Revenue", layout=dict(height=400))
         st.plotly_chart(fig, use_container_width=True)
     
     # Platform and category analysis
@@ -371,16 +411,16 @@ def show_roi_analysis(processor):
     
     with col1:
         st.subheader("ROAS by Platform")
-        platform_roas = influencer_metrics.groupby('platform')['roas'].mean().reset_index()
-        fig = px.bar(platform_roas, x='platform', y='roas', title="Average ROAS by Platform")
-        fig.update_layout(height=400)
+        platform_roas = influencer_metrics.groupby('platform', observed=True)['roas'].mean().reset_index()
+        fig = cached_figure(px.bar, platform_roas, x='platform', y='roas', title="Average ROAS by Platform",
+                            layout=dict(height=400))
         st.plotly_chart(fig, use_container_width=True)
     
     with col2:
         st.subheader("ROAS by Category")
-        category_roas = influencer_metrics.groupby('category')['roas'].mean().reset_index()
-        fig = px.bar(category_roas, x='category', y='roas', title="Average ROAS by Category")
-        fig.update_layout(height=400)
+        category_roas = influencer_metrics.groupby('category', observed=True)['roas'].mean().reset_index()
+        fig = cached_figure(px.bar, category_roas, x='category', y='roas', title="Average ROAS by Category",
+                            layout=dict(height=400))
         st.plotly_chart(fig, use_container_width=True)
 
 def show_influencer_insights(processor):
@@ -406,10 +446,9 @@ def show_influencer_insights(processor):
     
     # Follower count vs performance
     st.subheader("Follower Count vs Performance")
-    fig = px.scatter(influencer_metrics, x='follower_count', y='roas', 
-                    color='platform', size='revenue',
-                    hover_name='name', title="Follower Count vs ROAS")
-    fig.update_layout(height=500)
+    fig = cached_figure(adaptive_scatter, influencer_metrics, x='follower_count', y='roas',
+                        color='platform', size='revenue',
+                        hover_name='name', title="Follower Count vs ROAS", layout=dict(height=500))
     st.plotly_chart(fig, use_container_width=True)
     
     # Engagement analysis
@@ -417,23 +456,22 @@ def show_influencer_insights(processor):
     
     with col1:
         st.subheader("Engagement Rate vs ROAS")
-        fig = px.scatter(influencer_metrics, x='engagement_rate', y='roas', 
-                        color='category', hover_name='name',
-                        title="Engagement Rate vs ROAS")
-        fig.update_layout(height=400)
+        fig = cached_figure(adaptive_scatter, influencer_metrics, x='engagement_rate', y='roas',
+                            color='category', hover_name='name',
+                            title="Engagement Rate vs ROAS", layout=dict(height=400))
         st.plotly_chart(fig, use_container_width=True)
     
     with col2:
         st.subheader("Gender Distribution")
-        gender_perf = influencer_metrics.groupby('gender').agg({
+        gender_perf = influencer_metrics.groupby('gender', observed=True).agg({
             'roas': 'mean',
             'revenue': 'sum',
             'name': 'count'
         }).reset_index()
         gender_perf.rename(columns={'name': 'count'}, inplace=True)
         
-        fig = px.bar(gender_perf, x='gender', y='count', title="Influencer Count by Gender")
-        fig.update_layout(height=400)
+        fig = cached_figure(px.bar, gender_perf, x='gender', y='count', title="Influencer Count by Gender",
+                            layout=dict(height=400))
         st.plotly_chart(fig, use_container_width=True)
 
 def show_payout_tracking(processor):
@@ -457,30 +495,22 @@ def show_payout_tracking(processor):
     
     # Payout basis analysis
     influencer_metrics = processor.calculate_roas()
-    merged_df = processor.merged_df
     
     # Get payout basis distribution
-    payout_basis = merged_df.groupby('basis').agg({
-        'total_payout': 'sum',
-        'influencer_id': 'nunique',
-        'revenue': 'sum'
-    }).reset_index()
-    payout_basis['avg_payout'] = payout_basis['total_payout'] / payout_basis['influencer_id']
-    payout_basis['roas'] = payout_basis['revenue'] / payout_basis['total_payout']
+    payout_basis = processor.get_payout_basis_performance()
     
     col1, col2 = st.columns(2)
     
     with col1:
         st.subheader("Payout by Basis")
-        fig = px.pie(payout_basis, values='total_payout', names='basis', 
-                    title="Total Payout Distribution by Basis")
-        fig.update_layout(height=400)
+        fig = cached_figure(px.pie, payout_basis, values='total_payout', names='basis',
+                            title="Total Payout Distribution by Basis", layout=dict(height=400))
         st.plotly_chart(fig, use_container_width=True)
     
     with col2:
         st.subheader("ROAS by Payout Basis")
-        fig = px.bar(payout_basis, x='basis', y='roas', title="ROAS by Payout Basis")
-        fig.update_layout(height=400)
+        fig = cached_figure(px.bar, payout_basis, x='basis', y='roas', title="ROAS by Payout Basis",
+                            layout=dict(height=400))
         st.plotly_chart(fig, use_container_width=True)
     
     # Detailed payout table
@@ -492,10 +522,9 @@ def show_payout_tracking(processor):
     
     # Payout efficiency
     st.subheader("Payout Efficiency Analysis")
-    fig = px.scatter(influencer_metrics, x='total_payout', y='revenue', 
-                    color='platform', size='roas',
-                    hover_name='name', title="Payout vs Revenue (Size = ROAS)")
-    fig.update_layout(height=500)
+    fig = cached_figure(adaptive_scatter, influencer_metrics, x='total_payout', y='revenue',
+                        color='platform', size='roas',
+                        hover_name='name', title="Payout vs Revenue (Size = ROAS)", layout=dict(height=500))
     st.plotly_chart(fig, use_container_width=True)
 
 if __name__ == "__main__":
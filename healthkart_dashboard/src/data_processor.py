@@ -1,88 +1,852 @@
+import copy
+import os
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
+from columnar_cache import ColumnarCache
+from schema import SCHEMA_VERSION, apply_schema, memory_footprint, parse_csv_rows, read_csv_dtypes, sort_table
+from streaming import CELL_KEYS, aggregate_cells, align_categories, estimate_chunk_rows, fold_cells, stream_tracking_cells
+from cube import CUBE_ATTRIBUTES, CUBE_KEYS, build_cube, cube_stats, fold_cube
+from result_cache import LRUCache, fingerprint, normalize_filters
+from bitmap_index import bitmap_positions, build_bitmap_indexes, select_bitmap
+from date_index import DateIndex
+from dictionary import DICTIONARY_KEYS, DictionaryRegistry, lookup, remap
+from prefix_index import PREFIX_MAX_MEMBERS, ActiveDays, PrefixSumIndex
+from kernels import combine_codes, encode_column, encode_columns, rollup, split_codes
+from distinct import DEFAULT_DISTINCT_ERROR, DistinctSketch
+from quantiles import HISTOGRAM_BINS, QuantileSketch
+from partitions import PARALLEL_MIN_CELLS, PartitionPool, month_partitions
+from reports import ReportSnapshot
 
-class DataProcessor:
-    def __init__(self, data_dir='/home/ubuntu/healthkart_dashboard/data'):
+# Influencer attributes carried by the dimension table, in merged-output order
+INFLUENCER_ATTRIBUTES = [
+    'name', 'category', 'gender', 'follower_count', 'platform',
+    'basis', 'rate', 'payout_orders', 'total_payout', 'reach', 'likes', 'comments'
+]
+
+# Sidebar filters; every one of them is a column of the daily cube
+FILTER_COLUMNS = ['platform', 'category', 'gender', 'campaign', 'product']
+
+# The empty grouping set: one row of overall totals
+GRAND_TOTAL = 'total'
+# Rollups the dashboard pages and reports ask for, computed together in one scan
+STANDARD_ROLLUPS = (GRAND_TOTAL, 'campaign', 'product', 'platform', 'basis', 'date')
+# Cube columns dictionary-encoded at load for the bincount kernels
+ENCODED_KEYS = CUBE_KEYS + CUBE_ATTRIBUTES
+# Measures accumulated per day in the prefix-sum index
+PREFIX_MEASURES = ['revenue', 'orders', 'spend', 'events']
+# Reads of tracking_data.csv retried when an append lands mid-load
+TRACKING_LOAD_ATTEMPTS = 3
+MERGE_CHUNK_ROWS = 100_000
+# Scope fingerprint of the unfiltered cube (no effective filters)
+ALL_CELLS = fingerprint(normalize_filters({}))
+
+def dimension_keys(dim):
+    """Columns a rollup dimension groups by: none for GRAND_TOTAL, several for a tuple"""
+    if dim == GRAND_TOTAL:
+        return ()
+    if isinstance(dim, tuple):
+        return dim
+    return (dim,)
+
+def spread_payouts(dim):
+    """Set payout_per_event: each influencer's payout spread evenly over its tracked events"""
+    # Tracked influencers without a payout row (e.g. ids posted to the ingest service) cost nothing
+    payout = dim['total_payout'].fillna(0.0)
+    dim['payout_per_event'] = (payout / dim['tracked_events']).where(dim['tracked_events'] > 0, 0.0)
+    return dim
+
+class MetricsMixin:
+    """Metric methods over a set of daily cube cells
+    
+    DataProcessor answers them over every cell and FilteredView over a
+    selection. Both hand their scope to the processor, which caches results
+    by data version and scope fingerprint.
+    """
+    __slots__ = ()
+    
+    def _scope(self):
+        """(processor, cell positions or None for every cell, scope fingerprint)"""
+        raise NotImplementedError
+    
+    def _filters(self):
+        """Normalized filters that select the cells in scope"""
+        raise NotImplementedError
+    
+    def calculate_roas(self, baseline_revenue_pct=0.1):
+        """Calculate ROAS and Incremental ROAS"""
+        processor, positions, scope = self._scope()
+        return processor._roas(positions, scope, baseline_revenue_pct)
+    
+    def get_rollups(self, dimensions=STANDARD_ROLLUPS):
+        """Compute the rollup for every requested dimension in one scan of the cells (grouping sets)
+        
+        The cells in scope are aggregated once to the finest grain the requested
+        dimensions need (plus influencer, for distinct counts); each rollup is
+        then a small groupby over that base. GRAND_TOTAL requests the empty
+        grouping set and a tuple of columns requests their combination.
+        Results are cached per scope, and a scan always fills in the standard
+        rollups too, so the methods that read them back one at a time share a
+        single pass.
+        """
+        processor, positions, scope = self._scope()
+        return processor._rollups(positions, scope, dimensions)
+    
+    def get_campaign_performance(self):
+        """Get campaign-level performance metrics"""
+        return self.get_rollups(['campaign'])['campaign']
+    
+    def get_product_performance(self):
+        """Get product-level performance metrics"""
+        return self.get_rollups(['product'])['product']
+    
+    def get_platform_performance(self):
+        """Get platform-level performance metrics"""
+        return self.get_rollups(['platform'])['platform']
+    
+    def get_payout_basis_performance(self):
+        """Get payout-basis (post/order) performance metrics"""
+        basis_metrics = self.get_rollups(['basis'])['basis']
+        basis_metrics['avg_payout'] = basis_metrics['total_payout'] / basis_metrics['num_influencers']
+        return basis_metrics
+    
+    def get_time_series_data(self, groupby_column='date'):
+        """Get time series data for performance tracking"""
+        if groupby_column == 'date':
+            processor = self._scope()[0]
+            time_series = processor._prefix_time_series(self._filters())
+            if time_series is not None:
+                return time_series
+        time_series = self.get_rollups([groupby_column])[groupby_column]
+        return time_series.drop(columns=['num_influencers', 'unique_buyers'], errors='ignore')
+    
+    def get_distribution(self, metric='roas', dimension=None):
+        """Quantile sketches of a per-influencer metric (roas, revenue or total_payout)
+        
+        Keyed by member of `dimension` (platform, category or gender), or
+        GRAND_TOTAL without one. Sketches of several members merge into the
+        sketch of their union.
+        """
+        processor, positions, scope = self._scope()
+        return processor._distributions(positions, scope, metric, dimension)
+    
+    def get_percentiles(self, metric='roas', percentiles=(50, 90, 99), dimension=None):
+        """Percentiles of a per-influencer metric from its sketches, one row per member"""
+        sketches = self.get_distribution(metric, dimension)
+        quantiles = np.asarray(percentiles, dtype=np.float64) / 100
+        frame = pd.DataFrame(
+            [sketch.quantiles(quantiles) for sketch in sketches.values()],
+            index=pd.Index(list(sketches), name=dimension or GRAND_TOTAL),
+            columns=[f'p{p:g}' for p in percentiles],
+        )
+        frame['count'] = [sketch.count for sketch in sketches.values()]
+        return frame
+    
+    def get_histogram(self, metric='roas', bins=HISTOGRAM_BINS):
+        """Pre-binned distribution of a per-influencer metric: one row per bin, however many influencers"""
+        return self.get_distribution(metric)[GRAND_TOTAL].histogram(bins)
+    
+    def get_top_performers(self, metric='roas', top_n=10):
+        """Get top performing influencers based on specified metric"""
+        influencer_metrics = self.calculate_roas()
+        return influencer_metrics.nlargest(top_n, metric)
+    
+    def get_underperformers(self, metric='roas', bottom_n=10):
+        """Get underperforming influencers based on specified metric"""
+        influencer_metrics = self.calculate_roas()
+        return influencer_metrics.nsmallest(bottom_n, metric)
+    
+    def get_summary_stats(self):
+        """Get overall summary statistics"""
+        processor = self._scope()[0]
+        totals = processor._prefix_summary(self._filters())
+        if totals is None:
+            totals = self.get_rollups([GRAND_TOTAL])[GRAND_TOTAL]
+            if totals.empty:
+                totals.loc[0] = 0
+            totals = {column: totals[column].iloc[0] for column in totals.columns}
+        
+        total_revenue = totals['revenue']
+        total_orders = totals['orders']
+        total_spend = totals['total_payout']
+        total_influencers = totals['num_influencers']
+        unique_buyers = totals.get('unique_buyers')
+        if unique_buyers is None:
+            unique_buyers = processor._distinct_total('user_id', self._scope()[1])
+        overall_roas = total_revenue / total_spend if total_spend > 0 else 0
+        
+        return {
+            'total_revenue': total_revenue,
+            'total_orders': total_orders,
+            'total_spend': total_spend,
+            'total_influencers': total_influencers,
+            'unique_buyers': unique_buyers,
+            'overall_roas': overall_roas,
+            'avg_order_value': total_revenue / total_orders if total_orders > 0 else 0
+        }
+    
+    def get_report_snapshot(self):
+        """Figures shared by every report format (see ReportSnapshot), built once per scope"""
+        processor, _, scope = self._scope()
+        cache_key = (processor.data_version, scope)
+        snapshot = processor._report_cache.get(cache_key)
+        if snapshot is None:
+            snapshot = ReportSnapshot(self)
+            processor._report_cache.put(cache_key, snapshot)
+        return snapshot
+    
+    def get_previous_period_stats(self):
+        """Summary statistics over the equally long window just before this one, or None"""
+        processor = self._scope()[0]
+        filters = dict(self._filters())
+        window = processor._previous_window(filters.get('date_range'))
+        if window is None:
+            return None
+        filters['date_range'] = window
+        return processor.filter_data(filters).get_summary_stats()
+
+class DataProcessor(MetricsMixin):
+    def __init__(self, data_dir='/home/ubuntu/healthkart_dashboard/data', use_cache=True,
+                 streaming=False, memory_budget_mb=512, chunk_rows=None, roas_cache_size=32,
+                 use_kernels=True, workers=None, distinct_error=DEFAULT_DISTINCT_ERROR):
         self.data_dir = data_dir
+        self.cache = ColumnarCache(data_dir) if use_cache else None
+        # Streaming mode never holds tracking_data.csv in memory: it is read in
+        # chunks sized to memory_budget_mb (or chunk_rows) and kept as cells
+        self.streaming = streaming
+        self.memory_budget_mb = memory_budget_mb
+        self.chunk_rows = chunk_rows
+        self.stream_stats = None
         self.influencers_df = None
         self.posts_df = None
         self.tracking_data_df = None
+        self.tracking_cells = None
+        # Bytes of tracking_data.csv already folded in; ingest_tail reads from here
+        self.tracking_offset = 0
+        self.tracking_columns = None
         self.payouts_df = None
+        self.dictionary = None
+        self.influencer_dim = None
+        self.cube = None
+        self.cube_stats = None
+        self.cube_indexes = None
+        self.cube_date_index = None
+        # Integer codes and labels per cube key; rollups over them use bincount
+        # kernels instead of pandas' hash groupby (use_kernels=False to compare)
+        self.cube_codes = None
+        self.use_kernels = use_kernels
+        # With workers > 1, kernel aggregations over large selections run on
+        # month partitions of the cube in a process pool
+        self.workers = workers
+        self.parallel_min_cells = PARALLEL_MIN_CELLS
+        self.partition_pool = None
+        # Per-cell distinct sketches of influencers and buyers; columns with
+        # few distinct values are exact, others HyperLogLog within
+        # distinct_error (None keeps every sketch exact)
+        self.distinct_error = distinct_error
+        self.distinct_sketches = {}
+        self.prefix_index = None
+        self.influencer_days = None
+        self.tracking_date_index = None
         self.merged_df = None
+        # Results keyed by data version and scope (plus baseline for ROAS)
+        self.data_version = 0
+        self._rollup_cache = LRUCache(roas_cache_size)
+        self._roas_cache = LRUCache(roas_cache_size)
+        self._distribution_cache = LRUCache(roas_cache_size)
+        self._report_cache = LRUCache(roas_cache_size)
         
+    def _read_table(self, name):
+        """Read one table in its declared schema, through the columnar cache when enabled"""
+        def read_csv(path):
+            # Categoricals are parsed directly; ints are downcast and dates parsed afterwards
+            df = pd.read_csv(path, dtype=read_csv_dtypes(name))
+            return sort_table(apply_schema(df, name), name)
+        
+        if self.cache is not None:
+            return self.cache.load(name, read_csv, version=SCHEMA_VERSION)
+        return read_csv(f'{self.data_dir}/{name}.csv')
+    
     def load_data(self):
         """Load all CSV files into DataFrames"""
         try:
-            self.influencers_df = pd.read_csv(f'{self.data_dir}/influencers.csv')
-            self.posts_df = pd.read_csv(f'{self.data_dir}/posts.csv')
-            self.tracking_data_df = pd.read_csv(f'{self.data_dir}/tracking_data.csv')
-            self.payouts_df = pd.read_csv(f'{self.data_dir}/payouts.csv')
-            
-            # Convert date columns to datetime
-            self.posts_df['date'] = pd.to_datetime(self.posts_df['date'])
-            self.tracking_data_df['date'] = pd.to_datetime(self.tracking_data_df['date'])
+            self.influencers_df = self._read_table('influencers')
+            self.posts_df = self._read_table('posts')
+            self._load_tracking_data()
+            self.payouts_df = self._read_table('payouts')
+            self.build_dictionary()
+            self.build_dimensions()
+            self.build_cube()
+            self.merged_df = None
+            self.invalidate_caches()
             
             return True
         except Exception as e:
             print(f"Error loading data: {e}")
             return False
     
-    def merge_data(self):
-        """Merge all DataFrames for comprehensive analysis"""
-        # Merge tracking data with influencers
-        merged = self.tracking_data_df.merge(
-            self.influencers_df, 
-            left_on='influencer_id', 
-            right_on='id', 
-            how='left'
-        )
+    def _tracking_path(self):
+        return f'{self.data_dir}/tracking_data.csv'
+    
+    def _load_tracking_data(self):
+        """Read tracking data and remember how many bytes of the file it covers"""
+        path = self._tracking_path()
+        for _ in range(TRACKING_LOAD_ATTEMPTS):
+            size = os.path.getsize(path)
+            if self.streaming:
+                self._stream_tracking_data()
+            else:
+                self.tracking_data_df = self._read_table('tracking_data')
+            # An append during the read would otherwise be ingested twice
+            if os.path.getsize(path) == size:
+                break
+        if not self.streaming:
+            self.tracking_date_index = DateIndex(self.tracking_data_df['date'])
+        self.tracking_offset = size
+        self.tracking_columns = list(pd.read_csv(path, nrows=0).columns)
+    
+    def has_new_tracking_data(self):
+        """True when tracking_data.csv has changed size since it was last read"""
+        return os.path.getsize(self._tracking_path()) != self.tracking_offset
+    
+    def ingest_tail(self):
+        """Fold rows appended to tracking_data.csv since the last load or ingest
         
-        # Merge with payouts
-        merged = merged.merge(
-            self.payouts_df, 
-            on='influencer_id', 
-            how='left'
-        )
+        Only the appended byte range is read; a partially written last line is
+        left for the next call. The rows are folded into the tracking facts,
+        dictionaries, influencer dimension, cube and its indexes, and the data
+        version moves on so cached results are recomputed. A file that shrank
+        was rewritten, so it is loaded in full. Returns the number of rows
+        ingested, or None on error.
+        """
+        path = self._tracking_path()
+        try:
+            size = os.path.getsize(path)
+            if size < self.tracking_offset:
+                print("tracking_data.csv was rewritten; reloading it in full")
+                return self.cube_stats['events'] if self.load_data() else None
+            if size == self.tracking_offset:
+                return 0
+            
+            with open(path, 'rb') as f:
+                f.seek(self.tracking_offset)
+                data = f.read(size - self.tracking_offset)
+            complete = data.rfind(b'\n') + 1
+            if complete == 0:
+                return 0
+            
+            rows = parse_csv_rows(data[:complete], 'tracking_data', self.tracking_columns)
+            self._fold_tracking_rows(rows)
+            self.tracking_offset += complete
+            return len(rows)
+        except Exception as e:
+            print(f"Error ingesting tracking data: {e}")
+            return None
+    
+    def _fold_tracking_rows(self, rows):
+        """Fold parsed tracking rows into every structure derived from tracking data
+        
+        Frames are replaced, never modified in place, so a clone() taken
+        before the fold keeps answering from the old data. Rows whose labels
+        are all known, new buyers aside, are appended incrementally; others
+        rebuild the dictionaries and everything derived from them.
+        """
+        if not self._append_tracking_rows(rows):
+            self._rebuild_with_rows(rows)
+        self.merged_df = None
+        self.invalidate_caches()
+    
+    def _append_tracking_rows(self, rows):
+        """Fold rows without a rebuild; False, with nothing changed, when their labels need one
+        
+        Tracking facts and cube cells are date-sorted and a tail almost always
+        holds the newest days, so everything before the first day of the rows
+        is kept: only the cells of that day onward are regrouped, and the
+        indexes, prefix sums and sketches are recomputed from there and
+        spliced onto the kept part. New buyers extend the user dictionary in
+        place of a rebuild. New events change their influencers' payout per
+        event on every day, so spend is derived again for every cell, and its
+        prefix sums summed over every day.
+        """
+        if not len(rows) or not len(self.cube):
+            return False
+        extended = self._extend_dictionary(rows)
+        if extended is None:
+            return False
+        dictionary, user_codes = extended
+        previous = copy.copy(self)
+        rows = dictionary.apply(rows.copy(deep=False), 'tracking_data')
+        first_date = rows['date'].min()
+        
+        tracking_start = None
+        if self.streaming:
+            cells = self.tracking_cells
+            start = int(cells['date'].searchsorted(first_date))
+            tail = fold_cells(cells.iloc[start:].copy(deep=False), aggregate_cells(rows))
+            self.tracking_cells = pd.concat([cells.iloc[:start], tail.sort_values(CELL_KEYS)], ignore_index=True)
+            self.stream_stats = {
+                **self.stream_stats,
+                'events': self.stream_stats['events'] + len(rows),
+                'cells': len(self.tracking_cells),
+            }
+        else:
+            tracking = self.tracking_data_df
+            if user_codes is not None:
+                tracking = tracking.assign(user_id=remap(tracking['user_id'], dictionary.dtypes['user'], user_codes))
+            day = self.tracking_date_index.first_day(first_date)
+            tracking_start = int(self.tracking_date_index.offsets[day])
+            tail = pd.concat([tracking.iloc[tracking_start:], rows], ignore_index=True)
+            tail = dictionary.apply(sort_table(tail, 'tracking_data'), 'tracking_data')
+            tracking = pd.concat([tracking.iloc[:tracking_start], tail], ignore_index=True)
+            self.tracking_data_df = dictionary.apply(tracking, 'tracking_data')
+            self.tracking_date_index = self.tracking_date_index.splice(day, tail['date'])
+        self.dictionary = dictionary
+        
+        dim = self.influencer_dim.copy()
+        codes = dictionary.encode('influencer', rows['influencer_id'])
+        dim['tracked_events'] += np.bincount(codes, minlength=len(dim))
+        self.influencer_dim = spread_payouts(dim)
+        
+        day = previous.cube_date_index.first_day(first_date)
+        start = int(previous.cube_date_index.offsets[day])
+        tail = fold_cube(previous.cube.iloc[start:], rows, self.influencer_dim, dictionary)
+        cube = pd.concat([previous.cube.iloc[:start], tail], ignore_index=True)
+        codes = np.concatenate([previous.cube_codes['influencer_id'][0][:start],
+                                dictionary.encode('influencer', tail['influencer_id'])])
+        cube['spend'] = cube['events'].to_numpy() * self.influencer_dim['payout_per_event'].to_numpy()[codes]
+        self.cube = cube
+        self._splice_cube_index(previous, day, start, tracking_start)
+        return True
+    
+    def _extend_dictionary(self, rows):
+        """The dictionary with the buyers first seen in `rows` added, plus the old -> new user
+        code map (None when no buyer is new); None when rows hold any other unseen label"""
+        dictionary = self.dictionary
+        if (dictionary.encode('influencer', rows['influencer_id']) < 0).any():
+            return None
+        for key, occurrences in DICTIONARY_KEYS.items():
+            if key in ('influencer', 'user'):
+                continue
+            for table, column in occurrences:
+                if table == 'tracking_data' and column in rows.columns:
+                    if (lookup(dictionary.labels[key], rows[column].dropna().unique()) < 0).any():
+                        return None
+        if 'user' not in dictionary.labels or 'user_id' not in rows.columns:
+            return dictionary, None
+        return dictionary.extend('user', rows['user_id'].dropna().unique())
+    
+    def _rebuild_with_rows(self, rows):
+        """Fold rows by rebuilding the dictionaries, dimension, cube and indexes from every fact"""
+        previous_cube = self.cube
+        if self.streaming:
+            cells = self.tracking_cells.copy(deep=False)
+            new_cells = aggregate_cells(rows)
+            self.tracking_cells = fold_cells(cells, new_cells).sort_values(CELL_KEYS, ignore_index=True)
+            self.stream_stats = {
+                **self.stream_stats,
+                'events': int(self.tracking_cells['events'].sum()),
+                'cells': len(self.tracking_cells),
+            }
+        else:
+            tracking = self.tracking_data_df.copy(deep=False)
+            rows = rows.copy(deep=False)
+            align_categories(tracking, rows, [column for column in rows.columns
+                                              if isinstance(rows[column].dtype, pd.CategoricalDtype)])
+            tracking = pd.concat([tracking, rows], ignore_index=True)
+            self.tracking_data_df = sort_table(tracking, 'tracking_data')
+            self.tracking_date_index = DateIndex(self.tracking_data_df['date'])
         
-        # Add post metrics by aggregating posts per influencer
+        self.build_dictionary()
+        self.build_dimensions()
+        # Only the new rows are aggregated; existing cells are folded as cells
+        cells = previous_cube[CUBE_KEYS + ['revenue', 'orders', 'events']].copy(deep=False)
+        cube = self.dictionary.apply(cells, 'tracking_data')
+        rows = self.dictionary.apply(rows.copy(deep=False), 'tracking_data')
+        self.cube = fold_cube(cube, rows, self.influencer_dim, self.dictionary)
+        self.index_cube()
+    
+    def clone(self):
+        """Shallow copy sharing the loaded frames, with result caches of its own"""
+        clone = copy.copy(self)
+        clone._rollup_cache = LRUCache(self._rollup_cache.maxsize)
+        clone._roas_cache = LRUCache(self._roas_cache.maxsize)
+        clone._distribution_cache = LRUCache(self._distribution_cache.maxsize)
+        clone._report_cache = LRUCache(self._report_cache.maxsize)
+        return clone
+    
+    def _stream_tracking_data(self):
+        """Fold tracking_data.csv into per-cell aggregates, one bounded chunk at a time"""
+        path = self._tracking_path()
+        chunk_rows = self.chunk_rows or estimate_chunk_rows(path, self.memory_budget_mb)
+        self.tracking_cells, chunks = stream_tracking_cells(path, chunk_rows)
+        self.stream_stats = {
+            'chunk_rows': chunk_rows,
+            'chunks': chunks,
+            'events': int(self.tracking_cells['events'].sum()),
+            'cells': len(self.tracking_cells),
+        }
+    
+    def _fact_table(self):
+        """Tracking facts: raw rows, or aggregated cells in streaming mode"""
+        return self.tracking_cells if self.streaming else self.tracking_data_df
+    
+    def build_dictionary(self):
+        """Give every logical key one code space across all four tables"""
+        tables = {
+            'influencers': self.influencers_df,
+            'posts': self.posts_df,
+            'tracking_data': self._fact_table(),
+            'payouts': self.payouts_df,
+        }
+        self.dictionary = DictionaryRegistry(tables)
+        # Recoded into shallow copies, so frames shared with a clone() stay untouched
+        self.influencers_df = self.dictionary.apply(self.influencers_df.copy(deep=False), 'influencers')
+        self.posts_df = self.dictionary.apply(self.posts_df.copy(deep=False), 'posts')
+        self.payouts_df = self.dictionary.apply(self.payouts_df.copy(deep=False), 'payouts')
+        if self.streaming:
+            self.tracking_cells = self.dictionary.apply(self.tracking_cells.copy(deep=False), 'tracking_data')
+        else:
+            self.tracking_data_df = self.dictionary.apply(self.tracking_data_df.copy(deep=False), 'tracking_data')
+        return self.dictionary
+    
+    def build_dimensions(self):
+        """Build the influencer dimension: one indexed row per influencer
+        
+        Joins profile, payout terms and per-influencer post totals, and spreads
+        each payout evenly over that influencer's tracked events so any rollup
+        attributes the payout exactly once across its groups. Row i holds the
+        influencer with dictionary code i, so lookups are array indexing.
+        """
         post_metrics = self.posts_df.groupby('influencer_id').agg({
             'reach': 'sum',
             'likes': 'sum',
             'comments': 'sum'
-        }).reset_index()
+        })
+        payouts = self.payouts_df.set_index('influencer_id').rename(columns={'orders': 'payout_orders'})
+        
+        dim = self.influencers_df.set_index('id').rename_axis('influencer_id')
+        dim = dim.join(payouts).join(post_metrics)
+        dim = dim.reindex(self.dictionary.labels['influencer']).rename_axis('influencer_id')
         
-        merged = merged.merge(
-            post_metrics, 
-            on='influencer_id', 
-            how='left'
+        facts = self._fact_table()
+        codes = self.dictionary.encode('influencer', facts['influencer_id'])
+        events = facts['events'].to_numpy() if 'events' in facts.columns else None
+        dim['tracked_events'] = np.bincount(codes, weights=events, minlength=len(dim)).astype(np.int64)
+        
+        self.influencer_dim = spread_payouts(dim)
+        return dim
+    
+    def build_cube(self):
+        """Materialize the daily cube every filter and rollup is answered from"""
+        self.cube = build_cube(self._fact_table(), self.influencer_dim, self.dictionary)
+        self.index_cube()
+        return self.cube
+    
+    def index_cube(self):
+        """Cell statistics, filter and date indexes, key codes and prefix sums for the cube"""
+        self.cube_stats = self._cube_stats()
+        self.cube_indexes = build_bitmap_indexes(self.cube, FILTER_COLUMNS)
+        # Cells are grouped date-first, so the cube is already sorted by date
+        self.cube_date_index = DateIndex(self.cube['date'])
+        self.cube_codes = encode_columns(self.cube, ENCODED_KEYS)
+        self.cube_codes['influencer_id'] = (
+            self.dictionary.encode('influencer', self.cube['influencer_id']),
+            self.dictionary.labels['influencer'],
         )
+        self.build_prefix_index()
+        self.build_distinct_sketches()
+        self.build_partition_pool()
+    
+    def _splice_cube_index(self, previous, day, start, tracking_start=None):
+        """index_cube() for a cube whose cells before `start`, the first of day `day`, are
+        those of `previous`; its structures are kept for those cells and extended"""
+        tail = self.cube.iloc[start:]
+        self.cube_stats = self._cube_stats()
+        self.cube_indexes = {column: index.splice(start, self.cube[column])
+                             for column, index in previous.cube_indexes.items()}
+        self.cube_date_index = previous.cube_date_index.splice(day, tail['date'])
+        tail_codes = encode_columns(tail, ENCODED_KEYS)
+        tail_codes['influencer_id'] = (
+            self.dictionary.encode('influencer', tail['influencer_id']),
+            self.dictionary.labels['influencer'],
+        )
+        self.cube_codes = {}
+        for key, (codes, labels) in tail_codes.items():
+            if key == 'date':
+                # Days before `day` keep their codes; the tail's days follow them
+                codes = codes + day
+                labels = previous.cube_codes[key][1][:day].append(labels)
+            self.cube_codes[key] = (np.concatenate([previous.cube_codes[key][0][:start], codes]), labels)
         
-        self.merged_df = merged
-        return merged
+        day_codes = self.cube_date_index.day_codes()
+        measures = {name: self.cube[name].to_numpy() for name in PREFIX_MEASURES}
+        self.prefix_index = previous.prefix_index.splice(start, day, self.cube_date_index.days, day_codes,
+                                                         self._prefix_keys(), measures, rebuild=['spend'])
+        self.influencer_days = previous.influencer_days.splice(start, day, self.cube_codes['influencer_id'][0],
+                                                               day_codes)
+        self.distinct_sketches = {}
+        for column, sketch in previous.distinct_sketches.items():
+            added = self._distinct_sketch(column, start, tracking_start)
+            # A dictionary grown past the exact limit changes precision, so that sketch starts over
+            self.distinct_sketches[column] = (sketch.splice(start, added) if added.precision == sketch.precision
+                                              else self._distinct_sketch(column))
+        self.build_partition_pool()
     
-    def calculate_roas(self, baseline_revenue_pct=0.1):
-        """Calculate ROAS and Incremental ROAS"""
-        if self.merged_df is None:
-            self.merge_data()
-        
-        # Group by influencer to calculate metrics
-        influencer_metrics = self.merged_df.groupby('influencer_id').agg({
-            'revenue': 'sum',
-            'orders_x': 'sum',  # orders from tracking_data
-            'total_payout': 'first',
-            'name': 'first',
-            'category': 'first',
-            'gender': 'first',
-            'follower_count': 'first',
-            'platform': 'first',
-            'reach': 'first',
-            'likes': 'first',
-            'comments': 'first'
-        }).reset_index()
-        
-        # Rename orders_x to orders for clarity
-        influencer_metrics.rename(columns={'orders_x': 'orders'}, inplace=True)
+    def _cube_stats(self):
+        """Cell statistics of the cube against the tracking events behind it"""
+        facts = self._fact_table()
+        events = facts['events'].sum() if 'events' in facts.columns else len(facts)
+        return cube_stats(self.cube, events)
+    
+    def build_prefix_index(self):
+        """Cumulative daily measures overall and per member of each filter column, plus influencer activity
+        
+        Only filter columns of at most PREFIX_MAX_MEMBERS members are indexed
+        densely; filters on others are answered by scanning. Influencers are
+        tracked sparsely, by the days each one has cells, which is all the
+        summary's active count needs.
+        """
+        day_codes = self.cube_date_index.day_codes()
+        measures = {name: self.cube[name].to_numpy() for name in PREFIX_MEASURES}
+        self.prefix_index = PrefixSumIndex(self.cube_date_index.days, day_codes, self._prefix_keys(), measures)
+        codes, labels = self.cube_codes['influencer_id']
+        self.influencer_days = ActiveDays(codes, day_codes, len(labels))
+        return self.prefix_index
+    
+    def _prefix_keys(self):
+        """Codes and member count of every dimension given dense prefix sums"""
+        keys = {GRAND_TOTAL: (np.zeros(len(self.cube), dtype=np.int64), 1)}
+        for key in FILTER_COLUMNS:
+            codes, labels = self.cube_codes[key]
+            if len(labels) <= PREFIX_MAX_MEMBERS:
+                keys[key] = (codes, len(labels))
+        return keys
+    
+    def build_partition_pool(self):
+        """Process pool over month partitions of this cube, when workers > 1
+        
+        The previous pool is left to whichever clone still references it; its
+        workers exit once it is no longer used.
+        """
+        self.partition_pool = None
+        if self.workers and self.workers > 1:
+            codes = {key: (codes, len(labels)) for key, (codes, labels) in self.cube_codes.items()}
+            measures = {name: self.cube[name].to_numpy() for name in ['revenue', 'orders', 'spend']}
+            self.partition_pool = PartitionPool(codes, measures, self.distinct_sketches,
+                                                month_partitions(self.cube_date_index), self.workers)
+        return self.partition_pool
+    
+    def build_distinct_sketches(self):
+        """Distinct sketches per cube cell: influencers always, buyers while rows are in memory
+        
+        Streamed cells no longer carry user_id, so streaming mode has no
+        buyer sketch and reports no unique_buyers.
+        """
+        self.distinct_sketches = {'influencer_id': self._distinct_sketch('influencer_id')}
+        if not self.streaming and self.tracking_data_df is not None and 'user_id' in self.tracking_data_df:
+            self.distinct_sketches['user_id'] = self._distinct_sketch('user_id')
+        return self.distinct_sketches
+    
+    def _distinct_sketch(self, column, start=0, tracking_start=0):
+        """Sketch of `column` over the cube cells from `start` on (buyers: of the tracking rows from tracking_start on)"""
+        if column == 'influencer_id':
+            codes, labels = self.cube_codes['influencer_id']
+            return DistinctSketch.from_codes(np.arange(start, len(self.cube)), codes[start:], labels,
+                                             self.distinct_error)
+        rows = self.tracking_data_df.iloc[tracking_start:]
+        return DistinctSketch.from_codes(self._cell_positions(rows, start), rows['user_id'].cat.codes.to_numpy(),
+                                         self.dictionary.labels['user'], self.distinct_error)
+    
+    def _cell_positions(self, rows, start=0):
+        """Position of the cube cell each tracking row is aggregated into; rows must fall in cells from `start` on"""
+        # The cube is sorted by its keys, so their combined codes ascend
+        row_codes, cube_codes, sizes = [], [], []
+        for key in CUBE_KEYS:
+            codes, labels = self.cube_codes[key]
+            if key == 'influencer_id':
+                row_codes.append(self.dictionary.encode('influencer', rows[key]))
+            elif rows[key].dtype == self.cube[key].dtype and isinstance(rows[key].dtype, pd.CategoricalDtype):
+                row_codes.append(rows[key].cat.codes.to_numpy().astype(np.int64))
+            else:
+                row_codes.append(labels.get_indexer(rows[key]))
+            cube_codes.append(codes[start:])
+            sizes.append(len(labels))
+        cells, _ = combine_codes(cube_codes, sizes)
+        keys, _ = combine_codes(row_codes, sizes)
+        return start + np.searchsorted(cells, keys)
+    
+    def memory_report(self):
+        """Before/after memory footprint of the loaded (and merged) frames"""
+        return memory_footprint({
+            'influencers': self.influencers_df,
+            'posts': self.posts_df,
+            'tracking_data': self._fact_table(),
+            'payouts': self.payouts_df,
+            'influencer_dim': self.influencer_dim,
+            'cube': self.cube,
+            'merged': self.merged_df,
+        })
+    
+    def invalidate_caches(self):
+        """Drop every cached result and move to a new data version"""
+        self.data_version += 1
+        self._rollup_cache.clear()
+        self._roas_cache.clear()
+        self._distribution_cache.clear()
+        self._report_cache.clear()
+    
+    def _cells(self, positions):
+        """Cube cells at `positions`, or the whole cube for None"""
+        if positions is None:
+            return self.cube
+        return self.cube.take(positions)
+    
+    def _dim_rows(self, influencer_ids, columns=None):
+        """Influencer dimension rows for `influencer_ids`, found by dictionary code"""
+        dim = self.influencer_dim if columns is None else self.influencer_dim[columns]
+        codes = self.dictionary.encode('influencer', influencer_ids)
+        if (codes < 0).any():
+            # Ids outside the dictionary get empty rows, as a join would
+            return dim.reindex(np.asarray(influencer_ids))
+        return dim.take(codes)
+    
+    def _lookup(self, facts, column):
+        """Values of `column` for each fact row, resolved through the influencer dimension if needed"""
+        if column in facts.columns:
+            return facts[column]
+        values = self._dim_rows(facts['influencer_id'], [column])[column]
+        return pd.Series(values.to_numpy(), index=facts.index, name=column, dtype=values.dtype)
+    
+    def _spend(self, facts):
+        """Share of the influencer payout attributed to each fact row"""
+        if 'spend' in facts.columns:
+            return facts['spend']
+        spend = self._lookup(facts, 'payout_per_event')
+        if 'events' in facts.columns:
+            spend = spend * facts['events']
+        return spend
+    
+    def _denormalize(self, facts):
+        """Attach influencer attributes to fact rows by indexing the dimension with their codes"""
+        attributes = self._dim_rows(facts['influencer_id'], INFLUENCER_ATTRIBUTES).set_axis(facts.index)
+        return pd.concat([facts, attributes], axis=1)
+    
+    def _scope(self):
+        return self, None, ALL_CELLS
+    
+    def _filters(self):
+        return ()
+    
+    def _prefix_scope(self, filters):
+        """(dimension, member codes, lo, hi) when the filters narrow at most one
+        dimension besides the date range, so prefix sums can answer; else None"""
+        filters = dict(filters)
+        lo, hi = self.prefix_index.day_range(*filters.pop('date_range', (None, None)))
+        narrowing = [
+            (column, values) for column, values in filters.items()
+            if column in self.cube_indexes and not self.cube_indexes[column].covers(values)
+        ]
+        if not narrowing:
+            return GRAND_TOTAL, np.zeros(1, dtype=np.int64), lo, hi
+        if len(narrowing) > 1 or narrowing[0][0] not in self.prefix_index.cumulative:
+            return None
+        column, values = narrowing[0]
+        members = self.cube_codes[column][1].get_indexer(list(values))
+        return column, members[members >= 0], lo, hi
+    
+    def _prefix_summary(self, filters):
+        """Grand totals for the filters from two prefix-sum lookups per measure, or None"""
+        scope = self._prefix_scope(filters)
+        # Distinct influencers are countable only when the filter is on an influencer attribute
+        if scope is None or scope[0] not in (GRAND_TOTAL,) + tuple(CUBE_ATTRIBUTES):
+            return None
+        dim, members, lo, hi = scope
+        totals = self.prefix_index.totals(dim, lo, hi, members)
+        
+        active = self.influencer_days.active(lo, hi)
+        if dim != GRAND_TOTAL:
+            active &= np.isin(self.influencer_dim[dim].cat.codes.to_numpy(), members)
+        return {
+            'revenue': totals['revenue'],
+            'orders': int(round(totals['orders'])),
+            'total_payout': totals['spend'],
+            'num_influencers': int(active.sum()),
+        }
+    
+    def _prefix_time_series(self, filters):
+        """Daily revenue, orders and spend for the filters from the prefix sums, or None"""
+        scope = self._prefix_scope(filters)
+        if scope is None:
+            return None
+        dim, members, lo, hi = scope
+        daily = self.prefix_index.daily(dim, lo, hi, members)
+        observed = daily['events'] > 0
+        time_series = pd.DataFrame({
+            'date': self.prefix_index.days[lo:hi][observed].astype(self.cube['date'].dtype),
+            'revenue': daily['revenue'][observed],
+            'orders': np.rint(daily['orders'][observed]).astype(np.int64),
+            'total_payout': daily['spend'][observed],
+        })
+        time_series['roas'] = time_series['revenue'] / time_series['total_payout']
+        return time_series
+    
+    def _previous_window(self, date_range):
+        """The equally long date range ending the day before date_range starts, or None
+        if it would lie entirely before the first tracked day"""
+        first_day, last_day = self.get_date_bounds()
+        if first_day is None:
+            return None
+        start, end = (pd.Timestamp(bound) for bound in date_range) if date_range else (first_day, last_day)
+        length = end - start + pd.Timedelta(days=1)
+        previous_end = start - pd.Timedelta(days=1)
+        if previous_end < first_day:
+            return None
+        return previous_end - length + pd.Timedelta(days=1), previous_end
+    
+    def _roas(self, positions, scope, baseline_revenue_pct):
+        """calculate_roas over the cells at `positions`, memoized by scope and baseline"""
+        cache_key = (self.data_version, scope, float(baseline_revenue_pct))
+        influencer_metrics = self._roas_cache.get(cache_key)
+        if influencer_metrics is None:
+            influencer_metrics = self._compute_roas(self._influencer_totals(positions), baseline_revenue_pct)
+            self._roas_cache.put(cache_key, influencer_metrics)
+        return influencer_metrics.copy()
+    
+    def _distributions(self, positions, scope, metric, dimension):
+        """get_distribution over the cells at `positions`, cached by scope"""
+        cache_key = (self.data_version, scope, metric, dimension)
+        sketches = self._distribution_cache.get(cache_key)
+        if sketches is None:
+            # ROAS, revenue and payout do not depend on the baseline
+            influencer_metrics = self._roas(positions, scope, 0.1)
+            values = influencer_metrics[metric].to_numpy(dtype=np.float64)
+            if dimension is None:
+                sketches = {GRAND_TOTAL: QuantileSketch.from_values(values)}
+            else:
+                codes, members = encode_column(influencer_metrics[dimension])
+                sketches = {member: QuantileSketch.from_values(values[codes == code])
+                            for code, member in enumerate(members) if (codes == code).any()}
+            self._distribution_cache.put(cache_key, sketches)
+        return dict(sketches)
+    
+    def _influencer_totals(self, positions):
+        """Revenue and orders per influencer over the cells at `positions`"""
+        if not self.use_kernels:
+            return self._cells(positions).groupby('influencer_id')[['revenue', 'orders']].sum()
+        
+        influencer_ids = self.cube_codes['influencer_id'][1]
+        [(observed, sums, _)] = self._kernel_groups(
+            positions, [('influencer_id',)], {'revenue': 'revenue', 'orders': 'orders'})
+        return pd.DataFrame(sums, index=pd.Index(influencer_ids.take(observed), name='influencer_id'))
+    
+    def _compute_roas(self, totals, baseline_revenue_pct):
+        """Per-influencer revenue, payout, ROAS and engagement from per-influencer totals"""
+        # Attach each influencer's attributes to their totals
+        attributes = self._dim_rows(totals.index, [
+            'total_payout', 'name', 'category', 'gender', 'follower_count',
+            'platform', 'reach', 'likes', 'comments'
+        ]).set_axis(totals.index)
+        influencer_metrics = totals.join(attributes).reset_index()
         
         # Calculate ROAS
         influencer_metrics['roas'] = influencer_metrics['revenue'] / influencer_metrics['total_payout']
@@ -100,134 +864,253 @@ class DataProcessor:
         
         return influencer_metrics
     
-    def get_campaign_performance(self):
-        """Get campaign-level performance metrics"""
-        if self.merged_df is None:
-            self.merge_data()
-        
-        campaign_metrics = self.merged_df.groupby('campaign').agg({
-            'revenue': 'sum',
-            'orders_x': 'sum',
-            'total_payout': 'sum',
-            'influencer_id': 'nunique'
-        }).reset_index()
+    def _rollups(self, positions, scope, dimensions):
+        """get_rollups over the cells at `positions`, cached per scope"""
+        cache_key = (self.data_version, scope)
+        cached = self._rollup_cache.get(cache_key, {})
         
-        campaign_metrics['roas'] = campaign_metrics['revenue'] / campaign_metrics['total_payout']
-        campaign_metrics.rename(columns={'influencer_id': 'num_influencers', 'orders_x': 'orders'}, inplace=True)
-        
-        return campaign_metrics
+        if any(dim not in cached for dim in dimensions):
+            # Cached entries are never mutated, so concurrent readers holding
+            # the old dict are unaffected by the new one replacing it
+            wanted = dict.fromkeys(list(dimensions) + list(STANDARD_ROLLUPS))
+            missing = [dim for dim in wanted if dim not in cached]
+            if self.use_kernels and all(key in self.cube_codes for dim in missing for key in dimension_keys(dim)):
+                computed = self._kernel_rollups(positions, missing)
+            else:
+                computed = self._compute_rollups(self._cells(positions), missing)
+            cached = {**cached, **computed}
+            self._rollup_cache.put(cache_key, cached)
+        return {dim: cached[dim].copy() for dim in dimensions}
     
-    def get_product_performance(self):
-        """Get product-level performance metrics"""
-        if self.merged_df is None:
-            self.merge_data()
+    def _compute_rollups(self, facts, dimensions):
+        """Aggregate facts once to a shared base, then roll it up per dimension"""
+        wanted = dict.fromkeys(key for dim in dimensions for key in dimension_keys(dim))
+        fact_keys = [key for key in wanted if key in facts.columns and key != 'influencer_id']
+        keys = [facts[key] for key in fact_keys + ['influencer_id']]
+        base = pd.DataFrame({
+            'revenue': facts['revenue'],
+            'orders': facts['orders'],
+            'total_payout': self._spend(facts),
+        }).groupby(keys, observed=True).sum().reset_index()
         
-        product_metrics = self.merged_df.groupby('product').agg({
-            'revenue': 'sum',
-            'orders_x': 'sum',
-            'total_payout': 'sum',
-            'influencer_id': 'nunique'
-        }).reset_index()
-        
-        product_metrics['roas'] = product_metrics['revenue'] / product_metrics['total_payout']
-        product_metrics.rename(columns={'influencer_id': 'num_influencers', 'orders_x': 'orders'}, inplace=True)
-        
-        return product_metrics
+        rollups = {}
+        for dim in dimensions:
+            if dim == GRAND_TOTAL:
+                grouped = base.groupby(np.zeros(len(base), dtype=np.int8))
+            elif isinstance(dim, tuple):
+                grouped = base.groupby([self._lookup(base, key) for key in dim], observed=True)
+            else:
+                grouped = base.groupby(self._lookup(base, dim), observed=True)
+            metrics = grouped[['revenue', 'orders', 'total_payout']].sum()
+            metrics['num_influencers'] = grouped['influencer_id'].nunique()
+            if 'user_id' in self.distinct_sketches:
+                metrics['unique_buyers'] = self._distinct_by_group('user_id', facts, dim)
+            metrics = metrics.reset_index(drop=dim == GRAND_TOTAL)
+            metrics['roas'] = metrics['revenue'] / metrics['total_payout']
+            rollups[dim] = metrics
+        return rollups
     
-    def get_platform_performance(self):
-        """Get platform-level performance metrics"""
-        if self.merged_df is None:
-            self.merge_data()
-        
-        platform_metrics = self.merged_df.groupby('platform').agg({
-            'revenue': 'sum',
-            'orders_x': 'sum',
-            'total_payout': 'sum',
-            'influencer_id': 'nunique'
-        }).reset_index()
-        
-        platform_metrics['roas'] = platform_metrics['revenue'] / platform_metrics['total_payout']
-        platform_metrics.rename(columns={'influencer_id': 'num_influencers', 'orders_x': 'orders'}, inplace=True)
-        
-        return platform_metrics
+    def _distinct_columns(self):
+        """Rollup column counted from each available distinct sketch"""
+        columns = {'influencer_id': 'num_influencers'}
+        if 'user_id' in self.distinct_sketches:
+            columns['user_id'] = 'unique_buyers'
+        return columns
     
-    def get_time_series_data(self, groupby_column='date'):
-        """Get time series data for performance tracking"""
-        if self.merged_df is None:
-            self.merge_data()
-        
-        time_series = self.merged_df.groupby(groupby_column).agg({
-            'revenue': 'sum',
-            'orders_x': 'sum',
-            'total_payout': 'sum'
-        }).reset_index()
-        
-        time_series['roas'] = time_series['revenue'] / time_series['total_payout']
-        time_series.rename(columns={'orders_x': 'orders'}, inplace=True)
-        
-        return time_series
+    def _distinct_by_group(self, name, facts, dim):
+        """Sketch counts of `name` per group of `dim` over cube cells `facts`, in groupby order"""
+        if facts.empty:
+            # No groups, not even the grand total's single one
+            return np.zeros(0, dtype=np.int64)
+        if dim == GRAND_TOTAL:
+            codes, n_groups = np.zeros(len(facts), dtype=np.int64), 1
+        else:
+            keys = [self._lookup(facts, key) for key in dimension_keys(dim)]
+            grouper = facts.groupby(keys, observed=True)
+            # Cells whose key is missing (an unknown influencer's attributes) join no group
+            codes, n_groups = grouper.ngroup().fillna(-1).to_numpy(dtype=np.int64), grouper.ngroups
+        groups = np.full(len(self.cube), -1, dtype=np.int64)
+        groups[facts.index.to_numpy()] = codes
+        sketch = self.distinct_sketches[name]
+        return sketch.estimate(sketch.partial(0, len(self.cube), groups), np.arange(n_groups))
     
-    def filter_data(self, filters):
-        """Apply filters to the merged data"""
-        if self.merged_df is None:
-            self.merge_data()
-        
-        filtered_df = self.merged_df.copy()
-        
-        if 'platform' in filters and filters['platform']:
-            filtered_df = filtered_df[filtered_df['platform'].isin(filters['platform'])]
-        
-        if 'category' in filters and filters['category']:
-            filtered_df = filtered_df[filtered_df['category'].isin(filters['category'])]
-        
-        if 'gender' in filters and filters['gender']:
-            filtered_df = filtered_df[filtered_df['gender'].isin(filters['gender'])]
+    def _distinct_total(self, name, positions):
+        """Sketch count of `name` over the cells at `positions`, or None without that sketch"""
+        sketch = self.distinct_sketches.get(name)
+        return None if sketch is None else sketch.count(positions)
+    
+    def _kernel_take(self, positions):
+        """Function selecting the cells at `positions` from a per-cell array"""
+        if positions is None:
+            return lambda values: values
+        return lambda values: values[positions]
+    
+    def _kernel_groups(self, positions, groupings, measures, sketch_names=()):
+        """(observed, sums, distinct counts) per grouping of encoded keys over the cells at `positions`
         
-        if 'campaign' in filters and filters['campaign']:
-            filtered_df = filtered_df[filtered_df['campaign'].isin(filters['campaign'])]
+        measures maps output names to cube columns; sketch_names picks the
+        distinct sketches to count. Large selections go to the partition pool
+        when there is one; the results are identical.
+        """
+        n_cells = len(self.cube) if positions is None else len(positions)
+        if self.partition_pool is not None and n_cells >= self.parallel_min_cells:
+            return self.partition_pool.rollup(positions, groupings, measures, sketch_names)
         
-        if 'product' in filters and filters['product']:
-            filtered_df = filtered_df[filtered_df['product'].isin(filters['product'])]
+        take = self._kernel_take(positions)
+        values = {name: take(self.cube[column].to_numpy()) for name, column in measures.items()}
+        results = []
+        for keys in groupings:
+            sizes = [len(self.cube_codes[key][1]) for key in keys]
+            if keys:
+                codes, size = combine_codes([take(self.cube_codes[key][0]) for key in keys], sizes)
+            else:
+                codes, size = np.zeros(n_cells, dtype=np.int64), 1
+            observed, sums, _ = rollup(codes, size, values)
+            distinct = {}
+            if sketch_names:
+                groups = codes
+                if positions is not None:
+                    groups = np.full(len(self.cube), -1, dtype=np.int64)
+                    groups[positions] = codes
+                for name in sketch_names:
+                    sketch = self.distinct_sketches[name]
+                    distinct[name] = sketch.estimate(sketch.partial(0, len(self.cube), groups), observed)
+            results.append((observed, sums, distinct))
+        return results
+    
+    def _kernel_rollups(self, positions, dimensions):
+        """Same rollups as _compute_rollups, by bincount over the encoded cube keys"""
+        groupings = [dimension_keys(dim) for dim in dimensions]
+        distinct_columns = self._distinct_columns()
+        results = self._kernel_groups(positions, groupings, {
+            'revenue': 'revenue', 'orders': 'orders', 'total_payout': 'spend',
+        }, list(distinct_columns))
         
-        if 'date_range' in filters and filters['date_range']:
-            start_date, end_date = filters['date_range']
-            # Convert date objects to datetime for comparison
-            start_date = pd.to_datetime(start_date)
-            end_date = pd.to_datetime(end_date)
-            filtered_df = filtered_df[
-                (filtered_df['date'] >= start_date) & 
-                (filtered_df['date'] <= end_date)
-            ]
+        rollups = {}
+        for dim, keys, (observed, sums, distinct) in zip(dimensions, groupings, results):
+            sizes = [len(self.cube_codes[key][1]) for key in keys]
+            columns = {}
+            for key, key_codes in zip(keys, split_codes(observed, sizes)):
+                labels = self.cube_codes[key][1]
+                if isinstance(self.cube[key].dtype, pd.CategoricalDtype):
+                    columns[key] = pd.Categorical.from_codes(key_codes, dtype=self.cube[key].dtype)
+                else:
+                    columns[key] = labels.take(key_codes)
+            columns.update(sums)
+            for name, column in distinct_columns.items():
+                columns[column] = distinct[name]
+            metrics = pd.DataFrame(columns)
+            metrics['roas'] = metrics['revenue'] / metrics['total_payout']
+            rollups[dim] = metrics
+        return rollups
+    
+    def merge_data(self):
+        """Denormalize the tracking facts with influencer, payout and post attributes
         
-        return filtered_df
+        The wide frame is for export and inspection; metric methods answer
+        from the cube and never read merged_df.
+        """
+        self.merged_df = self._denormalize(self._fact_table())
+        return self.merged_df
     
-    def get_top_performers(self, metric='roas', top_n=10):
-        """Get top performing influencers based on specified metric"""
-        influencer_metrics = self.calculate_roas()
-        return influencer_metrics.nlargest(top_n, metric)
+    def iter_merged_chunks(self, chunk_rows=MERGE_CHUNK_ROWS):
+        """merge_data's rows `chunk_rows` at a time, so exports never hold the wide frame"""
+        facts = self._fact_table()
+        for start in range(0, len(facts), chunk_rows):
+            yield self._denormalize(facts.iloc[start:start + chunk_rows])
     
-    def get_underperformers(self, metric='roas', bottom_n=10):
-        """Get underperforming influencers based on specified metric"""
-        influencer_metrics = self.calculate_roas()
-        return influencer_metrics.nsmallest(bottom_n, metric)
+    def get_filter_options(self):
+        """Distinct values offered by each sidebar filter, plus the date bounds"""
+        options = {column: self.cube_indexes[column].present_values for column in FILTER_COLUMNS}
+        options['date_range'] = self.get_date_bounds()
+        return options
     
-    def get_summary_stats(self):
-        """Get overall summary statistics"""
-        if self.merged_df is None:
-            self.merge_data()
-        
-        total_revenue = self.merged_df['revenue'].sum()
-        total_orders = self.merged_df['orders_x'].sum()
-        total_spend = self.merged_df['total_payout'].sum()
-        total_influencers = self.merged_df['influencer_id'].nunique()
-        overall_roas = total_revenue / total_spend if total_spend > 0 else 0
+    def get_date_bounds(self):
+        """First and last tracked day, read from the date index"""
+        return self.cube_date_index.bounds()
+    
+    def select_rows(self, filters):
+        """Positions of the cube cells matching `filters`, without copying any columns"""
+        # The date range is a contiguous slice of the date-sorted cube
+        start, stop = 0, len(self.cube)
+        if 'date_range' in filters and filters['date_range']:
+            start, stop = self.cube_date_index.slice(*filters['date_range'])
         
-        return {
-            'total_revenue': total_revenue,
-            'total_orders': total_orders,
-            'total_spend': total_spend,
-            'total_influencers': total_influencers,
-            'overall_roas': overall_roas,
-            'avg_order_value': total_revenue / total_orders if total_orders > 0 else 0
-        }
+        bitmap = select_bitmap(self.cube_indexes, filters)
+        if bitmap is None:
+            return np.arange(start, stop)
+        return bitmap_positions(bitmap, len(self.cube), start, stop)
+    
+    def filter_data(self, filters):
+        """Apply filters to the daily cube and return an immutable view of the matching cells"""
+        return FilteredView(self, self.select_rows(filters), filters)
+    
 
+
+class FilteredView(MetricsMixin):
+    """Immutable selection of daily cube cells with the DataProcessor metric methods
+    
+    Holds only the processor, the selected cell positions and the filters that
+    chose them; columns are materialized on access. A view answers for the data
+    version it was made from and refuses to once the processor reloads.
+    """
+    __slots__ = ('_processor', '_positions', '_normalized_filters', '_scope_key', '_version')
+    
+    def __init__(self, processor, positions, filters):
+        positions = np.array(positions, dtype=np.int64)
+        positions.setflags(write=False)
+        normalized = normalize_filters(filters)
+        object.__setattr__(self, '_processor', processor)
+        object.__setattr__(self, '_positions', positions)
+        object.__setattr__(self, '_normalized_filters', normalized)
+        object.__setattr__(self, '_scope_key', fingerprint(normalized))
+        object.__setattr__(self, '_version', processor.data_version)
+    
+    def __setattr__(self, name, value):
+        raise AttributeError("FilteredView is immutable")
+    
+    def __delattr__(self, name):
+        raise AttributeError("FilteredView is immutable")
+    
+    def _filters(self):
+        return self._normalized_filters
+    
+    def _scope(self):
+        if self._processor.data_version != self._version:
+            raise RuntimeError("FilteredView is stale: the processor has reloaded its data")
+        return self._processor, self._positions, self._scope_key
+    
+    @property
+    def filters(self):
+        """Normalized filters that produced this view"""
+        return self._normalized_filters
+    
+    @property
+    def data_version(self):
+        """Data version of the processor when the view was made"""
+        return self._version
+    
+    @property
+    def positions(self):
+        """Read-only positions of the selected cells in the processor's cube"""
+        return self._positions
+    
+    @property
+    def columns(self):
+        return self._processor.cube.columns
+    
+    def __len__(self):
+        return len(self._positions)
+    
+    def __getitem__(self, key):
+        """Column (or list of columns) of the selected cells"""
+        processor, positions, _ = self._scope()
+        return processor.cube[key].take(positions)
+    
+    def to_frame(self):
+        """Copy of the selected cells as a DataFrame"""
+        processor, positions, _ = self._scope()
+        return processor._cells(positions)
+    
+    def __repr__(self):
+        return f"FilteredView({len(self)} cells, filters={dict(self._normalized_filters)})"
@@ -0,0 +1,60 @@
+import copy
+
+import numpy as np
+import pandas as pd
+
+
+class DateIndex:
+    """Day-offset index over rows physically sorted by date
+
+    Rows of the i-th distinct day are offsets[i]:offsets[i + 1], so an inclusive
+    date range resolves to one contiguous slice with two binary searches, and
+    the first/last day are read without scanning the column.
+    """
+
+    def __init__(self, dates):
+        values = np.asarray(dates).astype('datetime64[D]')
+        if len(values) and (values[1:] < values[:-1]).any():
+            raise ValueError("DateIndex needs rows sorted by date")
+
+        starts = np.concatenate([[0], np.flatnonzero(values[1:] != values[:-1]) + 1])
+        self.size = len(values)
+        self.days = values[starts] if len(values) else values
+        self.offsets = np.append(starts, self.size) if len(values) else np.zeros(1, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.days)
+
+    def bounds(self):
+        """First and last day as Timestamps, or (None, None) when empty"""
+        if not len(self.days):
+            return None, None
+        return pd.Timestamp(self.days[0]), pd.Timestamp(self.days[-1])
+
+    def slice(self, start_date, end_date):
+        """Row range (lo, hi) holding every day from start_date to end_date inclusive"""
+        start = np.datetime64(pd.Timestamp(start_date), 'D')
+        end = np.datetime64(pd.Timestamp(end_date), 'D')
+        first = np.searchsorted(self.days, start, side='left')
+        last = np.searchsorted(self.days, end, side='right')
+        if last <= first:
+            return 0, 0
+        return int(self.offsets[first]), int(self.offsets[last])
+
+    def first_day(self, date):
+        """Position of the first day on or after `date`"""
+        return int(np.searchsorted(self.days, np.datetime64(pd.Timestamp(date), 'D'), side='left'))
+
+    def day_codes(self):
+        """Day position of every row"""
+        return np.repeat(np.arange(len(self.days)), np.diff(self.offsets))
+
+    def splice(self, day, dates):
+        """Index of the rows with those of days `day` onward replaced by rows dated `dates` (sorted, none earlier)"""
+        tail = DateIndex(dates)
+        start = self.offsets[day]
+        index = copy.copy(self)
+        index.days = np.concatenate([self.days[:day], tail.days])
+        index.offsets = np.concatenate([self.offsets[:day], tail.offsets + start])
+        index.size = int(start) + tail.size
+        return index
@@ -0,0 +1,124 @@
+import copy
+
+import numpy as np
+import pandas as pd
+
+# Logical key -> every (table, column) holding it. Columns of one key share a
+# single code space, so cross-table joins and comparisons work on integers.
+DICTIONARY_KEYS = {
+    'influencer': [('influencers', 'id'), ('posts', 'influencer_id'),
+                   ('tracking_data', 'influencer_id'), ('payouts', 'influencer_id')],
+    'platform': [('influencers', 'platform'), ('posts', 'platform'), ('tracking_data', 'source')],
+    'campaign': [('tracking_data', 'campaign')],
+    'product': [('tracking_data', 'product')],
+    'category': [('influencers', 'category')],
+    'gender': [('influencers', 'gender')],
+    'basis': [('payouts', 'basis')],
+    'user': [('tracking_data', 'user_id')],
+}
+
+
+class DictionaryRegistry:
+    """One sorted dictionary per logical key, shared by every table that holds the key
+
+    Categorical columns are recoded onto the key's shared CategoricalDtype, so
+    their codes agree across tables and each string is stored once. Integer
+    keys (influencer ids) keep their values; encode() maps them to dense codes
+    by binary search, which is how rows of the influencer dimension are found.
+    """
+
+    def __init__(self, tables):
+        self.labels = {}
+        self.dtypes = {}
+        for key, occurrences in DICTIONARY_KEYS.items():
+            columns = [
+                tables[table][column] for table, column in occurrences
+                if tables.get(table) is not None and column in tables[table].columns
+            ]
+            if not columns:
+                continue
+            if all(isinstance(column.dtype, pd.CategoricalDtype) for column in columns):
+                # Union of the dictionaries only; no column is scanned
+                labels = pd.Index(sorted(set().union(*(column.cat.categories for column in columns))))
+                self.dtypes[key] = pd.CategoricalDtype(labels)
+            else:
+                labels = pd.Index(np.unique(np.concatenate([column.dropna().to_numpy() for column in columns])))
+            self.labels[key] = labels
+
+    def size(self, key):
+        return len(self.labels[key])
+
+    def encode(self, key, values):
+        """Dense codes of `values` in the key's dictionary; -1 where a value is unknown"""
+        labels = self.labels[key].to_numpy()
+        values = np.asarray(values)
+        codes = np.searchsorted(labels, values)
+        found = codes < len(labels)
+        found[found] = labels[codes[found]] == values[found]
+        return np.where(found, codes, -1)
+
+    def extend(self, key, values):
+        """Registry with the unseen `values` added to key's dictionary, and the old -> new code map
+
+        Labels stay sorted: the new labels are placed by binary search and each
+        existing code moves up by the number inserted before it, so the
+        existing labels are neither hashed nor sorted again. This registry is
+        left as it is (a clone may share it); the map is None when every value
+        is already known.
+        """
+        labels = self.labels[key]
+        values = pd.Index(values).dropna().unique().sort_values()
+        new = values[lookup(labels, values) < 0]
+        if not len(new):
+            return self, None
+        positions = labels.searchsorted(new)
+        mapping = np.arange(len(labels)) + np.searchsorted(positions, np.arange(len(labels)), side='right')
+        # Merged position -> position in labels followed by the new labels
+        order = np.empty(len(labels) + len(new), dtype=np.int64)
+        order[mapping] = np.arange(len(labels))
+        order[positions + np.arange(len(new))] = len(labels) + np.arange(len(new))
+        extended = copy.copy(self)
+        extended.labels = {**self.labels, key: labels.append(new).take(order)}
+        if key in self.dtypes:
+            extended.dtypes = {**self.dtypes, key: pd.CategoricalDtype(extended.labels[key])}
+        return extended, mapping
+
+    def apply(self, df, table):
+        """Recode the categorical columns of one table onto the shared dictionaries"""
+        for key, occurrences in DICTIONARY_KEYS.items():
+            dtype = self.dtypes.get(key)
+            if dtype is None:
+                continue
+            for occurrence_table, column in occurrences:
+                if occurrence_table == table and column in df.columns:
+                    df[column] = recode(df[column], dtype)
+        return df
+
+
+def recode(column, dtype):
+    """Categorical column re-expressed in `dtype`, sharing its categories object"""
+    if not isinstance(column.dtype, pd.CategoricalDtype):
+        column = column.astype('category')
+    if column.cat.categories is dtype.categories:
+        # Same dictionary under another dtype object (e.g. after a concat): share the
+        # dtype again, whose cached hash spares pandas rehashing every label
+        return pd.Series(pd.Categorical.from_codes(column.cat.codes.to_numpy(), dtype=dtype),
+                         index=column.index, name=column.name)
+    return remap(column, dtype, lookup(dtype.categories, column.cat.categories))
+
+
+def remap(column, dtype, mapping):
+    """Categorical column moved onto `dtype` by an old code -> new code map"""
+    # Applied by array indexing; missing values stay -1
+    codes = column.cat.codes.to_numpy()
+    codes = np.where(codes >= 0, mapping[codes], -1)
+    return pd.Series(pd.Categorical.from_codes(codes, dtype=dtype), index=column.index, name=column.name)
+
+
+def lookup(labels, values):
+    """Position of each of `values` in sorted `labels`, by binary search; -1 where absent"""
+    values = pd.Index(values)
+    positions = labels.searchsorted(values)
+    found = positions < len(labels)
+    found[found] = labels[positions[found]] == values[found]
+    return np.where(found, positions, -1)
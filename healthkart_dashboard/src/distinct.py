@@ -0,0 +1,167 @@
+import copy
+import math
+
+import numpy as np
+import pandas as pd
+
+# Relative standard error of HyperLogLog estimates, 1.04 / sqrt(registers)
+DEFAULT_DISTINCT_ERROR = 0.01
+# Columns with at most this many distinct values are counted exactly
+EXACT_DISTINCT_LIMIT = 1 << 16
+MIN_PRECISION = 4
+MAX_PRECISION = 18
+
+
+def hll_precision(error):
+    """Register-index bits giving a relative standard error of at most `error`"""
+    precision = math.ceil(math.log2((1.04 / error) ** 2))
+    return min(MAX_PRECISION, max(MIN_PRECISION, precision))
+
+
+def value_hashes(labels):
+    """64-bit hash of each label, stable across processes and dictionary versions"""
+    return pd.util.hash_array(np.asarray(labels))
+
+
+def bit_length(values):
+    """int.bit_length of each uint64, without a round trip through floats"""
+    lengths = np.zeros(len(values), dtype=np.int64)
+    for shift in (32, 16, 8, 4, 2, 1):
+        high = values >> np.uint64(shift)
+        found = high > 0
+        lengths[found] += shift
+        values = np.where(found, high, values)
+    return lengths + (values > 0)
+
+
+def reduce_rows(slots, keys, ranks=None):
+    """Distinct (slot, key) rows sorted by slot, keeping the highest rank of each"""
+    if ranks is None:
+        order = np.lexsort((keys, slots))
+    else:
+        order = np.lexsort((ranks, keys, slots))
+    slots, keys = slots[order], keys[order]
+    last = np.ones(len(slots), dtype=bool)
+    last[:-1] = (slots[1:] != slots[:-1]) | (keys[1:] != keys[:-1])
+    return slots[last], keys[last], None if ranks is None else ranks[order][last]
+
+
+class DistinctSketch:
+    """Mergeable distinct count of one column within each cube cell
+
+    Exact sketches keep every distinct (cell, value hash) pair. HyperLogLog
+    sketches keep, per cell and register, the highest rank among the hashes
+    seen, so a cell costs at most 2**precision entries however many values
+    it holds. Either way the sketch of several cells, groups or partitions
+    is the union (register maximum) of theirs, so nothing is double counted
+    when they merge; only the final HyperLogLog estimate is approximate.
+    """
+
+    def __init__(self, cells, hashes, precision=None):
+        cells = np.asarray(cells, dtype=np.int64)
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        self.precision = precision
+        if precision is None:
+            self.cells, self.keys, self.ranks = reduce_rows(cells, hashes)
+        else:
+            width = 64 - precision
+            keys = (hashes >> np.uint64(width)).astype(np.int64)
+            rest = hashes & np.uint64((1 << width) - 1)
+            ranks = (width + 1 - bit_length(rest)).astype(np.uint8)
+            self.cells, self.keys, self.ranks = reduce_rows(cells, keys, ranks)
+
+    @classmethod
+    def from_codes(cls, cells, codes, labels, error=DEFAULT_DISTINCT_ERROR, exact_limit=EXACT_DISTINCT_LIMIT):
+        """Sketch of dictionary `codes` (-1 for missing) by the cube cell of each row
+
+        Exact when error is None or the dictionary has at most exact_limit
+        labels; otherwise HyperLogLog sized for `error`.
+        """
+        codes = np.asarray(codes)
+        present = codes >= 0
+        precision = None if error is None or len(labels) <= exact_limit else hll_precision(error)
+        # Only the labels that occur are hashed, so a sketch of a few rows stays cheap
+        used, inverse = np.unique(codes[present], return_inverse=True)
+        hashes = value_hashes(pd.Index(labels)[used])[inverse]
+        return cls(np.asarray(cells)[present], hashes, precision)
+
+    def splice(self, start, tail):
+        """Sketch with the rows of cells from `start` on replaced by those of `tail`
+
+        `tail` sketches the new cells from `start` on, at the same precision.
+        """
+        if tail.precision != self.precision:
+            raise ValueError("Cannot splice sketches of different precision")
+        cut = np.searchsorted(self.cells, start)
+        sketch = copy.copy(self)
+        sketch.cells = np.concatenate([self.cells[:cut], tail.cells])
+        sketch.keys = np.concatenate([self.keys[:cut], tail.keys])
+        if self.ranks is not None:
+            sketch.ranks = np.concatenate([self.ranks[:cut], tail.ranks])
+        return sketch
+
+    @property
+    def exact(self):
+        return self.precision is None
+
+    @property
+    def nbytes(self):
+        ranks = 0 if self.ranks is None else self.ranks.nbytes
+        return self.cells.nbytes + self.keys.nbytes + ranks
+
+    def partial(self, lo, hi, groups):
+        """Sketch rows of cells lo:hi relabelled by group; groups[i] is the group of cell lo + i, -1 to skip"""
+        start, stop = np.searchsorted(self.cells, [lo, hi])
+        slots = groups[self.cells[start:stop] - lo]
+        keep = slots >= 0
+        ranks = None if self.ranks is None else self.ranks[start:stop][keep]
+        return reduce_rows(slots[keep], self.keys[start:stop][keep], ranks)
+
+    def merge(self, partials):
+        """Union of partial() results (of any cells, groups or partitions)"""
+        slots = np.concatenate([partial[0] for partial in partials])
+        keys = np.concatenate([partial[1] for partial in partials])
+        ranks = None if self.ranks is None else np.concatenate([partial[2] for partial in partials])
+        return reduce_rows(slots, keys, ranks)
+
+    def estimate(self, partial, groups):
+        """Distinct count for each of `groups` (ascending group codes) from a partial"""
+        slots, keys, ranks = partial
+        if not len(slots):
+            return np.zeros(len(groups), dtype=np.int64)
+        # Rows are sorted by slot, so each present group is one run
+        present, counts = np.unique(slots, return_counts=True)
+        if self.precision is None:
+            estimates = counts
+        else:
+            m = 1 << self.precision
+            registers = np.zeros((len(present), m), dtype=np.uint8)
+            registers[np.repeat(np.arange(len(present)), counts), keys] = ranks
+            estimates = hll_estimate(registers, m)
+        where = np.minimum(np.searchsorted(present, groups), len(present) - 1)
+        return np.where(present[where] == groups, estimates[where], 0)
+
+    def count(self, positions=None):
+        """Distinct values over the cells at `positions` (every cell when None)"""
+        if not len(self.cells):
+            return 0
+        hi = int(self.cells[-1]) + 1
+        groups = np.zeros(hi, dtype=np.int64)
+        if positions is not None:
+            groups[:] = -1
+            positions = np.asarray(positions)
+            groups[positions[positions < hi]] = 0
+        return int(self.estimate(self.partial(0, hi, groups), np.zeros(1, dtype=np.int64))[0])
+
+
+def hll_estimate(registers, m):
+    """HyperLogLog cardinality per row of registers, with the small-range correction"""
+    if m >= 128:
+        alpha = 0.7213 / (1 + 1.079 / m)
+    else:
+        alpha = {16: 0.673, 32: 0.697, 64: 0.709}[m]
+    raw = alpha * m * m / np.sum(np.exp2(-registers.astype(np.float64)), axis=1)
+    zeros = (registers == 0).sum(axis=1)
+    small = (raw <= 2.5 * m) & (zeros > 0)
+    raw[small] = m * np.log(m / zeros[small])
+    return np.rint(raw).astype(np.int64)
@@ -1,11 +1,31 @@
 import pandas as pd
-import plotly.graph_objects as go
-import plotly.express as px
-from plotly.subplots import make_subplots
-import io
-import base64
+import gzip
+import json
+import os
+import shutil
+import time
+import urllib.parse
+import uuid
+import zipfile
 from datetime import datetime
-import streamlit as st
+
+from columnar_cache import PARQUET_AVAILABLE
+from reports import render_insights
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+# Exports are written under <dashboard>/exports and downloaded from the
+# static server that run_all.py starts on port 8000
+EXPORT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'exports')
+EXPORT_URL = 'http://localhost:8000/exports'
+EXPORT_CHUNK_ROWS = 50_000
+# Seconds an export stays on disk for its download link
+EXPORT_MAX_AGE = 3600
+BUNDLE_MANIFEST = 'manifest.json'
 
 def export_to_csv(data, filename):
     """Export DataFrame to CSV"""
@@ -14,124 +34,132 @@ def export_to_csv(data, filename):
 
 def create_summary_report(processor):
     """Create a comprehensive summary report"""
-    summary = processor.get_summary_stats()
-    influencer_metrics = processor.calculate_roas()
-    campaign_perf = processor.get_campaign_performance()
-    product_perf = processor.get_product_performance()
-    platform_perf = processor.get_platform_performance()
-    
-    # Top performers
-    top_performers = processor.get_top_performers(metric='roas', top_n=10)
-    underperformers = processor.get_underperformers(metric='roas', bottom_n=10)
-    
-    report_data = {
-        'summary_stats': summary,
-        'campaign_performance': campaign_perf,
-        'product_performance': product_perf,
-        'platform_performance': platform_perf,
-        'top_performers': top_performers,
-        'underperformers': underperformers,
-        'all_influencers': influencer_metrics
-    }
-    
-    return report_data
+    return processor.get_report_snapshot().report_data()
 
 def generate_insights_text(processor):
     """Generate text-based insights from the data"""
-    summary = processor.get_summary_stats()
-    influencer_metrics = processor.calculate_roas()
-    campaign_perf = processor.get_campaign_performance()
-    product_perf = processor.get_product_performance()
-    platform_perf = processor.get_platform_performance()
-    
-    insights = []
-    
-    # Overall performance insights
-    insights.append("# HealthKart Influencer Marketing ROI Analysis")
-    insights.append(f"**Report Generated:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    insights.append("")
-    
-    insights.append("## Executive Summary")
-    insights.append(f"- **Total Revenue Generated:** ₹{summary['total_revenue']:,.0f}")
-    insights.append(f"- **Total Orders:** {summary['total_orders']:,.0f}")
-    insights.append(f"- **Overall ROAS:** {summary['overall_roas']:.2f}x")
-    insights.append(f"- **Total Influencers:** {summary['total_influencers']:,.0f}")
-    insights.append(f"- **Average Order Value:** ₹{summary['avg_order_value']:,.0f}")
-    insights.append("")
-    
-    # Campaign insights
-    best_campaign = campaign_perf.loc[campaign_perf['roas'].idxmax()]
-    worst_campaign = campaign_perf.loc[campaign_perf['roas'].idxmin()]
-    
-    insights.append("## Campaign Performance Insights")
-    insights.append(f"- **Best Performing Campaign:** {best_campaign['campaign']} (ROAS: {best_campaign['roas']:.2f}x)")
-    insights.append(f"- **Worst Performing Campaign:** {worst_campaign['campaign']} (ROAS: {worst_campaign['roas']:.2f}x)")
-    insights.append(f"- **Total Campaigns:** {len(campaign_perf)}")
-    insights.append("")
-    
-    # Platform insights
-    best_platform = platform_perf.loc[platform_perf['roas'].idxmax()]
-    insights.append("## Platform Performance Insights")
-    insights.append(f"- **Best Performing Platform:** {best_platform['platform']} (ROAS: {best_platform['roas']:.2f}x)")
-    insights.append(f"- **Platform Revenue Distribution:**")
-    for _, row in platform_perf.iterrows():
-        pct = (row['revenue'] / summary['total_revenue']) * 100
-        insights.append(f"  - {row['platform']}: ₹{row['revenue']:,.0f} ({pct:.1f}%)")
-    insights.append("")
-    
-    # Product insights
-    best_product = product_perf.loc[product_perf['roas'].idxmax()]
-    insights.append("## Product Performance Insights")
-    insights.append(f"- **Best Performing Product:** {best_product['product']} (ROAS: {best_product['roas']:.2f}x)")
-    insights.append(f"- **Product Revenue Distribution:**")
-    for _, row in product_perf.iterrows():
-        pct = (row['revenue'] / summary['total_revenue']) * 100
-        insights.append(f"  - {row['product']}: ₹{row['revenue']:,.0f} ({pct:.1f}%)")
-    insights.append("")
-    
-    # Influencer insights
-    profitable_count = (influencer_metrics['roas'] > 1).sum()
-    avg_roas = influencer_metrics['roas'].mean()
-    
-    insights.append("## Influencer Performance Insights")
-    insights.append(f"- **Profitable Influencers:** {profitable_count}/{len(influencer_metrics)} ({(profitable_count/len(influencer_metrics)*100):.1f}%)")
-    insights.append(f"- **Average ROAS:** {avg_roas:.2f}x")
-    insights.append(f"- **Top 5 Performers by ROAS:**")
-    
-    top_5 = influencer_metrics.nlargest(5, 'roas')
-    for i, (_, row) in enumerate(top_5.iterrows(), 1):
-        insights.append(f"  {i}. {row['name']} ({row['platform']}) - ROAS: {row['roas']:.2f}x, Revenue: ₹{row['revenue']:,.0f}")
-    
-    insights.append("")
-    insights.append("## Recommendations")
-    
-    # Generate recommendations based on data
-    if best_platform['roas'] > 2:
-        insights.append(f"- **Focus on {best_platform['platform']}:** This platform shows exceptional ROAS of {best_platform['roas']:.2f}x. Consider increasing budget allocation.")
-    
-    if profitable_count / len(influencer_metrics) < 0.7:
-        insights.append("- **Influencer Optimization:** Less than 70% of influencers are profitable. Review underperforming influencers and optimize selection criteria.")
-    
-    if best_campaign['roas'] > worst_campaign['roas'] * 2:
-        insights.append(f"- **Campaign Strategy:** {best_campaign['campaign']} significantly outperforms {worst_campaign['campaign']}. Analyze successful elements for replication.")
-    
-    # Category analysis
-    category_performance = influencer_metrics.groupby('category')['roas'].mean().sort_values(ascending=False)
-    best_category = category_performance.index[0]
-    insights.append(f"- **Category Focus:** {best_category} category shows the best average ROAS ({category_performance.iloc[0]:.2f}x). Consider expanding partnerships in this category.")
-    
-    return "\n".join(insights)
+    return render_insights(processor.get_report_snapshot())
+
+def iter_csv(data, chunk_rows=EXPORT_CHUNK_ROWS):
+    """CSV text of a DataFrame, or of an iterable of DataFrame chunks, one chunk at a time"""
+    frames = data
+    if isinstance(data, pd.DataFrame):
+        frames = (data.iloc[start:start + chunk_rows] for start in range(0, max(len(data), 1), chunk_rows))
+    header = True
+    for frame in frames:
+        yield frame.to_csv(index=False, header=header)
+        header = False
+
+def new_export_path(filename, export_dir=EXPORT_DIR):
+    """Path for a new export file
+    
+    Each export gets a directory of its own, so concurrent sessions never
+    collide and the file keeps its name for the download.
+    """
+    prune_exports(export_dir)
+    directory = os.path.join(export_dir, uuid.uuid4().hex)
+    os.makedirs(directory)
+    return os.path.join(directory, filename)
+
+def write_export(chunks, filename, export_dir=EXPORT_DIR):
+    """Write text chunks to a new export file and return its path
+    
+    The file appears under its final name only once complete.
+    """
+    path = new_export_path(filename, export_dir)
+    with open(path + '.part', 'w', encoding='utf-8', newline='') as f:
+        for chunk in chunks:
+            f.write(chunk)
+    os.replace(path + '.part', path)
+    return path
+
+def prune_exports(export_dir=EXPORT_DIR, max_age=EXPORT_MAX_AGE):
+    """Remove exports older than max_age seconds"""
+    if not os.path.isdir(export_dir):
+        return
+    cutoff = time.time() - max_age
+    for entry in os.scandir(export_dir):
+        if entry.is_dir() and entry.stat().st_mtime < cutoff:
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+def export_link(path, label, export_dir=EXPORT_DIR):
+    """Link to an export file on the static server"""
+    relative = os.path.relpath(path, export_dir).replace(os.sep, '/')
+    return f'<a href="{EXPORT_URL}/{urllib.parse.quote(relative)}" download>{label}</a>'
 
 def create_downloadable_csv(data, filename):
-    """Create a downloadable CSV file"""
-    csv = data.to_csv(index=False)
-    b64 = base64.b64encode(csv.encode()).decode()
-    href = f'<a href="data:file/csv;base64,{b64}" download="{filename}">Download {filename}</a>'
-    return href
+    """Write `data` (a DataFrame or an iterable of DataFrame chunks) as a CSV export and link to it"""
+    return export_link(write_export(iter_csv(data), filename), f"Download {filename}")
+
+def bundle_formats():
+    """Export bundle formats whose compressor is installed"""
+    formats = {'csv.gz': True, 'csv.zst': ZSTD_AVAILABLE, 'parquet': PARQUET_AVAILABLE}
+    return [fmt for fmt, available in formats.items() if available]
+
+def report_tables(report_data):
+    """Tables of a report as DataFrames; a dict of figures (summary_stats) becomes one row"""
+    return {name: value if isinstance(value, pd.DataFrame) else pd.DataFrame([value])
+            for name, value in report_data.items()}
+
+def _write_table(stream, table, fmt):
+    """Write one table to a binary stream in a bundle format"""
+    if fmt == 'parquet':
+        table.to_parquet(stream, index=False, compression='zstd')
+        return
+    if fmt == 'csv.gz':
+        compressor = gzip.GzipFile(fileobj=stream, mode='wb', mtime=0)
+    else:
+        compressor = zstandard.ZstdCompressor().stream_writer(stream, closefd=False)
+    with compressor:
+        for chunk in iter_csv(table):
+            compressor.write(chunk.encode('utf-8'))
+
+def write_bundle(report_data, path, fmt='csv.gz', data_version=None, filters=None):
+    """Write every table of a report into one zip archive at `path`
+    
+    Tables are compressed CSV (csv.gz, csv.zst) or Parquet, stored as is in
+    the archive, with a manifest.json listing each table's file, row count
+    and columns along with the data version (and filters, when given) the
+    report was made from. The archive appears at `path` only once complete.
+    """
+    if fmt not in bundle_formats():
+        raise ValueError(f"Unsupported bundle format: {fmt} (available: {', '.join(bundle_formats())})")
+    manifest = {
+        'format': fmt,
+        'data_version': data_version,
+        'generated_at': datetime.now().isoformat(timespec='seconds'),
+        'tables': [],
+    }
+    if filters is not None:
+        manifest['filters'] = filters
+    with zipfile.ZipFile(path + '.part', 'w', zipfile.ZIP_STORED) as archive:
+        for name, table in report_tables(report_data).items():
+            member = f"{name}.{fmt}"
+            with archive.open(member, 'w', force_zip64=True) as stream:
+                _write_table(stream, table, fmt)
+            manifest['tables'].append({
+                'name': name,
+                'file': member,
+                'rows': len(table),
+                'columns': [str(column) for column in table.columns],
+            })
+        archive.writestr(BUNDLE_MANIFEST, json.dumps(manifest, indent=2, default=str))
+    os.replace(path + '.part', path)
+    return path
+
+def write_export_bundle(report_data, fmt='csv.gz', filename='healthkart_report.zip', data_version=None,
+                        export_dir=EXPORT_DIR):
+    """Write a report bundle (see write_bundle) as a new export and return its path"""
+    if fmt not in bundle_formats():
+        raise ValueError(f"Unsupported bundle format: {fmt} (available: {', '.join(bundle_formats())})")
+    return write_bundle(report_data, new_export_path(filename, export_dir), fmt, data_version)
+
+def create_downloadable_bundle(report_data, fmt='csv.gz', data_version=None, filename='healthkart_report.zip'):
+    """Write the report as an export bundle and link to it"""
+    path = write_export_bundle(report_data, fmt, filename, data_version)
+    return export_link(path, f"Download {filename} ({fmt})")
 
 def create_downloadable_insights(insights_text, filename="insights_report.md"):
-    """Create a downloadable insights report"""
-    b64 = base64.b64encode(insights_text.encode()).decode()
-    href = f'<a href="data:file/markdown;base64,{b64}" download="{filename}">Download Insights Report</a>'
-    return href
+    """Write the insights report as an export and link to it"""
+    return export_link(write_export([insights_text], filename), "Download Insights Report")
 
@@ -0,0 +1,344 @@
+import argparse
+import csv
+import io
+import json
+import os
+import random
+import threading
+import time
+import urllib.request
+from datetime import date, datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+
+from data_processor import DataProcessor
+from schema import DATE_FORMAT, TABLE_SCHEMAS
+from shared_processor import SharedProcessor
+
+INGEST_PORT = 8504
+# A batch is flushed at this many events, or once its oldest event is this old
+MAX_BATCH_EVENTS = 2000
+MAX_BATCH_DELAY = 1.0
+MAX_REQUEST_BYTES = 16 * 2**20
+
+
+def event_row(event, columns):
+    """One tracking event as a CSV row in file column order; ValueError if malformed"""
+    if None in event:
+        raise ValueError("too many fields")
+    row = []
+    for column in columns:
+        value = event.get(column)
+        if value is None or value == '':
+            raise ValueError(f"missing field '{column}'")
+        kind = TABLE_SCHEMAS['tracking_data'].get(column)
+        if kind in ('id', 'count'):
+            value = int(value)
+            if value < 0:
+                raise ValueError(f"'{column}' must not be negative")
+        elif kind == 'amount':
+            value = float(value)
+        elif kind == 'date':
+            value = datetime.strptime(str(value), DATE_FORMAT).strftime(DATE_FORMAT)
+        else:
+            value = str(value)
+            if '\n' in value or '\r' in value:
+                raise ValueError(f"'{column}' must be a single line")
+        row.append(value)
+    return row
+
+
+def append_rows(path, rows):
+    """Append CSV rows to a file and fsync it, so an acknowledged batch survives a crash
+
+    A failed write is cut back off the file before the error is raised, so
+    the batch can be retried whole without leaving a partial row behind.
+    """
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator='\n').writerows(rows)
+    data = buffer.getvalue().encode()
+    with open(path, 'ab') as f:
+        size = f.tell()
+        # Never glue the first row onto a last line that lacks its newline
+        if size > 0:
+            with open(path, 'rb') as tail:
+                tail.seek(-1, os.SEEK_END)
+                if tail.read(1) != b'\n':
+                    data = b'\n' + data
+        try:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        except OSError:
+            os.ftruncate(f.fileno(), size)
+            raise
+    return len(data)
+
+
+class MicroBatcher:
+    """Buffers validated events and applies them in micro-batches
+
+    A batch is flushed once it holds max_events or its oldest event has
+    waited max_delay seconds. Each flush appends the batch to
+    tracking_data.csv durably, then folds it into the shared processor with
+    ingest_tail(), which parses only the bytes just appended. Other processes
+    (the dashboard) pick the same rows up from the file tail.
+
+    A batch that cannot be written goes back to the front of the buffer; one
+    written but not folded in stays in the file for the next flush to fold.
+    Either way the flusher keeps running, retries after max_delay, and
+    counts the failure in stats with its last error.
+    """
+
+    def __init__(self, shared, max_events=MAX_BATCH_EVENTS, max_delay=MAX_BATCH_DELAY):
+        self.shared = shared
+        self.max_events = max_events
+        self.max_delay = max_delay
+        self.stats = {'accepted': 0, 'batches': 0, 'written': 0, 'last_flush_ms': 0.0,
+                      'write_errors': 0, 'ingest_errors': 0, 'last_error': None}
+        self._rows = []
+        self._oldest = None
+        # Written rows not yet folded into the shared processor, and when to retry a failure
+        self._unapplied = False
+        self._retry_at = 0.0
+        self._stopped = False
+        self._condition = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, daemon=True, name='IngestFlushThread')
+
+    @property
+    def tracking_path(self):
+        return os.path.join(self.shared.get().data_dir, 'tracking_data.csv')
+
+    @property
+    def columns(self):
+        return self.shared.get().tracking_columns
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def add(self, rows):
+        """Queue rows (already validated, in file column order) for the next batch"""
+        with self._condition:
+            if not self._rows:
+                self._oldest = time.monotonic()
+            self._rows.extend(rows)
+            self.stats['accepted'] += len(rows)
+            if len(self._rows) >= self.max_events:
+                self._condition.notify()
+
+    @property
+    def buffered(self):
+        with self._condition:
+            return len(self._rows)
+
+    def _next_due(self):
+        """Monotonic time of the next flush, None while there is nothing to flush"""
+        if self._unapplied or len(self._rows) >= self.max_events:
+            return self._retry_at
+        if not self._rows:
+            return None
+        return max(self._retry_at, self._oldest + self.max_delay)
+
+    def _due(self):
+        due = self._next_due()
+        return due is not None and time.monotonic() >= due
+
+    def _take(self):
+        with self._condition:
+            rows, self._rows = self._rows, []
+            return rows, self._oldest
+
+    def _requeue(self, rows, oldest):
+        """Put rows of a failed batch back in front of any queued since"""
+        with self._condition:
+            self._rows = rows + self._rows
+            self._oldest = oldest
+
+    def _failed(self, counter, error):
+        print(f"Error flushing ingested events: {error}")
+        with self._condition:
+            self.stats[counter] += 1
+            self.stats['last_error'] = str(error)
+            self._retry_at = time.monotonic() + self.max_delay
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._stopped and not self._due():
+                    due = self._next_due()
+                    self._condition.wait(None if due is None else max(0.0, due - time.monotonic()))
+                stopped = self._stopped
+            self.flush()
+            if stopped:
+                return
+
+    def flush(self):
+        """Write and apply whatever is buffered now; returns the number of rows written"""
+        with self._flush_lock:
+            rows, oldest = self._take()
+            if not rows and not self._unapplied:
+                return 0
+            started = time.perf_counter()
+            if rows:
+                try:
+                    append_rows(self.tracking_path, rows)
+                except Exception as e:
+                    self._requeue(rows, oldest)
+                    self._failed('write_errors', e)
+                    return 0
+                self.stats['written'] += len(rows)
+            try:
+                ingested = self.shared.ingest_tail()
+            except Exception as e:
+                ingested, error = None, e
+            else:
+                error = "ingest_tail failed; the rows stay in tracking_data.csv for the next flush"
+            with self._condition:
+                self._unapplied = ingested is None
+            if ingested is None:
+                self._failed('ingest_errors', error)
+            self.stats['batches'] += 1
+            self.stats['last_flush_ms'] = (time.perf_counter() - started) * 1000
+            return len(rows)
+
+    def stop(self):
+        """Flush the remaining events and stop the background flusher"""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        if self._thread.is_alive():
+            self._thread.join()
+        self.flush()
+        if self.buffered:
+            print(f"WARNING: {self.buffered} events could not be written: {self.stats['last_error']}")
+
+
+class IngestHandler(BaseHTTPRequestHandler):
+    """POST /events (JSON object or list, or headerless text/csv), GET /stats, GET /health"""
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_events(self, columns):
+        length = int(self.headers.get('Content-Length', 0))
+        if length > MAX_REQUEST_BYTES:
+            raise OverflowError(f"request larger than {MAX_REQUEST_BYTES} bytes")
+        body = self.rfile.read(length).decode()
+        if 'text/csv' in self.headers.get('Content-Type', ''):
+            return list(csv.DictReader(io.StringIO(body), fieldnames=columns))
+        payload = json.loads(body)
+        return payload if isinstance(payload, list) else [payload]
+
+    def do_POST(self):
+        if self.path != '/events':
+            self._send_json(404, {'error': 'not found'})
+            return
+        batcher = self.server.batcher
+        try:
+            columns = batcher.columns
+            rows = [event_row(event, columns) for event in self._read_events(columns)]
+        except OverflowError as e:
+            self._send_json(413, {'error': str(e)})
+            return
+        except (ValueError, TypeError, AttributeError, UnicodeDecodeError) as e:
+            self._send_json(400, {'error': str(e)})
+            return
+        batcher.add(rows)
+        self._send_json(202, {'accepted': len(rows)})
+
+    def do_GET(self):
+        batcher = self.server.batcher
+        if self.path == '/health':
+            self._send_json(200, {'status': 'ok'})
+        elif self.path == '/stats':
+            processor = batcher.shared.get()
+            campaigns = processor.get_campaign_performance()
+            self._send_json(200, {
+                **batcher.stats,
+                'buffered': batcher.buffered,
+                'data_version': processor.data_version,
+                'events': int(processor.cube_stats['events']),
+                'campaign_revenue': {
+                    str(campaign): round(float(revenue), 2)
+                    for campaign, revenue in zip(campaigns['campaign'], campaigns['revenue'])
+                },
+            })
+        else:
+            self._send_json(404, {'error': 'not found'})
+
+    def log_message(self, format, *args):
+        # Keep the shared console readable under load
+        pass
+
+
+def make_ingest_server(shared, port=INGEST_PORT, max_events=MAX_BATCH_EVENTS, max_delay=MAX_BATCH_DELAY):
+    """HTTP server on localhost:port with a started MicroBatcher attached as server.batcher"""
+    server = ThreadingHTTPServer(('localhost', port), IngestHandler)
+    server.daemon_threads = True
+    server.batcher = MicroBatcher(shared, max_events, max_delay).start()
+    return server
+
+
+def run_ingest_service(port=INGEST_PORT, data_dir=None, max_events=MAX_BATCH_EVENTS, max_delay=MAX_BATCH_DELAY):
+    shared = SharedProcessor(**({'data_dir': data_dir} if data_dir else {}))
+    if shared.get() is None:
+        raise SystemExit("ERROR: could not load data for the ingestion service")
+    server = make_ingest_server(shared, port, max_events, max_delay)
+    print(f"Ingestion service running at http://localhost:{port}/events")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.batcher.stop()
+        server.server_close()
+
+
+def generate_load(url, events_per_second, seconds, request_events=500, data_dir=None):
+    """Post synthetic events (resampled from tracking_data.csv, dated today) at a steady rate"""
+    data_dir = data_dir or DataProcessor(use_cache=False).data_dir
+    templates = pd.read_csv(os.path.join(data_dir, 'tracking_data.csv'), nrows=1000).to_dict('records')
+    today = date.today().strftime(DATE_FORMAT)
+
+    sent = 0
+    started = time.monotonic()
+    while time.monotonic() - started < seconds:
+        due = int((time.monotonic() - started) * events_per_second) - sent
+        if due <= 0:
+            time.sleep(0.01)
+            continue
+        events = [{**random.choice(templates), 'date': today} for _ in range(min(due, request_events))]
+        request = urllib.request.Request(
+            f'{url}/events', data=json.dumps(events).encode(),
+            headers={'Content-Type': 'application/json'}, method='POST')
+        with urllib.request.urlopen(request) as response:
+            response.read()
+        sent += len(events)
+    elapsed = time.monotonic() - started
+    print(f"Sent {sent:,} events in {elapsed:.1f}s ({sent / elapsed:,.0f} events/s)")
+    return sent
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Local ingestion service for tracking events")
+    parser.add_argument('--port', type=int, default=INGEST_PORT)
+    parser.add_argument('--data-dir', help="directory holding tracking_data.csv (DataProcessor default if omitted)")
+    parser.add_argument('--max-events', type=int, default=MAX_BATCH_EVENTS)
+    parser.add_argument('--max-delay', type=float, default=MAX_BATCH_DELAY)
+    parser.add_argument('--load', type=float, metavar='EVENTS_PER_SEC',
+                        help="run the load generator against a running service instead")
+    parser.add_argument('--seconds', type=float, default=10)
+    args = parser.parse_args()
+
+    if args.load:
+        generate_load(f'http://localhost:{args.port}', args.load, args.seconds, data_dir=args.data_dir)
+    else:
+        run_ingest_service(args.port, args.data_dir, args.max_events, args.max_delay)
@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+
+
+def encode_column(column):
+    """Dense integer codes (-1 for missing) and their labels for one key column"""
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        codes = column.cat.codes.to_numpy().astype(np.int64)
+        return codes, column.cat.categories
+    codes, labels = pd.factorize(column, sort=True)
+    return codes.astype(np.int64), labels
+
+
+def encode_columns(df, columns):
+    """encode_column for each of `columns` of df"""
+    return {column: encode_column(df[column]) for column in columns}
+
+
+def combine_codes(codes, sizes):
+    """Fold several code arrays into one code per distinct combination (mixed radix)
+
+    Rows missing any key get -1. Returns the combined codes and the number
+    of possible combinations.
+    """
+    combined = codes[0].astype(np.int64)
+    missing = combined < 0
+    for key_codes, size in zip(codes[1:], sizes[1:]):
+        combined *= size
+        combined += key_codes
+        missing |= key_codes < 0
+    if missing.any():
+        combined[missing] = -1
+    return combined, int(np.prod(sizes, dtype=np.int64))
+
+
+def split_codes(combined, sizes):
+    """Inverse of combine_codes for non-missing codes"""
+    if not sizes:
+        return []
+    return list(np.unravel_index(combined, sizes))
+
+
+def drop_missing(codes, *arrays):
+    """codes and aligned arrays without the rows whose key is missing (-1)"""
+    if not len(codes) or codes.min() >= 0:
+        return (codes,) + arrays
+    present = codes >= 0
+    return (codes[present],) + tuple(array[present] for array in arrays)
+
+
+def group_count(codes, size):
+    """Rows per group; rows with a missing key (-1) are skipped"""
+    codes, = drop_missing(codes)
+    return np.bincount(codes, minlength=size)
+
+
+def group_sum(codes, size, values):
+    """Sum of `values` per group; rows with a missing key (-1) are skipped"""
+    codes, values = drop_missing(codes, values)
+    # bincount returns ints for empty weights; sums are always float
+    return np.bincount(codes, weights=values, minlength=size).astype(np.float64, copy=False)
+
+
+# Largest group x member space counted with a dense presence table instead of a sort
+DENSE_PAIR_LIMIT = 1 << 24
+
+
+def group_nunique(codes, size, members, n_members):
+    """Distinct members per group, e.g. influencers per campaign"""
+    pairs, n_pairs = combine_codes([codes, members], [size, n_members])
+    pairs, = drop_missing(pairs)
+    if n_pairs <= DENSE_PAIR_LIMIT:
+        present = np.bincount(pairs, minlength=n_pairs).reshape(size, n_members) > 0
+        return present.sum(axis=1)
+    pairs = np.unique(pairs)
+    return np.bincount(pairs // n_members, minlength=size)
+
+
+def rollup(codes, size, measures, members=None, n_members=0):
+    """Per-group sums of each measure (and distinct members), for observed groups only
+
+    Returns the observed group codes in ascending order, a dict of per-group
+    sums keyed like `measures` (integer measures stay integer), and the
+    distinct member count per group (None without members).
+    """
+    observed = np.flatnonzero(group_count(codes, size))
+    sums = {}
+    for name, values in measures.items():
+        totals = group_sum(codes, size, values)[observed]
+        if np.issubdtype(values.dtype, np.integer):
+            totals = np.rint(totals).astype(np.int64)
+        sums[name] = totals
+    distinct = None
+    if members is not None:
+        distinct = group_nunique(codes, size, members, n_members)[observed]
+    return observed, sums, distinct
@@ -0,0 +1,142 @@
+import multiprocessing
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from kernels import combine_codes, group_count, group_sum
+
+# Selections smaller than this are aggregated in-process; the round trip to
+# the workers costs more than it saves
+PARALLEL_MIN_CELLS = 200_000
+
+# Cube arrays of the worker process, installed once when the worker starts
+_worker_arrays = None
+
+
+def month_partitions(date_index):
+    """Row ranges (lo, hi) of each calendar month in date-sorted rows"""
+    if not len(date_index):
+        return []
+    months = date_index.days.astype('datetime64[M]')
+    starts = np.flatnonzero(np.concatenate([[True], months[1:] != months[:-1]]))
+    bounds = np.append(date_index.offsets[starts], date_index.size)
+    return [(int(lo), int(hi)) for lo, hi in zip(bounds[:-1], bounds[1:])]
+
+
+def _init_worker(arrays):
+    global _worker_arrays
+    _worker_arrays = arrays
+
+
+def partial_rollup(task):
+    """Partial aggregates of one partition, one per grouping
+
+    Each partial is (observed groups, per-group sums, partial distinct
+    sketches by name). Sketches rather than distinct counts are returned,
+    because counts of different partitions cannot be added: a value seen in
+    two months would be counted twice.
+    """
+    lo, hi, positions, groupings, measures, sketch_names = task
+    rows = slice(lo, hi) if positions is None else positions
+    codes_by_key = _worker_arrays['codes']
+
+    partials = []
+    for keys in groupings:
+        if keys:
+            codes, size = combine_codes([codes_by_key[key][0][rows] for key in keys],
+                                        [codes_by_key[key][1] for key in keys])
+        else:
+            codes, size = np.zeros(hi - lo if positions is None else len(positions), dtype=np.int64), 1
+        observed = np.flatnonzero(group_count(codes, size))
+        sums = {name: group_sum(codes, size, _worker_arrays['measures'][column][rows])[observed]
+                for name, column in measures.items()}
+        sketches = {}
+        if sketch_names:
+            groups = codes
+            if positions is not None:
+                groups = np.full(hi - lo, -1, dtype=np.int64)
+                groups[positions - lo] = codes
+            sketches = {name: _worker_arrays['sketches'][name].partial(lo, hi, groups) for name in sketch_names}
+        partials.append((observed, sums, sketches))
+    return partials
+
+
+def merge_partials(partials, size, integer_measures=(), sketches=None):
+    """Exact merge of partial_rollup results into (observed, sums, distinct counts by name)
+
+    Group sums add; the partitions' distinct sketches are merged (union or
+    register maximum) before anything is counted.
+    """
+    observed = np.unique(np.concatenate([partial[0] for partial in partials]))
+    groups = np.concatenate([partial[0] for partial in partials])
+    sums = {}
+    for name in partials[0][1]:
+        values = np.concatenate([partial[1][name] for partial in partials])
+        totals = np.bincount(groups, weights=values, minlength=size)[observed]
+        if name in integer_measures:
+            totals = np.rint(totals).astype(np.int64)
+        sums[name] = totals
+    distinct = {}
+    for name in partials[0][2]:
+        sketch = sketches[name]
+        merged = sketch.merge([partial[2][name] for partial in partials])
+        distinct[name] = sketch.estimate(merged, observed)
+    return observed, sums, distinct
+
+
+class PartitionPool:
+    """Worker processes aggregating month partitions of one version of the cube
+
+    The workers receive the cube's key codes, measures and distinct sketches
+    once, at start-up (inherited, not copied, where processes fork), so a
+    query ships only partition bounds and the selected positions. Each partition is reduced
+    to partial aggregates in a worker and the partials are merged exactly.
+    The workers shut down once the pool is no longer referenced.
+    """
+
+    def __init__(self, codes, measures, sketches, partitions, workers):
+        context = None
+        if 'fork' in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context('fork')
+        self.partitions = partitions
+        self.workers = workers
+        self.executor = ProcessPoolExecutor(
+            workers, mp_context=context, initializer=_init_worker,
+            initargs=({'codes': codes, 'measures': measures, 'sketches': sketches},),
+        )
+        self.sketches = sketches
+        self._sizes = {key: size for key, (_, size) in codes.items()}
+        self._integer_measures = {column for column, values in measures.items()
+                                  if np.issubdtype(values.dtype, np.integer)}
+        self._finalizer = weakref.finalize(self, self.executor.shutdown, wait=False, cancel_futures=True)
+
+    def rollup(self, positions, groupings, measures, sketch_names=()):
+        """(observed, sums, distinct counts) for each grouping (a list of encoded keys) over the cells at `positions`
+
+        measures maps output names to cube measure columns and sketch_names
+        picks the distinct sketches to count. Positions must be ascending, as
+        views hold them.
+        """
+        tasks = []
+        for lo, hi in self.partitions:
+            selected = None
+            if positions is not None:
+                selected = positions[np.searchsorted(positions, lo):np.searchsorted(positions, hi)]
+                if not len(selected):
+                    continue
+            tasks.append((lo, hi, selected, groupings, measures, sketch_names))
+        if not tasks:
+            tasks.append((0, 0, None, groupings, measures, sketch_names))
+        partials = list(self.executor.map(partial_rollup, tasks))
+
+        integer_measures = [name for name, column in measures.items() if column in self._integer_measures]
+        results = []
+        for i, keys in enumerate(groupings):
+            size = int(np.prod([self._sizes[key] for key in keys], dtype=np.int64))
+            results.append(merge_partials([partial[i] for partial in partials], size,
+                                          integer_measures, self.sketches))
+        return results
+
+    def shutdown(self):
+        self._finalizer()
@@ -0,0 +1,142 @@
+import copy
+
+import numpy as np
+import pandas as pd
+
+from kernels import drop_missing
+
+# Keys with more members than this get no dense members x days prefix sums
+PREFIX_MAX_MEMBERS = 1024
+# Activity keys hold the day in their low bits, so keys of earlier days stay
+# valid as days are added
+DAY_BITS = 32
+DAY_MASK = (1 << DAY_BITS) - 1
+
+
+def daily_sums(codes, day_codes, size, n_days, values):
+    """Sum of `values` per member and day, members x days; cells with a missing member are skipped"""
+    cell_codes, cell_values = drop_missing(codes * n_days + day_codes, values)
+    daily = np.bincount(cell_codes, weights=cell_values, minlength=size * n_days)
+    return daily.reshape(size, n_days)
+
+
+def cumulate(daily, before=None):
+    """Running sums of daily values per member, one column per day boundary, continuing `before`
+
+    `before` holds the leading day-boundary columns of an earlier index;
+    sums continue from its last column exactly as if it had been recomputed.
+    """
+    if before is None:
+        before = np.zeros((len(daily), 1))
+    cumulative = np.concatenate([before, daily], axis=1)
+    start = before.shape[1] - 1
+    np.cumsum(cumulative[:, start:], axis=1, out=cumulative[:, start:])
+    return cumulative
+
+
+class PrefixSumIndex:
+    """Cumulative daily totals per dimension member over the date-sorted cube
+
+    cumulative[dim][measure] holds one row per member and one column per day
+    boundary (days + 1). A member's total over any run of days is then the
+    difference of two entries, and its daily values are adjacent differences,
+    so no cell is rescanned for a date window.
+    """
+
+    def __init__(self, days, day_codes, keys, measures):
+        self.days = days
+        n_days = len(days)
+        self.cumulative = {}
+        for dim, (codes, size) in keys.items():
+            self.cumulative[dim] = {
+                name: cumulate(daily_sums(codes, day_codes, size, n_days, values))
+                for name, values in measures.items()
+            }
+
+    def splice(self, start, day, days, day_codes, keys, measures, rebuild=()):
+        """Index over `days` with the sums from day `day` (first cell `start`) onward recomputed
+
+        day_codes, keys and measures cover every cell of the date-sorted cube,
+        whose cells before `start` are unchanged. Measures named in `rebuild`
+        changed on earlier days too, so they are summed over every cell.
+        """
+        index = copy.copy(self)
+        index.days = days
+        index.cumulative = {}
+        for dim, (codes, size) in keys.items():
+            sums = {}
+            for name, values in measures.items():
+                if name in rebuild:
+                    sums[name] = cumulate(daily_sums(codes, day_codes, size, len(days), values))
+                else:
+                    daily = daily_sums(codes[start:], day_codes[start:] - day, size, len(days) - day, values[start:])
+                    sums[name] = cumulate(daily, self.cumulative[dim][name][:, :day + 1])
+            index.cumulative[dim] = sums
+        return index
+
+    def day_range(self, start_date=None, end_date=None):
+        """Day boundaries (lo, hi) covering start_date to end_date inclusive"""
+        lo, hi = 0, len(self.days)
+        if start_date is not None:
+            lo = int(np.searchsorted(self.days, np.datetime64(pd.Timestamp(start_date), 'D'), side='left'))
+        if end_date is not None:
+            hi = int(np.searchsorted(self.days, np.datetime64(pd.Timestamp(end_date), 'D'), side='right'))
+        return lo, max(lo, hi)
+
+    def totals(self, dim, lo, hi, members=None):
+        """Per-member totals of every measure over days lo:hi, or summed over `members`"""
+        totals = {}
+        for name, cumulative in self.cumulative[dim].items():
+            window = cumulative[:, hi] - cumulative[:, lo]
+            totals[name] = window if members is None else window[members].sum()
+        return totals
+
+    def daily(self, dim, lo, hi, members=None):
+        """Daily values of every measure over days lo:hi, summed over `members` (default all)"""
+        daily = {}
+        for name, cumulative in self.cumulative[dim].items():
+            rows = cumulative if members is None else cumulative[members]
+            daily[name] = np.diff(rows[:, lo:hi + 1], axis=1).sum(axis=0)
+        return daily
+
+    @property
+    def nbytes(self):
+        return sum(array.nbytes for sums in self.cumulative.values() for array in sums.values())
+
+
+class ActiveDays:
+    """Days on which each member of a key has cells, for keys too large to index densely
+
+    Holds the sorted (member, day) key of every member and day that occur:
+    no more entries than cube cells, however many members there are.
+    Whether each member is active in a day window is one binary search.
+    """
+
+    def __init__(self, codes, day_codes, size):
+        self.size = size
+        self.keys = activity_keys(codes, day_codes)
+
+    def splice(self, start, day, codes, day_codes):
+        """Activity with the days from `day` (first cell `start`) onward taken from the given cube cells"""
+        kept = self.keys[(self.keys & DAY_MASK) < day]
+        added = activity_keys(codes[start:], day_codes[start:])
+        index = copy.copy(self)
+        index.keys = np.insert(kept, np.searchsorted(kept, added), added)
+        return index
+
+    def active(self, lo, hi):
+        """Per member, whether it has any cell within days lo:hi"""
+        starts = np.arange(self.size, dtype=np.int64) << DAY_BITS
+        first = np.searchsorted(self.keys, starts + lo)
+        found = np.append(self.keys, np.iinfo(np.int64).max)[first]
+        return found < starts + hi
+
+    @property
+    def nbytes(self):
+        return self.keys.nbytes
+
+
+def activity_keys(codes, day_codes):
+    """Distinct, sorted (member, day) keys of cells; cells with a missing member are skipped"""
+    present = codes >= 0
+    return np.unique((codes[present].astype(np.int64) << DAY_BITS) | day_codes[present])
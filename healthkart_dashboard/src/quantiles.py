@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+
+# Quantiles are within this relative error of the true value
+DEFAULT_RELATIVE_ACCURACY = 0.01
+HISTOGRAM_BINS = 20
+
+
+class QuantileSketch:
+    """Mergeable quantile sketch over logarithmic buckets (DDSketch style)
+
+    A positive value x lands in bucket ceil(log_gamma(x)) with
+    gamma = (1 + a) / (1 - a), so every value in a bucket is within relative
+    accuracy a of the bucket's representative. The sketch is just counts per
+    bucket (plus zeros): merging adds counts, and its size depends on the
+    spread of the values, not on how many there are. Sketches are never
+    modified once built.
+    """
+
+    def __init__(self, keys=None, counts=None, zero_count=0, relative_accuracy=DEFAULT_RELATIVE_ACCURACY,
+                 minimum=np.nan, maximum=np.nan):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.keys = np.zeros(0, dtype=np.int64) if keys is None else keys
+        self.counts = np.zeros(0, dtype=np.int64) if counts is None else counts
+        self.zero_count = int(zero_count)
+        self.min = minimum
+        self.max = maximum
+
+    @classmethod
+    def from_values(cls, values, relative_accuracy=DEFAULT_RELATIVE_ACCURACY):
+        """Sketch of the finite, non-negative `values` (others are skipped)"""
+        values = np.asarray(values, dtype=np.float64)
+        values = values[np.isfinite(values) & (values >= 0)]
+        if not len(values):
+            return cls(relative_accuracy=relative_accuracy)
+        gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        positive = values[values > 0]
+        keys, counts = np.unique(np.ceil(np.log(positive) / np.log(gamma)).astype(np.int64), return_counts=True)
+        return cls(keys, counts, len(values) - len(positive), relative_accuracy, values.min(), values.max())
+
+    def merge(self, other):
+        """Sketch of the values of both sketches"""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge quantile sketches of different accuracy")
+        keys, inverse = np.unique(np.concatenate([self.keys, other.keys]), return_inverse=True)
+        counts = np.bincount(inverse, weights=np.concatenate([self.counts, other.counts]), minlength=len(keys))
+        return QuantileSketch(keys, counts.astype(np.int64), self.zero_count + other.zero_count,
+                              self.relative_accuracy, np.fmin(self.min, other.min), np.fmax(self.max, other.max))
+
+    @property
+    def count(self):
+        return self.zero_count + int(self.counts.sum())
+
+    def _values(self):
+        """Representative value of each bucket, clamped to the observed range"""
+        values = 2 * self.gamma ** self.keys.astype(np.float64) / (self.gamma + 1)
+        return np.clip(values, self.min, self.max)
+
+    def quantiles(self, qs):
+        """Values at quantiles `qs` (0..1), NaN when empty"""
+        qs = np.asarray(qs, dtype=np.float64)
+        if not self.count:
+            return np.full(qs.shape, np.nan)
+        values = self._values()
+        if not len(values):
+            return np.zeros(qs.shape)
+        ranks = np.floor(qs * (self.count - 1))
+        cumulative = self.zero_count + np.cumsum(self.counts)
+        bucket = np.minimum(np.searchsorted(cumulative, ranks, side='right'), len(values) - 1)
+        return np.where(ranks < self.zero_count, 0.0, values[bucket])
+
+    def mean(self):
+        """Mean of the bucket representatives, within the sketch's relative accuracy"""
+        if not self.count:
+            return np.nan
+        return float((self._values() * self.counts).sum() / self.count)
+
+    def histogram(self, bins=HISTOGRAM_BINS):
+        """Counts over `bins` equal-width bins spanning the observed range
+
+        One row per bin whatever the number of values, so charts drawn from
+        it have a constant payload.
+        """
+        if not self.count:
+            return pd.DataFrame({'bin_start': [], 'bin_end': [], 'count': []})
+        edges = np.linspace(self.min, self.max, bins + 1) if self.max > self.min else np.array([self.min, self.min + 1])
+        values = np.concatenate([[0.0], self._values()])
+        counts = np.concatenate([[self.zero_count], self.counts])
+        which = np.clip(np.searchsorted(edges, values, side='right') - 1, 0, len(edges) - 2)
+        return pd.DataFrame({
+            'bin_start': edges[:-1],
+            'bin_end': edges[1:],
+            'count': np.bincount(which, weights=counts, minlength=len(edges) - 1).astype(np.int64),
+        })
+
+    @property
+    def nbytes(self):
+        return self.keys.nbytes + self.counts.nbytes
@@ -0,0 +1,135 @@
+from datetime import datetime
+
+# Influencers listed in the report's best and worst tables
+REPORT_TOP_N = 10
+# Of which the insights text names the first few
+INSIGHTS_TOP_N = 5
+
+
+class ReportSnapshot:
+    """Every figure the reports need, computed in one pass over a scope
+
+    Built from a DataProcessor or FilteredView: one rollup scan for the
+    campaign, product and platform tables and one ROAS table from which the
+    best and worst influencers and the category averages are derived. Each
+    report format renders from the snapshot without going back to the data.
+    Snapshots are shared between callers and never modified once built.
+    """
+
+    def __init__(self, metrics):
+        self.summary = metrics.get_summary_stats()
+        rollups = metrics.get_rollups(['campaign', 'product', 'platform'])
+        self.campaign_performance = rollups['campaign']
+        self.product_performance = rollups['product']
+        self.platform_performance = rollups['platform']
+        self.influencer_metrics = metrics.calculate_roas()
+        self.top_performers = self.influencer_metrics.nlargest(REPORT_TOP_N, 'roas')
+        self.underperformers = self.influencer_metrics.nsmallest(REPORT_TOP_N, 'roas')
+        self.category_roas = (self.influencer_metrics.groupby('category', observed=True)['roas']
+                              .mean().sort_values(ascending=False))
+        self.profitable_count = int((self.influencer_metrics['roas'] > 1).sum())
+        self.avg_roas = self.influencer_metrics['roas'].mean()
+        self.data_version = metrics.data_version
+
+    def report_data(self):
+        """The summary report dict: summary figures and one table per section"""
+        # Shallow copies: copy-on-write keeps the snapshot's own tables intact
+        return {
+            'summary_stats': dict(self.summary),
+            'campaign_performance': self.campaign_performance.copy(deep=False),
+            'product_performance': self.product_performance.copy(deep=False),
+            'platform_performance': self.platform_performance.copy(deep=False),
+            'top_performers': self.top_performers.copy(deep=False),
+            'underperformers': self.underperformers.copy(deep=False),
+            'all_influencers': self.influencer_metrics.copy(deep=False),
+        }
+
+
+def revenue_shares(table, label, total_revenue):
+    """'label: revenue (share of total)' lines of a rollup table"""
+    shares = table['revenue'] / total_revenue * 100
+    return [f"  - {name}: ₹{revenue:,.0f} ({pct:.1f}%)"
+            for name, revenue, pct in zip(table[label], table['revenue'], shares)]
+
+
+def render_insights(snapshot):
+    """Markdown insights report of a snapshot"""
+    summary = snapshot.summary
+    campaign_perf = snapshot.campaign_performance
+    product_perf = snapshot.product_performance
+    platform_perf = snapshot.platform_performance
+    influencer_count = len(snapshot.influencer_metrics)
+
+    insights = []
+
+    # Overall performance insights
+    insights.append("# HealthKart Influencer Marketing ROI Analysis")
+    insights.append(f"**Report Generated:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    insights.append("")
+
+    insights.append("## Executive Summary")
+    insights.append(f"- **Total Revenue Generated:** ₹{summary['total_revenue']:,.0f}")
+    insights.append(f"- **Total Orders:** {summary['total_orders']:,.0f}")
+    insights.append(f"- **Overall ROAS:** {summary['overall_roas']:.2f}x")
+    insights.append(f"- **Total Influencers:** {summary['total_influencers']:,.0f}")
+    if summary.get('unique_buyers') is not None:
+        insights.append(f"- **Unique Buyers:** {summary['unique_buyers']:,.0f}")
+    insights.append(f"- **Average Order Value:** ₹{summary['avg_order_value']:,.0f}")
+    insights.append("")
+
+    # Campaign insights
+    best_campaign = campaign_perf.loc[campaign_perf['roas'].idxmax()]
+    worst_campaign = campaign_perf.loc[campaign_perf['roas'].idxmin()]
+
+    insights.append("## Campaign Performance Insights")
+    insights.append(f"- **Best Performing Campaign:** {best_campaign['campaign']} (ROAS: {best_campaign['roas']:.2f}x)")
+    insights.append(f"- **Worst Performing Campaign:** {worst_campaign['campaign']} (ROAS: {worst_campaign['roas']:.2f}x)")
+    insights.append(f"- **Total Campaigns:** {len(campaign_perf)}")
+    insights.append("")
+
+    # Platform insights
+    best_platform = platform_perf.loc[platform_perf['roas'].idxmax()]
+    insights.append("## Platform Performance Insights")
+    insights.append(f"- **Best Performing Platform:** {best_platform['platform']} (ROAS: {best_platform['roas']:.2f}x)")
+    insights.append(f"- **Platform Revenue Distribution:**")
+    insights.extend(revenue_shares(platform_perf, 'platform', summary['total_revenue']))
+    insights.append("")
+
+    # Product insights
+    best_product = product_perf.loc[product_perf['roas'].idxmax()]
+    insights.append("## Product Performance Insights")
+    insights.append(f"- **Best Performing Product:** {best_product['product']} (ROAS: {best_product['roas']:.2f}x)")
+    insights.append(f"- **Product Revenue Distribution:**")
+    insights.extend(revenue_shares(product_perf, 'product', summary['total_revenue']))
+    insights.append("")
+
+    # Influencer insights
+    profitable_count = snapshot.profitable_count
+    insights.append("## Influencer Performance Insights")
+    insights.append(f"- **Profitable Influencers:** {profitable_count}/{influencer_count} ({(profitable_count/influencer_count*100):.1f}%)")
+    insights.append(f"- **Average ROAS:** {snapshot.avg_roas:.2f}x")
+    insights.append(f"- **Top {INSIGHTS_TOP_N} Performers by ROAS:**")
+
+    top = snapshot.top_performers.head(INSIGHTS_TOP_N)
+    for i, (name, platform, roas, revenue) in enumerate(
+            zip(top['name'], top['platform'], top['roas'], top['revenue']), 1):
+        insights.append(f"  {i}. {name} ({platform}) - ROAS: {roas:.2f}x, Revenue: ₹{revenue:,.0f}")
+
+    insights.append("")
+    insights.append("## Recommendations")
+
+    # Generate recommendations based on data
+    if best_platform['roas'] > 2:
+        insights.append(f"- **Focus on {best_platform['platform']}:** This platform shows exceptional ROAS of {best_platform['roas']:.2f}x. Consider increasing budget allocation.")
+
+    if profitable_count / influencer_count < 0.7:
+        insights.append("- **Influencer Optimization:** Less than 70% of influencers are profitable. Review underperforming influencers and optimize selection criteria.")
+
+    if best_campaign['roas'] > worst_campaign['roas'] * 2:
+        insights.append(f"- **Campaign Strategy:** {best_campaign['campaign']} significantly outperforms {worst_campaign['campaign']}. Analyze successful elements for replication.")
+
+    # Category analysis
+    best_category = snapshot.category_roas.index[0]
+    insights.append(f"- **Category Focus:** {best_category} category shows the best average ROAS ({snapshot.category_roas.iloc[0]:.2f}x). Consider expanding partnerships in this category.")
+
+    return "\n".join(insights)
@@ -0,0 +1,74 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+
+class LRUCache:
+    """Bounded mapping that evicts the least recently used entry
+
+    Safe to share between threads: every operation holds the cache's lock.
+    """
+
+    def __init__(self, maxsize=32):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def normalize_filters(filters):
+    """Canonical, hashable form of a filter dict; empty filters are dropped"""
+    normalized = []
+    for column, value in sorted((filters or {}).items()):
+        if value is None or len(value) == 0:
+            continue
+        if column == 'date_range':
+            value = tuple(pd.Timestamp(bound).isoformat() for bound in value)
+        else:
+            value = tuple(sorted(str(item) for item in value))
+        normalized.append((column, value))
+    return tuple(normalized)
+
+
+def fingerprint(*parts):
+    """Short stable digest of any repr-able key parts"""
+    return hashlib.sha1(repr(parts).encode()).hexdigest()[:16]
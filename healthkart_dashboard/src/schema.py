@@ -0,0 +1,133 @@
+import hashlib
+import io
+
+import pandas as pd
+
+DATE_FORMAT = '%Y-%m-%d'
+
+# Column kinds:
+#   category - low-cardinality string, loaded as pandas categorical
+#   text     - free-form string, left as read
+#   id/count - non-negative integer, downcast to the smallest safe int type
+#   amount   - money, kept as float64 so sums stay exact to the paisa
+#   date     - calendar day, parsed with DATE_FORMAT
+TABLE_SCHEMAS = {
+    'influencers': {
+        'id': 'id',
+        'name': 'text',
+        'category': 'category',
+        'gender': 'category',
+        'follower_count': 'count',
+        'platform': 'category',
+    },
+    'posts': {
+        'influencer_id': 'id',
+        'platform': 'category',
+        'date': 'date',
+        'url': 'text',
+        'caption': 'text',
+        'reach': 'count',
+        'likes': 'count',
+        'comments': 'count',
+    },
+    'tracking_data': {
+        'source': 'category',
+        'campaign': 'category',
+        'influencer_id': 'id',
+        'user_id': 'category',
+        'product': 'category',
+        'date': 'date',
+        'orders': 'count',
+        'revenue': 'amount',
+    },
+    'payouts': {
+        'influencer_id': 'id',
+        'basis': 'category',
+        'rate': 'amount',
+        'orders': 'count',
+        'total_payout': 'amount',
+    },
+}
+
+# Tables kept physically sorted, so date ranges resolve to contiguous slices
+TABLE_SORT_KEYS = {
+    'tracking_data': ['date'],
+}
+
+# Changes whenever a schema above changes, so cached copies get rebuilt
+SCHEMA_VERSION = hashlib.sha256(repr((
+    sorted((table, sorted(columns.items())) for table, columns in TABLE_SCHEMAS.items()),
+    sorted(TABLE_SORT_KEYS.items()),
+)).encode()).hexdigest()[:12]
+
+
+def read_csv_dtypes(table):
+    """dtype mapping to pass to pd.read_csv for a table"""
+    return {
+        column: 'category'
+        for column, kind in TABLE_SCHEMAS[table].items()
+        if kind == 'category'
+    }
+
+
+def apply_schema(df, table):
+    """Coerce a freshly read frame to the declared schema of `table`"""
+    for column, kind in TABLE_SCHEMAS[table].items():
+        if column not in df.columns:
+            continue
+        if kind == 'category' and not isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype('category')
+        elif kind in ('id', 'count'):
+            df[column] = pd.to_numeric(df[column], downcast='integer')
+        elif kind == 'amount':
+            df[column] = df[column].astype('float64')
+        elif kind == 'date':
+            df[column] = pd.to_datetime(df[column], format=DATE_FORMAT)
+    return df
+
+
+def sort_table(df, table):
+    """Stable-sort a table by its declared sort keys, if it has any"""
+    keys = TABLE_SORT_KEYS.get(table)
+    if not keys:
+        return df
+    return df.sort_values(keys, kind='stable', ignore_index=True)
+
+
+def parse_csv_rows(data, table, columns):
+    """Parse headerless CSV bytes of `table` (e.g. an appended tail) into its declared schema"""
+    df = pd.read_csv(io.BytesIO(data), header=None, names=columns, dtype=read_csv_dtypes(table))
+    return sort_table(apply_schema(df, table), table)
+
+
+def expand_dtypes(df):
+    """Return df in the dtypes a plain pd.read_csv would have produced"""
+    expanded = {}
+    for column in df.columns:
+        series = df[column]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            series = series.astype(series.cat.categories.dtype)
+        elif pd.api.types.is_integer_dtype(series.dtype):
+            series = series.astype('int64')
+        elif pd.api.types.is_float_dtype(series.dtype):
+            series = series.astype('float64')
+        expanded[column] = series
+    return pd.DataFrame(expanded, index=df.index)
+
+
+def memory_footprint(frames):
+    """Before/after memory usage in bytes for a dict of named frames"""
+    rows = []
+    for name, df in frames.items():
+        if df is None:
+            continue
+        before = int(expand_dtypes(df).memory_usage(deep=True).sum())
+        after = int(df.memory_usage(deep=True).sum())
+        rows.append({
+            'table': name,
+            'rows': len(df),
+            'before_bytes': before,
+            'after_bytes': after,
+            'reduction': 1 - after / before if before else 0.0,
+        })
+    return pd.DataFrame(rows, columns=['table', 'rows', 'before_bytes', 'after_bytes', 'reduction'])
@@ -0,0 +1,73 @@
+import threading
+
+from data_processor import DataProcessor
+
+
+class SharedProcessor:
+    """Process-wide handle to one loaded DataProcessor, shared by every session
+
+    Readers take the current processor with get() and never see it change
+    underneath them. reload() builds and loads a new processor off to the
+    side (copy-on-write) and swaps the reference in under a lock, so readers
+    only ever see a fully loaded processor, old or new. A failed reload
+    leaves the current processor in place. ingest_tail() does the same for
+    rows appended to tracking_data.csv, folding them into a clone.
+    """
+
+    def __init__(self, **processor_kwargs):
+        self.processor_kwargs = processor_kwargs
+        self.generation = 0
+        self._processor = None
+        self._swap_lock = threading.Lock()
+        # Serializes loads, so concurrent reloads don't race on the columnar cache
+        self._reload_lock = threading.Lock()
+
+    def get(self):
+        """Current processor, loading it on first use; None if loading failed"""
+        with self._swap_lock:
+            processor = self._processor
+        if processor is None:
+            self.reload(if_generation=0)
+            with self._swap_lock:
+                processor = self._processor
+        return processor
+
+    def reload(self, if_generation=None):
+        """Load a fresh processor and swap it in; True on success
+
+        With if_generation, the load is skipped when another thread has
+        already swapped in a newer processor (used for the first load).
+        """
+        with self._reload_lock:
+            if if_generation is not None and self.generation != if_generation:
+                return self._processor is not None
+
+            processor = DataProcessor(**self.processor_kwargs)
+            if not processor.load_data():
+                return False
+
+            self._swap(processor)
+            return True
+
+    def ingest_tail(self):
+        """Fold appended tracking rows into a clone of the current processor and swap it in
+
+        Returns the number of rows ingested (0 when the file is unchanged), or
+        None when nothing is loaded yet or the ingest failed.
+        """
+        with self._reload_lock:
+            current = self._processor
+            if current is None:
+                return None
+            if not current.has_new_tracking_data():
+                return 0
+            processor = current.clone()
+            rows = processor.ingest_tail()
+            if rows:
+                self._swap(processor)
+            return rows
+
+    def _swap(self, processor):
+        with self._swap_lock:
+            self._processor = processor
+            self.generation += 1
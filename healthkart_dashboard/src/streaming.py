@@ -0,0 +1,73 @@
+import pandas as pd
+
+from schema import apply_schema, read_csv_dtypes
+
+# Tracking rows are folded into one cell per key combination; `events` counts
+# the rows behind a cell so per-row quantities (payouts) can be reweighted.
+CELL_KEYS = ['date', 'campaign', 'product', 'source', 'influencer_id']
+CELL_MEASURES = ['revenue', 'orders', 'events']
+
+SAMPLE_ROWS = 1000
+MIN_CHUNK_ROWS = 1000
+# Share of the budget a raw chunk may use; the rest holds the running cells
+CHUNK_BUDGET_SHARE = 0.5
+# Peak parser memory relative to the parsed chunk (raw text plus buffers)
+PARSE_OVERHEAD = 3
+
+
+def estimate_chunk_rows(csv_path, memory_budget_mb):
+    """Rows per chunk that keep one parsed chunk inside its share of the budget"""
+    sample = pd.read_csv(csv_path, nrows=SAMPLE_ROWS, dtype=read_csv_dtypes('tracking_data'))
+    if sample.empty:
+        return MIN_CHUNK_ROWS
+    bytes_per_row = sample.memory_usage(deep=True).sum() / len(sample)
+    budget = memory_budget_mb * 2**20 * CHUNK_BUDGET_SHARE
+    return max(MIN_CHUNK_ROWS, int(budget / (bytes_per_row * PARSE_OVERHEAD)))
+
+
+def aggregate_cells(rows):
+    """Collapse tracking rows (or cells) into one cell per CELL_KEYS combination"""
+    if 'events' not in rows.columns:
+        rows = rows.assign(events=1)
+    return rows.groupby(CELL_KEYS, observed=True, sort=False)[CELL_MEASURES].sum().reset_index()
+
+
+def align_categories(left, right, columns=CELL_KEYS):
+    """Give categorical `columns` of both frames the same categories so concat keeps them"""
+    for column in columns:
+        if isinstance(left[column].dtype, pd.CategoricalDtype):
+            categories = left[column].cat.categories.union(right[column].cat.categories)
+            left[column] = left[column].cat.set_categories(categories)
+            right[column] = right[column].cat.set_categories(categories)
+
+
+def fold_cells(cells, new_cells):
+    """Merge two cell frames, summing the measures of matching cells"""
+    if cells is None:
+        return new_cells
+    align_categories(cells, new_cells)
+    return aggregate_cells(pd.concat([cells, new_cells], ignore_index=True))
+
+
+def stream_tracking_cells(csv_path, chunk_rows):
+    """Read tracking_data.csv in chunks of `chunk_rows`, folding each into running cells
+
+    Returns (cells, number of chunks read). Only one raw chunk is held at a
+    time, so peak memory is one chunk plus the cells, whose size is bounded
+    by the number of distinct day/campaign/product/influencer combinations
+    rather than by the number of events.
+    """
+    cells = None
+    chunks = 0
+    reader = pd.read_csv(csv_path, chunksize=chunk_rows, dtype=read_csv_dtypes('tracking_data'))
+    for chunk in reader:
+        chunk = apply_schema(chunk, 'tracking_data')
+        cells = fold_cells(cells, aggregate_cells(chunk))
+        chunks += 1
+
+    if cells is None:
+        columns = CELL_KEYS + CELL_MEASURES
+        cells = apply_schema(pd.read_csv(csv_path, nrows=0, dtype=read_csv_dtypes('tracking_data')), 'tracking_data')
+        cells = cells.assign(events=pd.Series(dtype='int64'))[columns]
+    cells = cells.sort_values(CELL_KEYS, ignore_index=True)
+    return cells, chunks
@@ -1,13 +1,43 @@
 import unittest
+import unittest.mock
 import pandas as pd
+import numpy as np
 import sys
 import os
+import shutil
+import subprocess
+import tempfile
+import io
+import zipfile
+import threading
+import warnings
+import functools
+import json
+import urllib.error
+import urllib.request
 
 # Add the src directory to the path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from data_processor import DataProcessor
-from export_utils import create_summary_report, generate_insights_text
+from data_processor import DataProcessor, GRAND_TOTAL, INFLUENCER_ATTRIBUTES, STANDARD_ROLLUPS
+from export_utils import (create_summary_report, generate_insights_text, iter_csv, write_export, export_link,
+                          write_export_bundle, bundle_formats, report_tables)
+from columnar_cache import PARQUET_AVAILABLE, ColumnarCache
+from batch_reports import run_batch, segment_filters, segment_name
+from streaming import estimate_chunk_rows
+from date_index import DateIndex
+from shared_processor import SharedProcessor
+from kernels import combine_codes, group_count, rollup, split_codes
+from ingest_service import append_rows, event_row, make_ingest_server
+import partitions as partition_module
+from partitions import merge_partials, month_partitions, partial_rollup
+from distinct import DistinctSketch
+from quantiles import QuantileSketch
+import plotly.express as px
+from charts import adaptive_scatter, cached_figure, density_frame, frame_digest, hexbin
+from result_cache import LRUCache
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
 
 class TestDataProcessor(unittest.TestCase):
     
@@ -36,7 +66,7 @@ class TestDataProcessor(unittest.TestCase):
         self.assertEqual(len(merged_df), 1000)  # Should match tracking_data length
         
         # Check that all required columns are present
-        required_columns = ['influencer_id', 'revenue', 'orders_x', 'total_payout', 'name', 'platform']
+        required_columns = ['influencer_id', 'revenue', 'orders', 'total_payout', 'name', 'platform']
         for col in required_columns:
             self.assertIn(col, merged_df.columns)
             
@@ -127,6 +157,26 @@ class TestDataProcessor(unittest.TestCase):
         roas_values = underperformers['roas'].tolist()
         self.assertEqual(roas_values, sorted(roas_values))
 
+    def test_compact_schema(self):
+        """Test that tables load with categorical keys and downcast integers"""
+        tracking = self.processor.tracking_data_df
+        for col in ['source', 'campaign', 'product', 'user_id']:
+            self.assertIsInstance(tracking[col].dtype, pd.CategoricalDtype)
+        self.assertIsInstance(self.processor.influencers_df['platform'].dtype, pd.CategoricalDtype)
+        self.assertIsInstance(self.processor.payouts_df['basis'].dtype, pd.CategoricalDtype)
+        self.assertLess(tracking['influencer_id'].dtype.itemsize, 8)
+        self.assertLess(tracking['orders'].dtype.itemsize, 8)
+        self.assertEqual(tracking['revenue'].dtype, 'float64')
+        self.assertTrue(pd.api.types.is_datetime64_any_dtype(tracking['date']))
+        
+    def test_memory_report(self):
+        """Test that the memory report shows the compact layout is smaller"""
+        self.processor.merge_data()
+        report = self.processor.memory_report().set_index('table')
+        self.assertIn('merged', report.index)
+        for table in ['tracking_data', 'merged']:
+            self.assertLess(report.loc[table, 'after_bytes'], report.loc[table, 'before_bytes'])
+
 class TestExportUtils(unittest.TestCase):
     
     def setUp(self):
@@ -157,6 +207,67 @@ class TestExportUtils(unittest.TestCase):
         self.assertIn("Campaign Performance Insights", insights_text)
         self.assertIn("Platform Performance Insights", insights_text)
         self.assertIn("Recommendations", insights_text)
+        
+    def test_reports_share_one_snapshot(self):
+        """Both report formats render from one snapshot per scope, rebuilt after a reload"""
+        view = self.processor.filter_data({'platform': ['Instagram']})
+        snapshot = view.get_report_snapshot()
+        self.assertIs(view.get_report_snapshot(), snapshot)
+        self.assertIs(self.processor.filter_data({'platform': ['Instagram']}).get_report_snapshot(), snapshot)
+        
+        report_data = create_summary_report(view)
+        generate_insights_text(view)
+        self.assertIs(view.get_report_snapshot(), snapshot)
+        pd.testing.assert_frame_equal(report_data['top_performers'], view.calculate_roas().nlargest(10, 'roas'))
+        pd.testing.assert_frame_equal(report_data['campaign_performance'], view.get_campaign_performance())
+        
+        # Report tables are the caller's to change
+        report_data['all_influencers']['roas'] = 0
+        self.assertGreater(snapshot.influencer_metrics['roas'].max(), 0)
+        
+        self.processor.invalidate_caches()
+        self.assertIsNot(self.processor.filter_data({'platform': ['Instagram']}).get_report_snapshot(), snapshot)
+        
+    def test_chunked_csv_export(self):
+        """Exports are written chunk by chunk to files matching to_csv"""
+        frame = self.processor.calculate_roas()
+        with tempfile.TemporaryDirectory() as export_dir:
+            path = write_export(iter_csv(frame, chunk_rows=7), "influencers.csv", export_dir)
+            with open(path, encoding='utf-8', newline='') as f:
+                self.assertEqual(f.read(), frame.to_csv(index=False))
+            self.assertEqual(os.listdir(os.path.dirname(path)), ["influencers.csv"])
+            
+            merged = self.processor.merge_data()
+            path = write_export(iter_csv(self.processor.iter_merged_chunks(chunk_rows=100)), "tracking.csv", export_dir)
+            self.assertEqual(len(pd.read_csv(path)), len(merged))
+            
+            link = export_link(path, "Download", export_dir)
+            self.assertNotIn("base64", link)
+            self.assertIn("/exports/", link)
+            
+    def test_export_bundle(self):
+        """Every report table goes into one archive, with row counts in the manifest"""
+        report = create_summary_report(self.processor)
+        for fmt in bundle_formats():
+            with tempfile.TemporaryDirectory() as export_dir:
+                path = write_export_bundle(report, fmt, data_version=self.processor.data_version,
+                                           export_dir=export_dir)
+                with zipfile.ZipFile(path) as archive:
+                    manifest = json.loads(archive.read('manifest.json'))
+                    self.assertEqual(manifest['format'], fmt)
+                    self.assertEqual(manifest['data_version'], self.processor.data_version)
+                    self.assertEqual([table['name'] for table in manifest['tables']], list(report))
+                    for table in manifest['tables']:
+                        with archive.open(table['file']) as f:
+                            if fmt == 'parquet':
+                                frame = pd.read_parquet(io.BytesIO(f.read()))
+                            else:
+                                frame = pd.read_csv(f, compression={'csv.gz': 'gzip', 'csv.zst': 'zstd'}[fmt])
+                        self.assertEqual(len(frame), table['rows'])
+                        self.assertEqual(list(frame.columns), table['columns'])
+        self.assertEqual(len(report_tables(report)['summary_stats']), 1)
+        with self.assertRaises(ValueError):
+            write_export_bundle(report, 'csv.rar')
 
 class TestDataIntegrity(unittest.TestCase):
     
@@ -201,6 +312,1110 @@ class TestDataIntegrity(unittest.TestCase):
             missing_count = merged_df[col].isnull().sum()
             self.assertEqual(missing_count, 0, f"Found {missing_count} missing values in {col}")
 
+class TestStarSchema(unittest.TestCase):
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        self.processor = DataProcessor()
+        self.assertTrue(self.processor.load_data(), "Failed to load test data")
+        self.total_payout = self.processor.payouts_df['total_payout'].sum()
+        
+    def test_dimension_is_one_row_per_influencer(self):
+        """Test that the influencer dimension is indexed by influencer id"""
+        dim = self.processor.influencer_dim
+        self.assertTrue(dim.index.is_unique)
+        self.assertEqual(len(dim), len(self.processor.influencers_df))
+        for col in ['platform', 'basis', 'total_payout', 'reach']:
+            self.assertIn(col, dim.columns)
+            
+    def test_merge_has_no_collisions(self):
+        """Test that the denormalized frame has no duplicated or suffixed columns"""
+        merged_df = self.processor.merge_data()
+        for col in ['orders_x', 'orders_y', 'id']:
+            self.assertNotIn(col, merged_df.columns)
+        self.assertIn('payout_orders', merged_df.columns)
+        
+    def test_payout_attributed_once(self):
+        """Test that every rollup attributes each payout exactly once"""
+        summary = self.processor.get_summary_stats()
+        self.assertAlmostEqual(summary['total_spend'], self.total_payout, places=2)
+        for method in ['get_campaign_performance', 'get_product_performance',
+                       'get_platform_performance', 'get_payout_basis_performance', 'get_time_series_data']:
+            rollup = getattr(self.processor, method)()
+            self.assertAlmostEqual(rollup['total_payout'].sum(), self.total_payout, places=2)
+            
+    def test_filter_on_dimension_and_fact(self):
+        """Test combined influencer-attribute and tracking-column filters"""
+        view = self.processor.filter_data({'platform': ['YouTube'], 'campaign': ['Fitness Friday']})
+        self.assertGreater(len(view), 0)
+        self.assertTrue(all(view['platform'] == 'YouTube'))
+        self.assertTrue(all(view['campaign'] == 'Fitness Friday'))
+        
+        summary = view.get_summary_stats()
+        self.assertAlmostEqual(summary['total_revenue'], view['revenue'].sum(), places=2)
+        self.assertLess(summary['total_spend'], self.total_payout)
+
+class TestGroupingSets(unittest.TestCase):
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        self.processor = DataProcessor()
+        self.assertTrue(self.processor.load_data(), "Failed to load test data")
+        
+    def test_rollups_match_single_groupby(self):
+        """Test that each grouping set equals a direct groupby of the merged data"""
+        rollups = self.processor.get_rollups(['campaign', 'platform', 'date'])
+        merged_df = self.processor.merge_data()
+        for dim in ['campaign', 'platform', 'date']:
+            expected = merged_df.groupby(dim, observed=True).agg(
+                revenue=('revenue', 'sum'), orders=('orders', 'sum'),
+                num_influencers=('influencer_id', 'nunique')).reset_index()
+            actual = rollups[dim][[dim, 'revenue', 'orders', 'num_influencers']]
+            pd.testing.assert_frame_equal(expected, actual, check_dtype=False)
+            
+    def test_methods_share_one_scan(self):
+        """Test that the per-dimension methods are views over one cached scan"""
+        self.processor.get_campaign_performance()
+        self.processor.get_product_performance()
+        self.processor.get_platform_performance()
+        self.processor.get_time_series_data()
+        self.processor.get_summary_stats()
+        cache = self.processor._rollup_cache
+        self.assertEqual((len(cache), cache.misses), (1, 1))
+        
+        # Mutating a returned frame must not leak into the cache
+        campaign_perf = self.processor.get_campaign_performance()
+        campaign_perf['revenue'] = 0
+        self.assertGreater(self.processor.get_campaign_performance()['revenue'].sum(), 0)
+        
+    def test_new_scope_recomputes(self):
+        """Test that a filtered view gets its own rollups"""
+        total = self.processor.get_summary_stats()['total_revenue']
+        view = self.processor.filter_data({'platform': ['Instagram']})
+        filtered = view.get_summary_stats()['total_revenue']
+        self.assertLess(filtered, total)
+        self.assertAlmostEqual(filtered, view['revenue'].sum(), places=2)
+        self.assertEqual(self.processor.get_summary_stats()['total_revenue'], total)
+
+class TestDailyCube(unittest.TestCase):
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        self.processor = DataProcessor()
+        self.assertTrue(self.processor.load_data(), "Failed to load test data")
+        
+    def test_cube_preserves_totals(self):
+        """Test that the cube holds the same totals as the tracking rows"""
+        cube = self.processor.cube
+        tracking = self.processor.tracking_data_df
+        self.assertLessEqual(len(cube), len(tracking))
+        self.assertEqual(cube['events'].sum(), len(tracking))
+        self.assertEqual(cube['orders'].sum(), tracking['orders'].sum())
+        self.assertAlmostEqual(cube['revenue'].sum(), tracking['revenue'].sum(), places=2)
+        self.assertAlmostEqual(cube['spend'].sum(), self.processor.payouts_df['total_payout'].sum(), places=2)
+        
+    def test_filters_match_raw_rows(self):
+        """Test that a filter answered from the cube matches one applied to the raw rows"""
+        filters = {
+            'platform': ['Instagram', 'YouTube'],
+            'gender': ['Female'],
+            'product': ['HK Vitals Fish Oil', 'MuscleBlaze Creatine Monohydrate'],
+            'date_range': (pd.Timestamp('2024-03-01').date(), pd.Timestamp('2024-09-30').date()),
+        }
+        cells = self.processor.filter_data(filters)
+        merged_df = self.processor.merge_data()
+        rows = merged_df[
+            merged_df['platform'].isin(filters['platform'])
+            & merged_df['gender'].isin(filters['gender'])
+            & merged_df['product'].isin(filters['product'])
+            & merged_df['date'].between(pd.Timestamp('2024-03-01'), pd.Timestamp('2024-09-30'))
+        ]
+        self.assertEqual(cells['events'].sum(), len(rows))
+        self.assertAlmostEqual(cells['revenue'].sum(), rows['revenue'].sum(), places=2)
+        
+        from_cells = cells.get_campaign_performance()[['campaign', 'revenue', 'orders', 'num_influencers']]
+        from_rows = rows.groupby('campaign', observed=True).agg(
+            revenue=('revenue', 'sum'), orders=('orders', 'sum'),
+            num_influencers=('influencer_id', 'nunique')).reset_index()
+        pd.testing.assert_frame_equal(from_cells, from_rows, check_dtype=False)
+
+class TestRoasCache(unittest.TestCase):
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        self.processor = DataProcessor(roas_cache_size=2)
+        self.assertTrue(self.processor.load_data(), "Failed to load test data")
+        self.cache = self.processor._roas_cache
+        
+    def test_repeated_calls_hit_cache(self):
+        """Test that a page's repeated calls compute the influencer metrics once"""
+        self.processor.calculate_roas()
+        self.processor.get_top_performers()
+        self.processor.get_underperformers()
+        self.assertEqual((self.cache.misses, self.cache.hits), (1, 2))
+        
+        # Callers get their own copy
+        metrics = self.processor.calculate_roas()
+        metrics['roas'] = 0
+        self.assertGreater(self.processor.calculate_roas()['roas'].sum(), 0)
+        
+    def test_key_includes_filters_and_baseline(self):
+        """Test that filters and baseline each select their own entry"""
+        all_metrics = self.processor.calculate_roas()
+        self.assertNotAlmostEqual(
+            self.processor.calculate_roas(baseline_revenue_pct=0.3)['incremental_roas'].sum(),
+            all_metrics['incremental_roas'].sum())
+        
+        twitter = self.processor.filter_data({'platform': ['Twitter']}).calculate_roas()
+        self.assertTrue(all(twitter['platform'] == 'Twitter'))
+        
+        male = self.processor.filter_data({'platform': ['Twitter'], 'gender': ['Male']}).calculate_roas()
+        self.assertTrue(all(male['gender'] == 'Male'))
+        self.assertLess(len(male), len(twitter))
+        
+    def test_bounded_and_invalidated_on_reload(self):
+        """Test LRU eviction and the explicit reset on load_data"""
+        for pct in [0.1, 0.2, 0.3]:
+            self.processor.calculate_roas(baseline_revenue_pct=pct)
+        self.assertEqual(len(self.cache), 2)
+        
+        version = self.processor.data_version
+        self.assertTrue(self.processor.load_data())
+        self.assertEqual(len(self.cache), 0)
+        self.assertGreater(self.processor.data_version, version)
+
+class TestBitmapIndexes(unittest.TestCase):
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        self.processor = DataProcessor()
+        self.assertTrue(self.processor.load_data(), "Failed to load test data")
+        self.cube = self.processor.cube
+        
+    def test_selection_matches_isin_masks(self):
+        """Test that bitmap ANDs select the same cells as chained isin masks"""
+        filters = {
+            'platform': ['Instagram'],
+            'category': ['Fitness', 'Nutrition'],
+            'campaign': ['Fitness Friday', 'Wellness Wednesday', 'Protein Power Month'],
+            'date_range': (pd.Timestamp('2024-02-01').date(), pd.Timestamp('2024-11-30').date()),
+        }
+        mask = (
+            self.cube['platform'].isin(filters['platform'])
+            & self.cube['category'].isin(filters['category'])
+            & self.cube['campaign'].isin(filters['campaign'])
+            & self.cube['date'].between(pd.Timestamp('2024-02-01'), pd.Timestamp('2024-11-30'))
+        )
+        positions = self.processor.select_rows(filters)
+        self.assertEqual(positions.tolist(), list(mask.to_numpy().nonzero()[0]))
+        
+    def test_full_selection_skips_index(self):
+        """Test that selecting every value, or nothing, keeps all cells"""
+        options = self.processor.get_filter_options()
+        filters = {column: options[column] for column in ['platform', 'category', 'campaign', 'product']}
+        self.assertEqual(len(self.processor.select_rows(filters)), len(self.cube))
+        self.assertEqual(len(self.processor.select_rows({})), len(self.cube))
+        
+    def test_unknown_value_selects_nothing(self):
+        """Test that a value absent from the data matches no cells"""
+        self.assertEqual(len(self.processor.select_rows({'platform': ['Snapchat']})), 0)
+
+class TestDateIndex(unittest.TestCase):
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        self.processor = DataProcessor()
+        self.assertTrue(self.processor.load_data(), "Failed to load test data")
+        
+    def test_tables_sorted_by_date(self):
+        """Test that tracking rows and cube cells are physically sorted by date"""
+        self.assertTrue(self.processor.tracking_data_df['date'].is_monotonic_increasing)
+        self.assertTrue(self.processor.cube['date'].is_monotonic_increasing)
+        
+    def test_bounds_from_index(self):
+        """Test that date bounds match the column min and max"""
+        dates = self.processor.tracking_data_df['date']
+        self.assertEqual(self.processor.get_date_bounds(), (dates.min(), dates.max()))
+        
+    def test_range_is_contiguous_slice(self):
+        """Test that a date range resolves to the slice holding exactly those days"""
+        index = self.processor.tracking_date_index
+        dates = self.processor.tracking_data_df['date']
+        for start, end in [('2024-03-05', '2024-03-05'), ('2023-12-01', '2024-02-10'),
+                           ('2024-06-15', '2025-01-31'), ('2025-02-01', '2025-03-01')]:
+            lo, hi = index.slice(pd.Timestamp(start).date(), pd.Timestamp(end).date())
+            mask = dates.between(pd.Timestamp(start), pd.Timestamp(end)).to_numpy()
+            self.assertEqual(list(range(lo, hi)), list(mask.nonzero()[0]))
+        
+        positions = self.processor.select_rows({'date_range': ('2024-04-01', '2024-04-30')})
+        self.assertEqual(positions.tolist(), list(range(positions[0], positions[-1] + 1)))
+        
+    def test_rejects_unsorted_dates(self):
+        """Test that the index refuses rows that are not sorted by date"""
+        with self.assertRaises(ValueError):
+            DateIndex(pd.to_datetime(['2024-01-02', '2024-01-01']))
+
+class TestFilteredView(unittest.TestCase):
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        self.processor = DataProcessor()
+        self.assertTrue(self.processor.load_data(), "Failed to load test data")
+        self.view = self.processor.filter_data({'platform': ['Instagram'], 'gender': ['Female']})
+        
+    def test_view_is_immutable(self):
+        """Test that a view can be neither reassigned nor edited in place"""
+        with self.assertRaises(AttributeError):
+            self.view.positions = np.arange(3)
+        with self.assertRaises(ValueError):
+            self.view.positions[0] = 0
+        self.assertIsNone(self.processor.merged_df)
+        
+    def test_view_matches_its_cells(self):
+        """Test that view metrics equal the same metrics over its materialized cells"""
+        cells = self.view.to_frame()
+        self.assertEqual(len(cells), len(self.view))
+        summary = self.view.get_summary_stats()
+        self.assertAlmostEqual(summary['total_revenue'], cells['revenue'].sum(), places=2)
+        self.assertAlmostEqual(summary['total_spend'], cells['spend'].sum(), places=2)
+        self.assertEqual(set(self.view.calculate_roas()['influencer_id']), set(cells['influencer_id']))
+        
+    def test_views_do_not_share_state(self):
+        """Test that two views and the processor answer independently"""
+        male = self.processor.filter_data({'gender': ['Male']})
+        total = self.processor.get_summary_stats()['total_revenue']
+        self.assertLess(self.view.get_summary_stats()['total_revenue'], total)
+        self.assertLess(male.get_summary_stats()['total_revenue'], total)
+        self.assertTrue(all(male.calculate_roas()['gender'] == 'Male'))
+        self.assertTrue(all(self.view.calculate_roas()['gender'] == 'Female'))
+        
+    def test_stale_after_reload(self):
+        """Test that a view refuses to answer once the processor reloads"""
+        self.assertTrue(self.processor.load_data())
+        with self.assertRaises(RuntimeError):
+            self.view.get_summary_stats()
+
+class TestSharedProcessor(unittest.TestCase):
+    
+    def setUp(self):
+        """Copy the data files to a scratch directory"""
+        self.data_dir = tempfile.mkdtemp()
+        for name in ['influencers', 'posts', 'tracking_data', 'payouts']:
+            shutil.copy(os.path.join(DATA_DIR, f'{name}.csv'), self.data_dir)
+        self.shared = SharedProcessor(data_dir=self.data_dir, use_cache=False)
+        
+    def tearDown(self):
+        shutil.rmtree(self.data_dir)
+        
+    def test_sessions_share_one_processor(self):
+        """Test that every caller gets the same loaded processor"""
+        processor = self.shared.get()
+        self.assertIsNotNone(processor)
+        self.assertIs(self.shared.get(), processor)
+        self.assertEqual(self.shared.generation, 1)
+        
+    def test_reload_is_copy_on_write(self):
+        """Test that a reload swaps in a new processor and leaves the old one intact"""
+        old = self.shared.get()
+        view = old.filter_data({'platform': ['Instagram']})
+        revenue = view.get_summary_stats()['total_revenue']
+        
+        self.assertTrue(self.shared.reload())
+        self.assertIsNot(self.shared.get(), old)
+        self.assertEqual(view.get_summary_stats()['total_revenue'], revenue)
+        
+    def test_failed_reload_keeps_current(self):
+        """Test that a reload which cannot load leaves the current processor serving"""
+        processor = self.shared.get()
+        os.remove(os.path.join(self.data_dir, 'payouts.csv'))
+        self.assertFalse(self.shared.reload())
+        self.assertIs(self.shared.get(), processor)
+        
+    def test_concurrent_readers_during_reload(self):
+        """Test that readers racing a reload always see a fully loaded processor"""
+        expected = self.shared.get().get_summary_stats()['total_revenue']
+        errors = []
+        
+        def read():
+            for _ in range(20):
+                try:
+                    view = self.shared.get().filter_data({})
+                    self.assertAlmostEqual(view.get_summary_stats()['total_revenue'], expected, places=2)
+                except Exception as e:
+                    errors.append(e)
+                    
+        readers = [threading.Thread(target=read) for _ in range(4)]
+        for reader in readers:
+            reader.start()
+        self.assertTrue(self.shared.reload())
+        for reader in readers:
+            reader.join()
+        self.assertEqual(errors, [])
+
+class TestKernels(unittest.TestCase):
+    
+    def test_group_kernels_match_pandas(self):
+        """Test bincount sums, counts and distinct counts against pandas groupby"""
+        codes = np.array([2, 0, 2, -1, 1, 2, 0])
+        members = np.array([5, 5, 3, 1, 4, 5, 2])
+        values = np.array([1.5, 2.0, 3.0, 100.0, 4.0, 0.5, 1.0])
+        observed, sums, distinct = rollup(codes, 4, {'value': values}, members, 6)
+        
+        frame = pd.DataFrame({'code': codes, 'member': members, 'value': values})
+        expected = frame[frame['code'] >= 0].groupby('code').agg(
+            value=('value', 'sum'), members=('member', 'nunique'))
+        self.assertEqual(list(observed), list(expected.index))
+        np.testing.assert_allclose(sums['value'], expected['value'])
+        self.assertEqual(list(distinct), list(expected['members']))
+        self.assertEqual(list(group_count(codes, 4)), [2, 1, 3, 0])
+        
+    def test_combined_codes_round_trip(self):
+        """Test that multi-key codes are unique per combination and split back"""
+        first, second = np.array([0, 1, 2, 1]), np.array([3, 0, 1, -1])
+        combined, size = combine_codes([first, second], [3, 4])
+        self.assertEqual(size, 12)
+        self.assertEqual(combined[3], -1)
+        split = split_codes(combined[:3], [3, 4])
+        self.assertEqual(list(split[0]), [0, 1, 2])
+        self.assertEqual(list(split[1]), [3, 0, 1])
+        
+    def test_processor_paths_agree(self):
+        """Test that the kernel fast path matches the pandas groupby path"""
+        fast = DataProcessor()
+        slow = DataProcessor(use_kernels=False)
+        self.assertTrue(fast.load_data() and slow.load_data())
+        dims = ['total', 'campaign', 'date', 'gender', ('campaign', 'platform')]
+        # The last filter matches no cells
+        empty = {'platform': ['Facebook'], 'category': ['Nutrition'], 'gender': ['Female'],
+                 'campaign': ['Fitness Friday'], 'product': ['SteelX Protein Shaker']}
+        for filters in [{}, {'platform': ['Instagram'], 'category': ['Fitness']}, empty]:
+            fast_view, slow_view = fast.filter_data(filters), slow.filter_data(filters)
+            fast_rollups, slow_rollups = fast_view.get_rollups(dims), slow_view.get_rollups(dims)
+            for dim in dims:
+                pd.testing.assert_frame_equal(fast_rollups[dim], slow_rollups[dim], check_exact=False, check_dtype=False)
+            pd.testing.assert_frame_equal(fast_view.calculate_roas(), slow_view.calculate_roas(),
+                                          check_exact=False, check_dtype=False)
+            fast_summary, slow_summary = fast_view.get_summary_stats(), slow_view.get_summary_stats()
+            for key, value in fast_summary.items():
+                self.assertAlmostEqual(slow_summary[key], value, places=4, msg=key)
+        self.assertEqual(len(slow.filter_data(empty)), 0)
+
+class TestDictionaryRegistry(unittest.TestCase):
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        self.processor = DataProcessor()
+        self.assertTrue(self.processor.load_data(), "Failed to load test data")
+        self.dictionary = self.processor.dictionary
+        
+    def test_one_code_space_per_key(self):
+        """Test that a key held by several tables shares one dtype and one code space"""
+        platform = self.processor.influencers_df['platform']
+        for column in [self.processor.posts_df['platform'], self.processor.tracking_data_df['source']]:
+            self.assertIs(column.dtype, platform.dtype)
+            self.assertIs(column.array.categories, platform.array.categories)
+        self.assertIs(self.processor.cube['platform'].dtype, platform.dtype)
+        
+    def test_influencer_codes_index_dimension(self):
+        """Test that influencer code i is row i of the dimension, for every table's ids"""
+        dim = self.processor.influencer_dim
+        for ids in [self.processor.influencers_df['id'], self.processor.tracking_data_df['influencer_id'],
+                    self.processor.payouts_df['influencer_id'], self.processor.posts_df['influencer_id']]:
+            codes = self.dictionary.encode('influencer', ids)
+            self.assertTrue((codes >= 0).all())
+            self.assertEqual(list(dim.index[codes]), list(ids))
+        self.assertEqual(list(self.dictionary.encode('influencer', [-5, 10 ** 6])), [-1, -1])
+        
+    def test_extend_inserts_new_labels_in_order(self):
+        """Test that extending a dictionary keeps labels sorted and maps old codes onto the new ones"""
+        labels = self.dictionary.labels['user']
+        extended, mapping = self.dictionary.extend('user', ['user_0', labels[1], 'user_zzz', labels[0], 'user_0'])
+        merged = extended.labels['user']
+        self.assertTrue(merged.is_monotonic_increasing and merged.is_unique)
+        self.assertEqual(set(merged), set(labels) | {'user_0', 'user_zzz'})
+        self.assertTrue(merged[mapping].equals(labels))
+        self.assertIs(self.dictionary.labels['user'], labels)
+        self.assertEqual(self.dictionary.extend('user', labels[:3]), (self.dictionary, None))
+        
+    def test_merge_matches_hash_join(self):
+        """Test that merging by code indexing equals the equivalent pandas join"""
+        merged_df = self.processor.merge_data()
+        expected = self.processor.tracking_data_df.join(
+            self.processor.influencer_dim[INFLUENCER_ATTRIBUTES], on='influencer_id')
+        pd.testing.assert_frame_equal(merged_df, expected)
+
+class TestPrefixSumIndex(unittest.TestCase):
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        self.processor = DataProcessor()
+        self.assertTrue(self.processor.load_data(), "Failed to load test data")
+        
+    def assert_matches_rollups(self, filters):
+        view = self.processor.filter_data(filters)
+        rollups = view.get_rollups([GRAND_TOTAL, 'date'])
+        totals = rollups[GRAND_TOTAL]
+        summary = view.get_summary_stats()
+        self.assertAlmostEqual(summary['total_revenue'], totals['revenue'].sum(), places=4)
+        self.assertAlmostEqual(summary['total_spend'], totals['total_payout'].sum(), places=4)
+        self.assertEqual(summary['total_orders'], totals['orders'].sum())
+        self.assertEqual(summary['total_influencers'], totals['num_influencers'].sum())
+        pd.testing.assert_frame_equal(view.get_time_series_data(),
+                                      rollups['date'].drop(columns=['num_influencers', 'unique_buyers']),
+                                      check_dtype=False, atol=1e-6)
+        
+    def test_window_totals_match_rollups(self):
+        """Test that date windows, alone or with one dimension filter, match a scan"""
+        window = (pd.Timestamp('2024-03-05').date(), pd.Timestamp('2024-08-20').date())
+        self.assert_matches_rollups({})
+        self.assert_matches_rollups({'date_range': window})
+        self.assert_matches_rollups({'date_range': window, 'platform': ['YouTube', 'Twitter']})
+        self.assert_matches_rollups({'date_range': window, 'campaign': ['Fitness Friday']})
+        self.assert_matches_rollups({'date_range': (pd.Timestamp('2031-01-01'), pd.Timestamp('2031-02-01'))})
+        
+    def test_uses_two_lookups_per_window(self):
+        """Test a member's window total against the difference of two cumulative entries"""
+        index = self.processor.prefix_index
+        lo, hi = index.day_range('2024-04-01', '2024-04-30')
+        cells = self.processor.filter_data({'date_range': ('2024-04-01', '2024-04-30')}).to_frame()
+        by_product = cells.groupby('product', observed=False)['revenue'].sum()
+        np.testing.assert_allclose(index.totals('product', lo, hi)['revenue'], by_product.to_numpy(), atol=1e-6)
+        
+    def test_index_size_is_bounded(self):
+        """Test that only low-cardinality filter columns are dense and influencers are sparse"""
+        index = self.processor.prefix_index
+        self.assertEqual(set(index.cumulative), {GRAND_TOTAL, 'platform', 'category', 'gender', 'campaign', 'product'})
+        self.assertLessEqual(self.processor.influencer_days.nbytes, len(self.processor.cube) * 8)
+        
+        lo, hi = index.day_range('2024-04-01', '2024-04-30')
+        cells = self.processor.filter_data({'date_range': ('2024-04-01', '2024-04-30')}).to_frame()
+        active = self.processor.influencer_days.active(lo, hi)
+        expected = self.processor.dictionary.encode('influencer', cells['influencer_id'].unique())
+        self.assertEqual(set(np.flatnonzero(active)), set(expected))
+        
+        # A column over the cap is answered by scanning, with the same result
+        with unittest.mock.patch('data_processor.PREFIX_MAX_MEMBERS', 5):
+            self.processor.build_prefix_index()
+        self.assertNotIn('campaign', self.processor.prefix_index.cumulative)
+        self.assertIn('platform', self.processor.prefix_index.cumulative)
+        self.processor.invalidate_caches()
+        window = (pd.Timestamp('2024-03-05').date(), pd.Timestamp('2024-08-20').date())
+        self.assert_matches_rollups({'date_range': window, 'campaign': ['Fitness Friday']})
+        self.assert_matches_rollups({'date_range': window, 'platform': ['YouTube']})
+        
+    def test_previous_period(self):
+        """Test that the comparison window is the equally long one just before"""
+        view = self.processor.filter_data({'date_range': ('2024-07-01', '2024-09-30'), 'gender': ['Female']})
+        expected = self.processor.filter_data({'date_range': ('2024-03-31', '2024-06-30'), 'gender': ['Female']})
+        self.assertEqual(view.get_previous_period_stats(), expected.get_summary_stats())
+        self.assertIsNone(self.processor.get_previous_period_stats())
+
+class TestTailIngest(unittest.TestCase):
+    
+    NEW_ROWS = (
+        "Instagram,Brand New Campaign,5,user_1,HK Vitals Fish Oil,2024-12-31,3,999.5\n"
+        "YouTube,Fitness Friday,7,user_new,SteelX Protein Shaker,2024-01-02,1,100.25\n"
+    )
+    
+    def setUp(self):
+        """Copy the data files to a scratch directory"""
+        self.data_dir = tempfile.mkdtemp()
+        for name in ['influencers', 'posts', 'tracking_data', 'payouts']:
+            shutil.copy(os.path.join(DATA_DIR, f'{name}.csv'), self.data_dir)
+        self.tracking_path = os.path.join(self.data_dir, 'tracking_data.csv')
+        
+    def tearDown(self):
+        shutil.rmtree(self.data_dir)
+        
+    def append(self, text):
+        with open(self.tracking_path, 'a') as f:
+            f.write(text)
+            
+    def assert_matches_full_load(self, processor, streaming=False):
+        fresh = DataProcessor(self.data_dir, use_cache=False, streaming=streaming)
+        self.assertTrue(fresh.load_data())
+        pd.testing.assert_frame_equal(processor.cube, fresh.cube, check_exact=False)
+        self.assertEqual(processor.get_summary_stats(), fresh.get_summary_stats())
+        pd.testing.assert_frame_equal(processor.calculate_roas(), fresh.calculate_roas(), check_exact=False)
+        
+    def test_tail_matches_full_load(self):
+        """Test that folding appended rows gives the same state as reloading everything"""
+        for streaming in [False, True]:
+            shutil.copy(os.path.join(DATA_DIR, 'tracking_data.csv'), self.data_dir)
+            processor = DataProcessor(self.data_dir, use_cache=False, streaming=streaming)
+            self.assertTrue(processor.load_data())
+            version = processor.data_version
+            self.assertEqual(processor.ingest_tail(), 0)
+            self.assertEqual(processor.data_version, version)
+            
+            self.append(self.NEW_ROWS)
+            self.assertEqual(processor.ingest_tail(), 2)
+            self.assertGreater(processor.data_version, version)
+            self.assertEqual(processor.tracking_offset, os.path.getsize(self.tracking_path))
+            self.assertIn('Brand New Campaign', processor.get_filter_options()['campaign'])
+            self.assert_matches_full_load(processor, streaming)
+            
+    def test_known_labels_fold_without_rebuild(self):
+        """Test that rows of earlier and new days with a new buyer are spliced in and match a full load"""
+        rows = ("Instagram,Fitness Friday,7,user_1,SteelX Protein Shaker,2024-03-05,2,500.5\n"
+                "YouTube,Fitness Friday,9,user_brand_new,SteelX Protein Shaker,2025-02-01,1,10.0\n")
+        for streaming in [False, True]:
+            shutil.copy(os.path.join(DATA_DIR, 'tracking_data.csv'), self.data_dir)
+            processor = DataProcessor(self.data_dir, use_cache=False, streaming=streaming)
+            self.assertTrue(processor.load_data())
+            self.append(rows)
+            with unittest.mock.patch.object(processor, '_rebuild_with_rows') as rebuild:
+                self.assertEqual(processor.ingest_tail(), 2)
+            rebuild.assert_not_called()
+            self.assert_matches_full_load(processor, streaming)
+            fresh = DataProcessor(self.data_dir, use_cache=False, streaming=streaming)
+            self.assertTrue(fresh.load_data())
+            window = {'date_range': (pd.Timestamp('2024-03-01'), pd.Timestamp('2025-03-01')), 'platform': ['YouTube']}
+            pd.testing.assert_frame_equal(processor.filter_data(window).get_time_series_data(),
+                                          fresh.filter_data(window).get_time_series_data())
+            self.assertEqual(processor.get_date_bounds(), fresh.get_date_bounds())
+        
+    def test_partial_line_waits(self):
+        """Test that a half-written last line is ingested only once it is complete"""
+        processor = DataProcessor(self.data_dir, use_cache=False)
+        self.assertTrue(processor.load_data())
+        self.append("Twitter,Fitness Friday,7,user_x,SteelX Pro")
+        self.assertEqual(processor.ingest_tail(), 0)
+        self.append("tein Shaker,2024-05-05,2,50.0\n")
+        self.assertEqual(processor.ingest_tail(), 1)
+        self.assert_matches_full_load(processor)
+        
+    def test_unknown_influencer_keeps_totals_finite(self):
+        """Test that rows of an influencer without profile or payout add revenue but no spend"""
+        baseline = DataProcessor(self.data_dir, use_cache=False)
+        self.assertTrue(baseline.load_data())
+        processor = DataProcessor(self.data_dir, use_cache=False)
+        self.assertTrue(processor.load_data())
+        expected = baseline.get_summary_stats()
+        
+        self.append("Instagram,Fitness Friday,99999,user_x,HK Vitals Fish Oil,2024-05-05,1,100.0\n")
+        self.assertEqual(processor.ingest_tail(), 1)
+        for use_kernels in [True, False]:
+            reloaded = DataProcessor(self.data_dir, use_cache=False, use_kernels=use_kernels)
+            self.assertTrue(reloaded.load_data())
+            for loaded in [processor, reloaded] if use_kernels else [reloaded]:
+                summary = loaded.get_summary_stats()
+                self.assertAlmostEqual(summary['total_spend'], expected['total_spend'], places=2)
+                self.assertAlmostEqual(summary['total_revenue'], expected['total_revenue'] + 100.0, places=2)
+                self.assertGreater(summary['overall_roas'], 0)
+                self.assertFalse(loaded.get_campaign_performance()['total_payout'].isna().any())
+        
+    def test_unknown_influencer_distinct_counts(self):
+        """Test that the pandas rollups count buyers like the kernels when an influencer is unknown"""
+        self.append("Instagram,Fitness Friday,99999,user_x,HK Vitals Fish Oil,2024-05-05,1,100.0\n")
+        rollups = {}
+        for use_kernels in [True, False]:
+            processor = DataProcessor(self.data_dir, use_cache=False, use_kernels=use_kernels)
+            self.assertTrue(processor.load_data())
+            # Group codes are cast from NaN nowhere (numpy warns when they are)
+            with warnings.catch_warnings():
+                warnings.simplefilter('error', RuntimeWarning)
+                rollups[use_kernels] = processor.get_rollups(['platform', 'category'])
+        for dim in ['platform', 'category']:
+            pd.testing.assert_series_equal(rollups[True][dim]['unique_buyers'], rollups[False][dim]['unique_buyers'],
+                                           check_dtype=False)
+        
+    def test_shared_ingest_is_copy_on_write(self):
+        """Test that the shared handle swaps in an ingested clone and leaves the old one intact"""
+        shared = SharedProcessor(data_dir=self.data_dir, use_cache=False)
+        old = shared.get()
+        revenue = old.get_summary_stats()['total_revenue']
+        self.append(self.NEW_ROWS)
+        self.assertEqual(shared.ingest_tail(), 2)
+        self.assertIsNot(shared.get(), old)
+        self.assertAlmostEqual(shared.get().get_summary_stats()['total_revenue'], revenue + 1099.75, places=2)
+        self.assertEqual(old.get_summary_stats()['total_revenue'], revenue)
+        self.assertEqual(shared.ingest_tail(), 0)
+
+class TestIngestService(unittest.TestCase):
+    
+    EVENT = {'source': 'Instagram', 'campaign': 'Live Campaign', 'influencer_id': 5, 'user_id': 'user_1',
+             'product': 'HK Vitals Fish Oil', 'date': '2024-12-31', 'orders': 2, 'revenue': 500.5}
+    
+    def setUp(self):
+        """Serve a scratch copy of the data on an ephemeral port"""
+        self.data_dir = tempfile.mkdtemp()
+        for name in ['influencers', 'posts', 'tracking_data', 'payouts']:
+            shutil.copy(os.path.join(DATA_DIR, f'{name}.csv'), self.data_dir)
+        self.shared = SharedProcessor(data_dir=self.data_dir, use_cache=False)
+        self.revenue = self.shared.get().get_summary_stats()['total_revenue']
+        self.server = make_ingest_server(self.shared, port=0, max_events=3, max_delay=60)
+        self.url = f'http://localhost:{self.server.server_address[1]}'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.batcher.stop()
+        self.server.server_close()
+        shutil.rmtree(self.data_dir)
+        
+    def post(self, body, content_type='application/json'):
+        request = urllib.request.Request(f'{self.url}/events', data=body.encode(),
+                                         headers={'Content-Type': content_type}, method='POST')
+        try:
+            with urllib.request.urlopen(request) as response:
+                return response.status, json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            return e.code, json.loads(e.read())
+        
+    def test_batches_are_appended_and_applied(self):
+        """Test that accepted events reach both tracking_data.csv and the running aggregates"""
+        self.assertEqual(self.post(json.dumps([self.EVENT, self.EVENT])), (202, {'accepted': 2}))
+        self.assertEqual(self.server.batcher.buffered, 2)
+        csv_row = "YouTube,Live Campaign,7,user_new,SteelX Protein Shaker,2024-01-02,1,99.5\n"
+        self.assertEqual(self.post(csv_row, 'text/csv'), (202, {'accepted': 1}))
+        
+        # The third event fills the batch; stop() waits for the flusher to finish it
+        self.server.batcher.stop()
+        self.assertEqual(self.server.batcher.stats['written'], 3)
+        processor = self.shared.get()
+        self.assertAlmostEqual(processor.get_summary_stats()['total_revenue'], self.revenue + 1100.5, places=2)
+        with urllib.request.urlopen(f'{self.url}/stats') as response:
+            stats = json.loads(response.read())
+        self.assertAlmostEqual(stats['campaign_revenue']['Live Campaign'], 1100.5)
+        
+        fresh = DataProcessor(self.data_dir, use_cache=False)
+        self.assertTrue(fresh.load_data())
+        self.assertEqual(processor.get_summary_stats(), fresh.get_summary_stats())
+        
+    def test_malformed_events_are_rejected(self):
+        """Test that a bad event fails its whole request and nothing is buffered"""
+        bad_date = {**self.EVENT, 'date': '31/12/2024'}
+        missing = {key: value for key, value in self.EVENT.items() if key != 'orders'}
+        for body in [json.dumps([self.EVENT, bad_date]), json.dumps(missing), 'not json']:
+            status, payload = self.post(body)
+            self.assertEqual(status, 400)
+            self.assertIn('error', payload)
+        self.assertEqual(self.server.batcher.buffered, 0)
+        
+    def test_failed_write_keeps_the_batch(self):
+        """Test that a batch whose write fails stays buffered, is reported and is written on retry"""
+        batcher = self.server.batcher
+        self.assertEqual(self.post(json.dumps([self.EVENT, self.EVENT])), (202, {'accepted': 2}))
+        with unittest.mock.patch('ingest_service.append_rows', side_effect=OSError("disk full")):
+            self.assertEqual(batcher.flush(), 0)
+        self.assertEqual(batcher.buffered, 2)
+        self.assertTrue(batcher._thread.is_alive())
+        with urllib.request.urlopen(f'{self.url}/stats') as response:
+            stats = json.loads(response.read())
+        self.assertEqual((stats['write_errors'], stats['last_error'], stats['written']), (1, "disk full", 0))
+        
+        self.assertEqual(batcher.flush(), 2)
+        self.assertEqual(batcher.buffered, 0)
+        self.assertAlmostEqual(self.shared.get().get_summary_stats()['total_revenue'], self.revenue + 1001.0, places=2)
+        
+    def test_failed_ingest_is_folded_by_the_next_flush(self):
+        """Test that rows written but not folded in are counted and folded by the next flush"""
+        batcher = self.server.batcher
+        batcher.add([event_row(self.EVENT, self.shared.get().tracking_columns)])
+        with unittest.mock.patch.object(self.shared, 'ingest_tail', return_value=None):
+            self.assertEqual(batcher.flush(), 1)
+        self.assertEqual((batcher.stats['ingest_errors'], batcher.stats['written']), (1, 1))
+        self.assertEqual(self.shared.get().get_summary_stats()['total_revenue'], self.revenue)
+        
+        self.assertEqual(batcher.flush(), 0)
+        self.assertAlmostEqual(self.shared.get().get_summary_stats()['total_revenue'], self.revenue + 500.5, places=2)
+        
+    def test_append_keeps_rows_on_their_own_lines(self):
+        """Test that appending after a last line without a newline does not merge rows"""
+        path = os.path.join(self.data_dir, 'tracking_data.csv')
+        with open(path, 'rb+') as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) == b'\n':
+                f.seek(-1, os.SEEK_END)
+                f.truncate()
+        rows = len(pd.read_csv(path))
+        append_rows(path, [event_row(self.EVENT, self.shared.get().tracking_columns)])
+        self.assertEqual(len(pd.read_csv(path)), rows + 1)
+
+class TestPartitionedAggregation(unittest.TestCase):
+    
+    @classmethod
+    def setUpClass(cls):
+        cls.serial = DataProcessor(use_cache=False)
+        cls.serial.load_data()
+        cls.parallel = DataProcessor(use_cache=False, workers=2)
+        cls.parallel.load_data()
+        cls.parallel.parallel_min_cells = 0
+        
+    @classmethod
+    def tearDownClass(cls):
+        cls.parallel.partition_pool.shutdown()
+        
+    def test_partitions_are_months(self):
+        """Test that partitions tile the cube and each holds one calendar month"""
+        partitions = month_partitions(self.parallel.cube_date_index)
+        self.assertEqual(partitions[0][0], 0)
+        self.assertEqual(partitions[-1][1], len(self.parallel.cube))
+        dates = self.parallel.cube['date']
+        for lo, hi in partitions:
+            self.assertEqual(dates.iloc[lo:hi].dt.to_period('M').nunique(), 1)
+            
+    def test_parallel_matches_serial(self):
+        """Test that merged partition aggregates equal the single-process results"""
+        dims = list(STANDARD_ROLLUPS) + [('campaign', 'platform')]
+        for filters in [{}, {'platform': ['Instagram'], 'category': ['Fitness', 'Nutrition']}]:
+            serial = self.serial.filter_data(filters)
+            parallel = self.parallel.filter_data(filters)
+            for dim, expected in serial.get_rollups(dims).items():
+                pd.testing.assert_frame_equal(parallel.get_rollups([dim])[dim], expected, check_exact=False)
+            pd.testing.assert_frame_equal(parallel.calculate_roas(), serial.calculate_roas(), check_exact=False)
+            
+    def test_distinct_counts_merge_by_union(self):
+        """Test that a member seen in several partitions is counted once"""
+        codes = {'campaign': (np.array([0, 0, 1, 0]), 2)}
+        sketches = {'influencer_id': DistinctSketch.from_codes(np.arange(4), np.array([3, 3, 3, 4]), np.arange(5))}
+        partition_module._init_worker({'codes': codes, 'measures': {'revenue': np.array([1.0, 2.0, 3.0, 4.0])},
+                                       'sketches': sketches})
+        partials = [partial_rollup((lo, hi, None, [('campaign',)], {'revenue': 'revenue'}, ['influencer_id']))[0]
+                    for lo, hi in [(0, 1), (1, 4)]]
+        observed, sums, distinct = merge_partials(partials, 2, sketches=sketches)
+        np.testing.assert_array_equal(observed, [0, 1])
+        np.testing.assert_array_equal(sums['revenue'], [7.0, 3.0])
+        np.testing.assert_array_equal(distinct['influencer_id'], [2, 1])
+
+class TestDistinctSketches(unittest.TestCase):
+    
+    def setUp(self):
+        self.processor = DataProcessor(use_cache=False)
+        self.processor.load_data()
+        
+    def test_buyers_match_exact_counts(self):
+        """Test that small data gets exact sketches and they agree with nunique over the rows"""
+        self.assertTrue(self.processor.distinct_sketches['user_id'].exact)
+        rows = self.processor.tracking_data_df
+        self.assertEqual(self.processor.get_summary_stats()['unique_buyers'], rows['user_id'].nunique())
+        
+        campaigns = self.processor.get_campaign_performance().set_index('campaign')['unique_buyers']
+        expected = rows.groupby('campaign', observed=True)['user_id'].nunique()
+        pd.testing.assert_series_equal(campaigns, expected, check_names=False, check_dtype=False)
+        
+        view = self.processor.filter_data({'platform': ['Instagram']})
+        buyers = rows.loc[rows['influencer_id'].isin(
+            self.processor.influencers_df.loc[self.processor.influencers_df['platform'] == 'Instagram', 'id']), 'user_id']
+        self.assertEqual(view.get_summary_stats()['unique_buyers'], buyers.nunique())
+        
+    def test_hyperloglog_within_error(self):
+        """Test that HyperLogLog estimates stay within a few standard errors"""
+        rng = np.random.default_rng(7)
+        labels = np.array([f'user_{i}' for i in range(50000)], dtype=object)
+        codes = rng.integers(0, len(labels), 100000)
+        cells = np.sort(rng.integers(0, 500, len(codes)))
+        sketch = DistinctSketch.from_codes(cells, codes, labels, error=0.02, exact_limit=0)
+        self.assertFalse(sketch.exact)
+        
+        exact = len(np.unique(codes))
+        self.assertLess(abs(sketch.count() - exact) / exact, 3 * 0.02)
+        selected = np.arange(0, 500, 3)
+        exact = len(np.unique(codes[np.isin(cells, selected)]))
+        self.assertLess(abs(sketch.count(selected) - exact) / exact, 3 * 0.02)
+        
+    def test_merge_equals_whole(self):
+        """Test that merging partials of disjoint cell ranges gives the sketch of all of them"""
+        rng = np.random.default_rng(3)
+        codes = rng.integers(0, 5000, 20000)
+        cells = np.sort(rng.integers(0, 100, len(codes)))
+        for error, exact_limit in [(None, 0), (0.05, 0)]:
+            sketch = DistinctSketch.from_codes(cells, codes, np.arange(5000), error, exact_limit)
+            groups = np.zeros(100, dtype=np.int64)
+            whole = sketch.estimate(sketch.partial(0, 100, groups), np.array([0]))
+            parts = [sketch.partial(lo, lo + 25, groups[lo:lo + 25]) for lo in range(0, 100, 25)]
+            merged = sketch.estimate(sketch.merge(parts), np.array([0]))
+            np.testing.assert_array_equal(merged, whole)
+
+class TestQuantileSketch(unittest.TestCase):
+    
+    def test_quantiles_within_relative_accuracy(self):
+        """Test that sketch quantiles are within the relative accuracy of the exact ones"""
+        values = np.random.default_rng(1).lognormal(2, 1, 50000)
+        sketch = QuantileSketch.from_values(values, relative_accuracy=0.01)
+        qs = [0.01, 0.5, 0.9, 0.99, 1.0]
+        exact = np.quantile(values, qs, method='lower')
+        np.testing.assert_allclose(sketch.quantiles(qs), exact, rtol=0.02)
+        
+    def test_merge_equals_whole(self):
+        """Test that merged sketches of parts equal the sketch of all values"""
+        values = np.random.default_rng(2).exponential(5, 10000)
+        values[:50] = 0
+        whole = QuantileSketch.from_values(values)
+        merged = QuantileSketch.from_values(values[:3000]).merge(QuantileSketch.from_values(values[3000:]))
+        self.assertEqual(merged.count, whole.count)
+        np.testing.assert_array_equal(merged.quantiles([0, 0.25, 0.5, 0.99]), whole.quantiles([0, 0.25, 0.5, 0.99]))
+        
+    def test_histogram_payload_is_constant(self):
+        """Test that the histogram has one row per bin regardless of the number of values"""
+        for n in [10, 100000]:
+            histogram = QuantileSketch.from_values(np.random.default_rng(n).gamma(2, 3, n)).histogram(20)
+            self.assertEqual(len(histogram), 20)
+            self.assertEqual(histogram['count'].sum(), n)
+            
+    def test_processor_distributions(self):
+        """Test that per-platform ROAS sketches cover every influencer and merge into the overall one"""
+        processor = DataProcessor(use_cache=False)
+        processor.load_data()
+        roas = processor.calculate_roas()
+        by_platform = processor.get_distribution('roas', 'platform')
+        self.assertEqual({str(member): sketch.count for member, sketch in by_platform.items()},
+                         roas.groupby('platform', observed=True).size().to_dict())
+        
+        merged = functools.reduce(QuantileSketch.merge, by_platform.values())
+        overall = processor.get_distribution('roas')[GRAND_TOTAL]
+        np.testing.assert_array_equal(merged.quantiles([0.5, 0.9, 0.99]), overall.quantiles([0.5, 0.9, 0.99]))
+        percentiles = processor.get_percentiles('roas').iloc[0]
+        np.testing.assert_allclose(percentiles[['p50', 'p90', 'p99']].to_numpy(dtype=float),
+                                   np.quantile(roas['roas'], [0.5, 0.9, 0.99], method='lower'), rtol=0.02)
+
+class TestAdaptiveScatter(unittest.TestCase):
+    
+    def setUp(self):
+        rng = np.random.default_rng(5)
+        n = 5000
+        self.df = pd.DataFrame({
+            'revenue': rng.lognormal(10, 1, n),
+            'roas': rng.lognormal(2, 1, n),
+            'platform': rng.choice(['Instagram', 'YouTube', 'Twitter'], n),
+            'name': [f'Influencer_{i}' for i in range(n)],
+        })
+        
+    def scatter(self, webgl_threshold, density_threshold):
+        return adaptive_scatter(self.df, x='revenue', y='roas', color='platform', hover_name='name',
+                                title="ROAS vs Revenue", webgl_threshold=webgl_threshold,
+                                density_threshold=density_threshold, gridsize=20)
+        
+    def test_switches_trace_type_by_size(self):
+        """Test SVG, then WebGL, then binned traces as the point count passes each threshold"""
+        self.assertEqual({trace.type for trace in self.scatter(10000, 20000).data}, {'scatter'})
+        self.assertEqual({trace.type for trace in self.scatter(1000, 20000).data}, {'scattergl'})
+        binned = self.scatter(100, 1000)
+        self.assertEqual(len(binned.data), 1)
+        self.assertLess(len(binned.data[0].x), 1000)
+        self.assertEqual(sum(binned.data[0].marker.color), len(self.df))
+        
+    def test_density_bins_summarize_their_points(self):
+        """Test that every point lands in one hexagon and hover means come from its points"""
+        bins = density_frame(self.df, 'revenue', 'roas', 'platform', gridsize=20)
+        self.assertEqual(bins['count'].sum(), len(self.df))
+        self.assertAlmostEqual((bins['mean_y'] * bins['count']).sum(), self.df['roas'].sum(), places=4)
+        self.assertTrue(set(bins['top']) <= set(self.df['platform']))
+        codes, centres_x, centres_y = hexbin(self.df['revenue'], self.df['roas'], gridsize=20)
+        # Each point's centre is within one cell of the point
+        step = (self.df['revenue'].max() - self.df['revenue'].min()) / 20
+        self.assertLessEqual(np.abs(centres_x[codes] - self.df['revenue']).max(), step)
+
+class TestFigureCache(unittest.TestCase):
+    
+    def setUp(self):
+        self.df = pd.DataFrame({'campaign': ['A', 'B', 'C'], 'revenue': [10.0, 20.0, 30.0]})
+        self.cache = LRUCache(2)
+        self.builds = 0
+        
+    def bar(self, df, **spec):
+        self.builds += 1
+        return px.bar(df, **spec)
+        
+    def figure(self, df, title="Revenue"):
+        return cached_figure(self.bar, df, x='campaign', y='revenue', title=title,
+                             layout=dict(height=400), cache=self.cache)
+        
+    def test_unchanged_chart_is_built_once(self):
+        """Test that equal frames and specs reuse the figure and any change rebuilds it"""
+        first = self.figure(self.df)
+        second = self.figure(self.df.copy())
+        self.assertEqual(self.builds, 1)
+        self.assertEqual(first.to_dict(), second.to_dict())
+        fresh = px.bar(self.df, x='campaign', y='revenue', title="Revenue").update_layout(height=400)
+        self.assertEqual(json.loads(second.to_json()), json.loads(fresh.to_json()))
+        
+        # Returned figures are independent of the cached one
+        second.update_layout(height=100)
+        self.assertEqual(self.figure(self.df).layout.height, 400)
+        
+        changed = self.df.assign(revenue=[10.0, 20.0, 31.0])
+        self.figure(changed)
+        self.figure(self.df, title="Other")
+        self.assertEqual(self.builds, 3)
+        # Two entries fit: the first chart was evicted
+        self.figure(self.df)
+        self.assertEqual(self.builds, 4)
+        self.assertNotEqual(frame_digest(self.df), frame_digest(changed))
+        self.assertNotEqual(frame_digest(self.df), frame_digest(self.df.astype({'revenue': 'float32'})))
+
+class TestBatchReports(unittest.TestCase):
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        self.processor = DataProcessor(workers=1)
+        self.assertTrue(self.processor.load_data(), "Failed to load test data")
+        
+    def test_segment_filters(self):
+        """Segments are every combination of the chosen columns' values"""
+        segments = segment_filters(self.processor, ['campaign', 'platform'])
+        options = self.processor.get_filter_options()
+        self.assertEqual(len(segments), len(options['campaign']) * len(options['platform']))
+        self.assertEqual(segment_name({'campaign': ['Back to Gym'], 'platform': ['Instagram']}),
+                         'campaign=Back_to_Gym__platform=Instagram')
+        self.assertEqual(segment_name({}), 'all')
+        
+    def test_batch_matches_dashboard_reports(self):
+        """Reports written by the worker pool match the ones built in-process"""
+        segments = [{}, {'platform': ['Instagram']}, {'platform': ['Nowhere']}]
+        with tempfile.TemporaryDirectory() as out_dir:
+            written = run_batch(self.processor, segments, out_dir, workers=2)
+            self.assertIsNone(written[2])
+            self.assertEqual(sorted(os.listdir(out_dir)), ['all', 'platform=Instagram'])
+            
+            view = self.processor.filter_data(segments[1])
+            with zipfile.ZipFile(os.path.join(written[1], 'report.zip')) as archive:
+                manifest = json.loads(archive.read('manifest.json'))
+                with archive.open('campaign_performance.csv.gz') as f:
+                    campaigns = pd.read_csv(f, compression='gzip')
+            self.assertEqual(manifest['filters'], {'platform': ['Instagram']})
+            self.assertEqual(campaigns['revenue'].sum(), view.get_summary_stats()['total_revenue'])
+            with open(os.path.join(written[1], 'insights_report.md'), encoding='utf-8') as f:
+                insights = f.read()
+            self.assertEqual(insights.split('\n')[3:], generate_insights_text(view).split('\n')[3:])
+            
+    def test_imports_without_ui_libraries(self):
+        """The batch entry point loads neither streamlit nor plotly"""
+        code = ("import sys, batch_reports; "
+                "print(sorted(m for m in ('streamlit', 'plotly') if m in sys.modules))")
+        result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
+        self.assertEqual(result.stdout.strip(), '[]')
+
+class TestStreamingMode(unittest.TestCase):
+    
+    def setUp(self):
+        """Load the same data in memory and as streamed chunks"""
+        self.in_memory = DataProcessor()
+        self.assertTrue(self.in_memory.load_data())
+        self.streamed = DataProcessor(streaming=True, chunk_rows=150)
+        self.assertTrue(self.streamed.load_data())
+        
+    def test_chunks_are_bounded(self):
+        """Test that tracking data is read in several chunks and never kept as rows"""
+        self.assertIsNone(self.streamed.tracking_data_df)
+        self.assertEqual(self.streamed.stream_stats['chunks'], 7)
+        self.assertEqual(self.streamed.stream_stats['events'], 1000)
+        
+    def test_rollups_match_in_memory(self):
+        """Test that every metric method returns the in-memory result"""
+        for method in ['get_campaign_performance', 'get_product_performance',
+                       'get_platform_performance', 'get_time_series_data', 'calculate_roas']:
+            # Streamed cells carry no user_id, so there is no buyer count to compare
+            expected = getattr(self.in_memory, method)().drop(columns='unique_buyers', errors='ignore')
+            actual = getattr(self.streamed, method)()
+            pd.testing.assert_frame_equal(expected, actual, check_dtype=False, check_categorical=False)
+        
+        expected = self.in_memory.get_summary_stats()
+        actual = self.streamed.get_summary_stats()
+        self.assertIsNone(actual.pop('unique_buyers'))
+        for key in actual:
+            self.assertAlmostEqual(expected[key], actual[key], places=4)
+            
+    def test_chunk_size_follows_budget(self):
+        """Test that a larger memory budget allows larger chunks"""
+        path = os.path.join(DATA_DIR, 'tracking_data.csv')
+        small = estimate_chunk_rows(path, memory_budget_mb=1)
+        large = estimate_chunk_rows(path, memory_budget_mb=64)
+        self.assertLess(small, large)
+
+@unittest.skipUnless(PARQUET_AVAILABLE, "pyarrow is required for the columnar cache")
+class TestColumnarCache(unittest.TestCase):
+    
+    def setUp(self):
+        """Copy the data files to a scratch directory"""
+        self.data_dir = tempfile.mkdtemp()
+        for name in ['influencers', 'posts', 'tracking_data', 'payouts']:
+            shutil.copy(os.path.join(DATA_DIR, f'{name}.csv'), self.data_dir)
+        
+    def tearDown(self):
+        shutil.rmtree(self.data_dir)
+        
+    def test_warm_load_reads_cache(self):
+        """Test that a second load is served from the cache with identical frames"""
+        cold = DataProcessor(self.data_dir)
+        self.assertTrue(cold.load_data())
+        self.assertEqual(cold.cache.last_status['tracking_data'], 'rebuilt')
+        
+        warm = DataProcessor(self.data_dir)
+        self.assertTrue(warm.load_data())
+        self.assertEqual(set(warm.cache.last_status.values()), {'hit'})
+        pd.testing.assert_frame_equal(cold.tracking_data_df, warm.tracking_data_df)
+        pd.testing.assert_frame_equal(cold.posts_df, warm.posts_df)
+        self.assertTrue(pd.api.types.is_datetime64_any_dtype(warm.tracking_data_df['date']))
+        
+    def test_changed_csv_rebuilds_cache(self):
+        """Test that editing a CSV invalidates only its cached copy"""
+        self.assertTrue(DataProcessor(self.data_dir).load_data())
+        
+        payouts_path = os.path.join(self.data_dir, 'payouts.csv')
+        payouts = pd.read_csv(payouts_path)
+        payouts.loc[0, 'total_payout'] += 1
+        payouts.to_csv(payouts_path, index=False)
+        
+        processor = DataProcessor(self.data_dir)
+        self.assertTrue(processor.load_data())
+        self.assertEqual(processor.cache.last_status['payouts'], 'rebuilt')
+        self.assertEqual(processor.cache.last_status['tracking_data'], 'hit')
+        self.assertAlmostEqual(processor.payouts_df.loc[0, 'total_payout'], payouts.loc[0, 'total_payout'])
+        
+    def test_touched_csv_keeps_cache(self):
+        """Test that a new mtime with unchanged content is still a cache hit"""
+        self.assertTrue(DataProcessor(self.data_dir).load_data())
+        
+        tracking_path = os.path.join(self.data_dir, 'tracking_data.csv')
+        stat = os.stat(tracking_path)
+        os.utime(tracking_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        
+        processor = DataProcessor(self.data_dir)
+        self.assertTrue(processor.load_data())
+        self.assertEqual(processor.cache.last_status['tracking_data'], 'hit')
+        
+    def test_append_during_read_is_not_cached(self):
+        """Test that a CSV that grows while being read is not cached as its smaller copy"""
+        tracking_path = os.path.join(self.data_dir, 'tracking_data.csv')
+        with open(tracking_path) as f:
+            last_line = f.read().splitlines()[-1]
+        
+        def read_then_append(path):
+            df = pd.read_csv(path)
+            with open(path, 'a') as f:
+                f.write(last_line + '\n')
+            return df
+        
+        cache = ColumnarCache(self.data_dir)
+        partial = cache.load('tracking_data', read_then_append)
+        self.assertEqual(cache.last_status['tracking_data'], 'uncached')
+        self.assertNotIn('tracking_data', cache.manifest)
+        
+        processor = DataProcessor(self.data_dir)
+        self.assertTrue(processor.load_data())
+        self.assertEqual(processor.cache.last_status['tracking_data'], 'rebuilt')
+        self.assertEqual(len(processor.tracking_data_df), len(partial) + 1)
+        self.assertEqual([name for name in os.listdir(processor.cache.cache_dir) if name.endswith('.tmp')], [])
+
+    def test_processes_keep_each_others_entries(self):
+        """Test that storing one table never writes back a stale entry for another"""
+        first, second = ColumnarCache(self.data_dir), ColumnarCache(self.data_dir)
+        reader = lambda path: pd.read_csv(path)
+        first.load('influencers', reader)
+        with open(os.path.join(self.data_dir, 'influencers.csv'), 'a') as f:
+            f.write('\n')
+        second.load('influencers', reader)
+        self.assertEqual(second.last_status['influencers'], 'rebuilt')
+        first.load('posts', reader)
+        
+        third = ColumnarCache(self.data_dir)
+        self.assertEqual(third.manifest['influencers'], second.manifest['influencers'])
+        third.load('influencers', reader)
+        self.assertEqual(third.last_status['influencers'], 'hit')
+
 if __name__ == '__main__':
     # Run all tests
     unittest.main(verbosity=2)